@@ -0,0 +1,110 @@
+"""
+Compare PDF build time for the old one-Paragraph-per-chapter layout against the paragraph-aware
+layout in pdf_utils.generate_pdf_from_chapters, and time a re-export after editing one chapter
+with the per-section fragment cache warm.
+
+Usage (from the backend directory):
+    python benchmarks/pdf_layout_benchmark.py [path/to/story.json] [repeats]
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+from reportlab.lib.enums import TA_CENTER
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Measure the single-pass layout unless a fragment cache is passed explicitly
+os.environ["PDF_FRAGMENT_CACHE_DIR"] = ""
+
+from pdf_utils import PdfFragmentCache, generate_pdf_from_chapters
+
+
+def legacy_pdf(title, genre, setting, chapters):
+    """The layout generate_pdf_from_chapters used before: styles per call, one Paragraph per chapter"""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(name="Title", parent=styles["Title"], alignment=TA_CENTER, fontSize=24, spaceAfter=20)
+    header_style = ParagraphStyle(name="Heading", parent=styles["Heading2"], fontSize=16, spaceAfter=10)
+    normal_style = styles["Normal"]
+    content = [
+        Paragraph(title, title_style),
+        Paragraph(f"Genre: {genre}", normal_style),
+        Paragraph(f"Setting: {setting}", normal_style),
+        PageBreak(),
+    ]
+    for chapter in chapters:
+        content.append(Paragraph(f"Chapter: {chapter.get('title', 'Untitled Chapter')}", header_style))
+        content.append(Paragraph(chapter.get('content', ''), normal_style))
+        content.append(Spacer(1, 12))
+        content.append(Paragraph(f"Chapter Summary: {chapter.get('summary', '')}", normal_style))
+        content.append(PageBreak())
+    doc.build(content)
+    return buffer.getvalue()
+
+
+def best_of(repeats, render):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        pdf_bytes = render()
+        timings.append(time.perf_counter() - started)
+    return min(timings), len(pdf_bytes)
+
+
+def main():
+    default_path = os.path.join(os.path.dirname(__file__), "..", "..", "story.json")
+    path = sys.argv[1] if len(sys.argv) > 1 else default_path
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    with open(path) as f:
+        story = json.load(f)
+
+    chapters = story.get("chapters", [])
+    words = sum(len(chapter.get("content", "").split()) for chapter in chapters)
+    print(f"{path}: {len(chapters)} chapters, {words} words, best of {repeats}")
+
+    before, before_size = best_of(repeats, lambda: legacy_pdf(
+        story.get("title", ""), story.get("genre", ""), story.get("setting", ""), chapters
+    ))
+    after, after_size = best_of(repeats, lambda: generate_pdf_from_chapters(
+        title=story.get("title", ""),
+        genre=story.get("genre", ""),
+        setting=story.get("setting", ""),
+        chapters=chapters,
+        characters={},
+    ))
+    print(f"one paragraph per chapter: {before * 1000:8.1f} ms  ({before_size} bytes)")
+    print(f"paragraph-aware layout:    {after * 1000:8.1f} ms  ({after_size} bytes)")
+    print(f"speedup: {before / after:.2f}x")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        fragment_cache = PdfFragmentCache(cache_dir)
+        edits = iter(range(repeats + 1))
+
+        def export_with_one_edit():
+            edited = [dict(chapter) for chapter in chapters]
+            if edited:
+                middle = edited[len(edited) // 2]
+                middle["content"] = middle.get("content", "") + f"\n\nRevision {next(edits)}."
+            return generate_pdf_from_chapters(
+                title=story.get("title", ""),
+                genre=story.get("genre", ""),
+                setting=story.get("setting", ""),
+                chapters=edited,
+                characters={},
+                fragment_cache=fragment_cache,
+            )
+
+        export_with_one_edit()
+        incremental, incremental_size = best_of(repeats, export_with_one_edit)
+    print(f"re-export, 1 chapter edited: {incremental * 1000:6.1f} ms  ({incremental_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import hashlib
+import mimetypes
+import os
+import re
+from typing import Any, Dict, Optional, Tuple
+
+
+class BlobStore:
+    """
+    Content-addressed files on local disk, used for generated covers.
+
+    A blob's id is a hash of its bytes plus an extension for its type, so storing the same image
+    twice is free and an id always refers to the same bytes; that is what lets the blob route hand
+    out long-lived Cache-Control headers and use the id as ETag.
+
+    The directory is bounded: once it holds more than `max_entries` blobs or `max_bytes` bytes,
+    the least recently stored or read ones are deleted, and their ids stop resolving.
+    """
+    _BLOB_ID = re.compile(r"[0-9a-f]{32}\.[a-z0-9]+")
+    _EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+
+    def __init__(self, directory: str, max_entries: int = 2048, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.counters = {"stored": 0, "deduplicated": 0, "evicted": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "BlobStore":
+        """Build the store from BLOB_STORE_DIR, BLOB_STORE_MAX_ENTRIES and BLOB_STORE_MAX_BYTES"""
+        default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "blobs")
+        return cls(
+            os.getenv("BLOB_STORE_DIR") or default_dir,
+            max_entries=int(os.getenv("BLOB_STORE_MAX_ENTRIES", "2048")),
+            max_bytes=int(os.getenv("BLOB_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+        )
+
+    def path(self, blob_id: str) -> str:
+        if not self._BLOB_ID.fullmatch(blob_id):
+            raise ValueError(f"Invalid blob id: {blob_id}")
+        return os.path.join(self.directory, blob_id)
+
+    def put(self, data: bytes, mime_type: str) -> str:
+        """Store bytes and return their blob id"""
+        extension = self._EXTENSIONS.get(mime_type) or mimetypes.guess_extension(mime_type) or ".bin"
+        blob_id = hashlib.sha256(data).hexdigest()[:32] + extension
+        path = self.path(blob_id)
+        if os.path.exists(path):
+            self._touch(path)
+            self.counters["deduplicated"] += 1
+            return blob_id
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.counters["stored"] += 1
+        self._prune()
+        return blob_id
+
+    def get(self, blob_id: str) -> Optional[Tuple[str, str]]:
+        """(path, mime type) of a stored blob, or None if there is no such blob"""
+        path = self.path(blob_id)
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return path, mime_type
+
+    @staticmethod
+    def _touch(path: str):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _prune(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not self._BLOB_ID.fullmatch(entry.name):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_bytes = sum(size for _, size, _ in entries)
+        if len(entries) <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        entries.sort()
+        count = len(entries)
+        for _, size, path in entries:
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            count -= 1
+            total_bytes -= size
+            self.counters["evicted"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "directory": self.directory, "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes}
@@ -0,0 +1,72 @@
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class TokenBudgeter:
+    """
+    Turn word targets into max_tokens budgets.
+
+    The words-per-token ratio starts at `default_words_per_token` and is calibrated per scope
+    (chapter, surprise, seed_ideas, ...) from finished completions with an exponential moving
+    average. Budgets add `headroom` on top of the target so the model can finish its last
+    sentence. A target whose budget does not fit in `max_call_tokens` is planned as several
+    continuation segments instead of one call that would be cut off.
+    """
+
+    def __init__(self, max_call_tokens: int = 7000, headroom: float = 0.2, default_words_per_token: float = 0.75,
+                 smoothing: float = 0.2, overhead_tokens: int = 60):
+        self.max_call_tokens = max_call_tokens
+        self.headroom = headroom
+        self.default_words_per_token = default_words_per_token
+        self.smoothing = smoothing
+        self.overhead_tokens = overhead_tokens
+        self._ratios: Dict[str, float] = {}
+        self._samples: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "TokenBudgeter":
+        return cls(
+            max_call_tokens=int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "7000")),
+            headroom=float(os.getenv("LLM_BUDGET_HEADROOM", "0.2")),
+        )
+
+    def words_per_token(self, scope: Optional[str]) -> float:
+        with self._lock:
+            return self._ratios.get(scope or "default", self.default_words_per_token)
+
+    def observe(self, scope: Optional[str], text: str, completion_tokens: Optional[int]):
+        """Learn from a completion; very short ones say little about the ratio and are ignored"""
+        if not text or not completion_tokens or completion_tokens < 50:
+            return
+        # Clamp so one odd response (a list, a lot of dialogue markup) cannot skew budgets much
+        ratio = min(max(len(text.split()) / completion_tokens, 0.4), 1.2)
+        key = scope or "default"
+        with self._lock:
+            current = self._ratios.get(key)
+            self._ratios[key] = ratio if current is None else current + self.smoothing * (ratio - current)
+            self._samples[key] = self._samples.get(key, 0) + 1
+
+    def _raw_tokens_for(self, words: int, scope: Optional[str]) -> int:
+        return math.ceil(words / self.words_per_token(scope) * (1 + self.headroom)) + self.overhead_tokens
+
+    def tokens_for(self, words: int, scope: Optional[str] = None) -> int:
+        """max_tokens for one call asked to write about `words` words"""
+        return min(self.max_call_tokens, self._raw_tokens_for(words, scope))
+
+    def plan_segments(self, words: int, scope: Optional[str] = None) -> List[int]:
+        """Word targets of the calls needed to write `words` words, each within one call's budget"""
+        segments = max(1, math.ceil(self._raw_tokens_for(words, scope) / self.max_call_tokens))
+        base, extra = divmod(words, segments)
+        return [base + (1 if i < extra else 0) for i in range(segments)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_call_tokens": self.max_call_tokens,
+                "headroom": self.headroom,
+                "words_per_token": {scope: round(ratio, 3) for scope, ratio in self._ratios.items()},
+                "samples": dict(self._samples),
+            }
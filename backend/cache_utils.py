@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class SQLiteCacheTier:
+    """On-disk cache tier with a per-entry time to live, shared by every process using the same file"""
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LLMCache:
+    """
+    Content-addressed cache for LLM completions.
+
+    Entries are keyed by a hash of the model, messages, temperature and max_tokens. Lookups go
+    through a bounded in-memory LRU first and an optional SQLiteCacheTier second; disk hits are
+    promoted back into the LRU. Hit and miss counters are kept overall and per cache scope.
+    """
+
+    def __init__(self, max_entries: int = 256, disk: Optional[SQLiteCacheTier] = None):
+        self.max_entries = max_entries
+        self.disk = disk
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self.scope_counters: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_env(cls) -> "LLMCache":
+        """Build the cache from LLM_CACHE_SIZE, LLM_CACHE_DB and LLM_CACHE_TTL_SECONDS"""
+        disk = None
+        db_path = os.getenv("LLM_CACHE_DB")
+        if db_path:
+            ttl = os.getenv("LLM_CACHE_TTL_SECONDS")
+            disk = SQLiteCacheTier(db_path, ttl_seconds=float(ttl) if ttl else None)
+        return cls(max_entries=int(os.getenv("LLM_CACHE_SIZE", "256")), disk=disk)
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], temperature: float, max_tokens: int) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, scope: Optional[str], outcome: str):
+        self.counters[outcome] += 1
+        if scope:
+            bucket = self.scope_counters.setdefault(scope, {"hits": 0, "misses": 0})
+            bucket["misses" if outcome == "misses" else "hits"] += 1
+
+    def get(self, key: str, scope: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._count(scope, "memory_hits")
+                return self._entries[key]
+
+        value = self.disk.get(key) if self.disk else None
+        with self._lock:
+            if value is None:
+                self._count(scope, "misses")
+                return None
+            self._count(scope, "disk_hits")
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self.counters["stores"] += 1
+            self._remember(key, value)
+        if self.disk:
+            self.disk.set(key, value)
+
+    def _remember(self, key: str, value: str):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_enabled": self.disk is not None,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "scopes": {scope: dict(bucket) for scope, bucket in self.scope_counters.items()},
+            }
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from governor_utils import estimate_tokens
+
+# Name parts that say nothing about who is meant
+_NAME_TITLES = frozenset("mr mrs ms miss dr sir lady lord king queen prince princess captain professor the of von van de".split())
+
+
+def _clip(text: Optional[str], words: int) -> str:
+    parts = (text or "").split()
+    return " ".join(parts[:words]) + ("..." if len(parts) > words else "")
+
+
+def character_aliases(character: Any) -> List[str]:
+    """Name, explicit aliases and the distinctive parts of the name ("Elena" for "Elena Martinez")"""
+    aliases = [character.name] + list(getattr(character, "aliases", None) or [])
+    for part in re.split(r"[\s\-]+", character.name):
+        part = part.strip(".,'\"")
+        if len(part) > 2 and part.lower() not in _NAME_TITLES and part not in aliases:
+            aliases.append(part)
+    return [alias for alias in aliases if alias]
+
+
+def _arc_note(arcs: List[Dict[str, str]], chapter_number: Optional[int]) -> str:
+    """The arc stage that applies at `chapter_number` (the latest one at or before it), or the first stage"""
+    if not arcs:
+        return ""
+    stage = arcs[0]
+    if chapter_number is not None:
+        for entry in arcs:
+            try:
+                if int(str(entry.get("chapter", "")).strip()) <= chapter_number:
+                    stage = entry
+            except ValueError:
+                continue
+    return "; ".join(str(value) for key, value in stage.items() if key != "chapter" and value)
+
+
+class CharacterSheet:
+    """Precomputed compact lines for one character: a full entry and a one-line digest"""
+
+    def __init__(self, character: Any, arcs: List[Dict[str, str]]):
+        self.name = character.name
+        self.arcs = arcs
+        aliases = character_aliases(character)
+        # The full name matches in any case; aliases and name parts only as written ("Hope", not "hope")
+        self._patterns = [re.compile(r"\b" + re.escape(self.name) + r"\b", re.IGNORECASE)] + [
+            re.compile(r"\b" + re.escape(alias) + r"\b") for alias in aliases[1:]
+        ]
+
+        shown_aliases = [alias for alias in aliases[1:] if alias not in self.name.split()]
+        head = self.name + (f" (also {', '.join(shown_aliases)})" if shown_aliases else "")
+        fields = [_clip(character.description, 40)]
+        if character.background:
+            fields.append(f"Background: {_clip(character.background, 25)}")
+        if character.goals:
+            fields.append(f"Goals: {_clip(character.goals, 20)}")
+        if character.personality_traits:
+            fields.append(f"Traits: {', '.join(character.personality_traits[:4])}")
+        if character.relationships:
+            fields.append("Relationships: " + "; ".join(
+                f"{other}: {_clip(relation, 8)}" for other, relation in list(character.relationships.items())[:3]
+            ))
+        if character.arc_description:
+            fields.append(f"Arc: {_clip(character.arc_description, 25)}")
+        self.entry = f"- {head}: " + " | ".join(field for field in fields if field)
+        self.digest = f"- {self.name}: {_clip(character.description, 10)}"
+
+    def first_mention(self, text: str) -> Optional[int]:
+        matches = [pattern.search(text) for pattern in self._patterns]
+        positions = [match.start() for match in matches if match]
+        return min(positions) if positions else None
+
+    def full_entry(self, chapter_number: Optional[int] = None) -> str:
+        arc = _arc_note(self.arcs, chapter_number)
+        return self.entry + (f" | Now: {_clip(arc, 25)}" if arc else "")
+
+
+_ARCS_HEADING = re.compile(r"\[CHARACTER ARCS\]|Character Arcs\s*:", re.IGNORECASE)
+
+
+def parse_character_arcs(seed_summary: str, characters: Optional[List[Any]]) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Story.character_arcs from the "Character Arcs" section of a seed summary.
+
+    Each line of the section goes to the character it names first (by name or alias), with list
+    markers, bold markers and a leading "Name:" removed. The seed gives no chapter numbers, so
+    every character gets a single stage covering the whole story.
+    """
+    parts = _ARCS_HEADING.split(seed_summary or "", maxsplit=1)
+    if len(parts) < 2 or not characters:
+        return {}
+    sheets = [CharacterSheet(c, []) for c in characters if c.name]
+    lines: Dict[str, List[str]] = {}
+    for line in parts[1].splitlines():
+        line = line.replace("**", "").strip(" \t-*•")
+        mentions = [(sheet.first_mention(line), sheet) for sheet in sheets]
+        mentions = [(position, sheet) for position, sheet in mentions if position is not None]
+        if not mentions:
+            continue
+        _, sheet = min(mentions, key=lambda item: item[0])
+        head, colon, rest = line.partition(":")
+        if colon and rest.strip() and sheet.first_mention(head) is not None and len(head.split()) <= 5:
+            line = rest.strip()
+        lines.setdefault(sheet.name, []).append(line)
+    return {name: [{"stage": " ".join(text)}] for name, text in lines.items()}
+
+
+class CharacterBible:
+    """
+    Compact character context for prompts.
+
+    A story's characters and Story.character_arcs are turned into CharacterSheets once and kept
+    in a small LRU keyed by their content. render() gives the characters a piece of text refers
+    to (by name or alias) their full entry, in order of first mention, and fills what is left
+    of `max_tokens` with one-line digests of the others, so prompts do not grow with the cast.
+    """
+
+    def __init__(self, max_tokens: int = 600, cover_max_tokens: int = 150, max_entries: int = 64):
+        self.max_tokens = max_tokens
+        self.cover_max_tokens = cover_max_tokens
+        self.max_entries = max_entries
+        self._sheets: "OrderedDict[str, List[CharacterSheet]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"built": 0, "reused": 0, "full_entries": 0, "digests": 0, "omitted": 0}
+
+    @classmethod
+    def from_env(cls) -> "CharacterBible":
+        return cls(
+            max_tokens=int(os.getenv("CHARACTER_CONTEXT_TOKENS", "600")),
+            cover_max_tokens=int(os.getenv("CHARACTER_COVER_CONTEXT_TOKENS", "150")),
+        )
+
+    def sheets(self, characters: List[Any], character_arcs: Optional[Dict[str, List[Dict[str, str]]]] = None) -> List[CharacterSheet]:
+        arcs = character_arcs or {}
+        key = hashlib.sha256(json.dumps(
+            [[c.model_dump() for c in characters], arcs], sort_keys=True, default=str
+        ).encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._sheets:
+                self._sheets.move_to_end(key)
+                self.counters["reused"] += 1
+                return self._sheets[key]
+        built = [CharacterSheet(c, arcs.get(c.name, [])) for c in characters if c.name]
+        with self._lock:
+            self.counters["built"] += 1
+            self._sheets[key] = built
+            while len(self._sheets) > self.max_entries:
+                self._sheets.popitem(last=False)
+        return built
+
+    def select(self, sheets: List[CharacterSheet], text: str) -> Tuple[List[CharacterSheet], List[CharacterSheet]]:
+        """(characters `text` refers to, in order of first mention; all others)"""
+        mentioned = []
+        others = []
+        for sheet in sheets:
+            position = sheet.first_mention(text or "")
+            if position is None:
+                others.append(sheet)
+            else:
+                mentioned.append((position, sheet))
+        return [sheet for _, sheet in sorted(mentioned, key=lambda item: item[0])], others
+
+    def render(self, characters: Optional[List[Any]], text: str,
+               character_arcs: Optional[Dict[str, List[Dict[str, str]]]] = None,
+               chapter_number: Optional[int] = None, max_tokens: Optional[int] = None) -> str:
+        """Character lines for a prompt about `text`, at most `max_tokens` (default self.max_tokens)"""
+        if not characters:
+            return ""
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        mentioned, others = self.select(self.sheets(characters, character_arcs), text)
+
+        lines = []
+        # Characters the text names come first and in full while the budget lasts, then as digests
+        for sheet in mentioned:
+            entry = sheet.full_entry(chapter_number)
+            if estimate_tokens(entry, 0) > budget:
+                entry = sheet.digest
+                if estimate_tokens(entry, 0) > budget:
+                    others.insert(0, sheet)
+                    continue
+                self.counters["digests"] += 1
+            else:
+                self.counters["full_entries"] += 1
+            lines.append(entry)
+            budget -= estimate_tokens(entry, 0) + 1
+
+        omitted = 0
+        for sheet in others:
+            if estimate_tokens(sheet.digest, 0) > budget:
+                omitted += 1
+                continue
+            lines.append(sheet.digest)
+            budget -= estimate_tokens(sheet.digest, 0) + 1
+            self.counters["digests"] += 1
+        if omitted:
+            lines.append(f"- ({omitted} more minor characters)")
+            self.counters["omitted"] += omitted
+        return "\n".join(lines)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached = len(self._sheets)
+        return {**self.counters, "cached_casts": cached, "max_tokens": self.max_tokens}
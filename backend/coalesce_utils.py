@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class SingleFlight:
+    """
+    Coalesce identical in-flight requests into one upstream call.
+
+    The first caller for a key starts the work; callers arriving while it runs await the same
+    task. Successful results are kept for `result_ttl_seconds` so late retries return instantly.
+    Failures are shared with everyone waiting at that moment but never remembered.
+    """
+
+    def __init__(self, result_ttl_seconds: float = 60.0, max_results: int = 512):
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_results = max_results
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._results = OrderedDict()
+        self.counters = {"executed": 0, "coalesced": 0, "replayed": 0}
+
+    @classmethod
+    def from_env(cls) -> "SingleFlight":
+        return cls(result_ttl_seconds=float(os.getenv("COALESCE_RESULT_TTL_SECONDS", "60")))
+
+    @staticmethod
+    def make_key(scope: str, payload: str, idempotency_key: Optional[str] = None) -> str:
+        """Key by the client's Idempotency-Key when given, otherwise by a hash of the request body"""
+        if idempotency_key:
+            return f"{scope}:idem:{idempotency_key}"
+        return f"{scope}:body:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def _cached_result(self, key: str):
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() > expires_at:
+            del self._results[key]
+            return None
+        return entry
+
+    def _remember(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._results[key] = (time.monotonic() + self.result_ttl_seconds, task.result())
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        cached = self._cached_result(key)
+        if cached is not None:
+            self.counters["replayed"] += 1
+            return cached[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.counters["executed"] += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._remember(key, done))
+        else:
+            self.counters["coalesced"] += 1
+
+        # Shield so one client disconnecting does not cancel the work other callers share
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "in_flight": len(self._inflight),
+            "remembered_results": len(self._results),
+            "result_ttl_seconds": self.result_ttl_seconds,
+        }
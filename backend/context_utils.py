@@ -0,0 +1,162 @@
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from governor_utils import estimate_tokens
+
+# Places text can be cut, coarsest first: paragraph breaks, line breaks, sentence ends
+_BREAKS = (
+    re.compile(r"\n\s*\n"),
+    re.compile(r"\n"),
+    re.compile(r"(?<=[.!?][\"'\u201d\u2019)])\s+|(?<=[.!?])\s+"),
+)
+
+
+def fit_to_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Cut `text` at a word boundary so it fits in about `max_tokens` tokens, keeping its start or its end"""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text, 0) <= max_tokens:
+        return text
+    words = text.split()
+    kept = []
+    used = 0
+    for word in (reversed(words) if keep_end else words):
+        used += len(word) + 1
+        if used // 4 > max_tokens:
+            break
+        kept.append(word)
+    if not kept:
+        return ""
+    if keep_end:
+        return "..." + " ".join(reversed(kept))
+    return " ".join(kept) + "..."
+
+
+def split_pieces(text: str) -> List[List[str]]:
+    """
+    Ways to cut `text` into pieces, coarsest first (paragraphs, lines, sentences). Each piece
+    keeps the break that follows it, so any run of pieces joins back into the exact original text.
+    """
+    splits = []
+    for pattern in _BREAKS:
+        pieces = []
+        start = 0
+        for match in pattern.finditer(text):
+            if match.start() > start:
+                pieces.append(text[start:match.end()])
+                start = match.end()
+        pieces.append(text[start:])
+        if len(pieces) > 1:
+            splits.append(pieces)
+    return splits
+
+
+def split_opening(text: str, max_words: int) -> Optional[Tuple[str, str]]:
+    """
+    (opening, rest) where the opening is as many whole paragraphs of `text` as fit in `max_words`,
+    or lines or sentences when the first paragraph is longer; None if not even a sentence fits
+    """
+    if len(text.split()) <= max_words:
+        return text, ""
+    for pieces in split_pieces(text):
+        count = 0
+        cut = 0
+        while cut < len(pieces) and count + len(pieces[cut].split()) <= max_words:
+            count += len(pieces[cut].split())
+            cut += 1
+        if cut:
+            return "".join(pieces[:cut]), "".join(pieces[cut:])
+    return None
+
+
+class NarrativeContext:
+    """
+    Server-side "story so far" for chapter prompts.
+
+    Each story keeps a rolling summary in its StoryMemory, one snapshot per chapter it has been
+    folded through. A chapter prompt gets the snapshot from before that chapter plus the ending
+    of the stored previous chapter, cut to `context_tokens` in total, so prompts stay the same
+    size however long the book gets. After a chapter is written its text is folded into the
+    previous snapshot with one short summarization call; earlier chapters are never re-read.
+    """
+
+    def __init__(self, context_tokens: int = 1200, summary_words: int = 350, ending_words: int = 250,
+                 update_input_tokens: int = 4000):
+        self.context_tokens = context_tokens
+        self.summary_words = summary_words
+        self.ending_words = ending_words
+        self.update_input_tokens = update_input_tokens
+        self.counters = {"built": 0, "updates": 0}
+
+    @classmethod
+    def from_env(cls) -> "NarrativeContext":
+        return cls(
+            context_tokens=int(os.getenv("STORY_CONTEXT_TOKENS", "1200")),
+            summary_words=int(os.getenv("STORY_SUMMARY_WORDS", "350")),
+            ending_words=int(os.getenv("STORY_CONTEXT_ENDING_WORDS", "250")),
+            update_input_tokens=int(os.getenv("STORY_SUMMARY_INPUT_TOKENS", "4000")),
+        )
+
+    def build(self, chapter_number: int, summary: Optional[str], previous_title: Optional[str] = None,
+              previous_ending: Optional[str] = None, previous_outline: Optional[str] = None) -> str:
+        """
+        Previous-chapter section of a chapter prompt. The previous chapter's ending matters most
+        for continuity, so it gets its share of the budget first and the summary the rest.
+        """
+        self.counters["built"] += 1
+        previous_name = previous_title or f"Chapter {chapter_number - 1}"
+        sections = []
+        remaining = self.context_tokens
+
+        ending = ""
+        if previous_ending:
+            ending = " ".join(previous_ending.split()[-self.ending_words:])
+            ending = fit_to_tokens(ending, remaining // 2 if summary else remaining, keep_end=True)
+            remaining -= estimate_tokens(ending, 0)
+        elif previous_outline:
+            ending = fit_to_tokens(previous_outline, remaining // 3)
+            remaining -= estimate_tokens(ending, 0)
+
+        if summary:
+            # The end of the summary holds the most recent events
+            sections.append(f"""
+            The story so far:
+            {fit_to_tokens(summary, remaining, keep_end=True)}
+            """)
+        if previous_ending:
+            sections.append(f"""
+            Previous chapter ({previous_name}) ended with:
+            {ending}
+            """)
+        elif previous_outline:
+            sections.append(f"""
+            Previous chapter ({previous_name}) covers:
+            {ending}
+            """)
+        return "\n".join(sections)
+
+    def build_update_prompt(self, summary: Optional[str], chapter_number: int, chapter_title: str, content: str) -> str:
+        """Prompt folding one new chapter into the rolling summary of the chapters before it"""
+        previous = summary or "(This is the first chapter; there is no summary yet.)"
+        if estimate_tokens(content, 0) > self.update_input_tokens:
+            # Very long chapters are summarized from their opening and their ending
+            half = self.update_input_tokens // 2
+            content = fit_to_tokens(content, half) + "\n[...]\n" + fit_to_tokens(content, half, keep_end=True)
+        return f"""
+        You maintain a running summary of a novel for its author.
+
+        Summary of the story so far:
+        {previous}
+
+        New chapter (Chapter {chapter_number}: {chapter_title}):
+        {content}
+
+        Rewrite the summary so it also covers the new chapter, in at most {self.summary_words} words.
+        Keep the plot events, where each main character is and what they want, unresolved threads
+        and any facts later chapters must stay consistent with. Compress older events more than
+        recent ones. Return only the summary.
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "context_tokens": self.context_tokens, "summary_words": self.summary_words}
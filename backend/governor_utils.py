@@ -0,0 +1,186 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+# Lower runs first. Interactive requests jump ahead of background whole-book jobs.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+# Priority of LLM calls made from the current task; BookJobScheduler sets it to PRIORITY_BULK
+llm_priority: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Rough token cost of a call: ~4 characters per prompt token plus the completion budget"""
+    return len(prompt) // 4 + max_tokens
+
+
+class LLMOverloaded(Exception):
+    """Raised instead of queueing when too many LLM calls are already waiting"""
+    def __init__(self, queue_depth: int, retry_after: int):
+        super().__init__(f"Too many story requests are waiting ({queue_depth} queued), retry in {retry_after}s")
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to the same burst; a rate of 0 means unlimited"""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = rate_per_minute
+        self.level = rate_per_minute
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate_per_minute / 60)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)"""
+        if not self.rate_per_minute:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.rate_per_minute
+
+    def take(self, amount: float):
+        if self.rate_per_minute:
+            self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        if self.rate_per_minute:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class LLMGovernor:
+    """
+    Single gate in front of every LLM call in this process.
+
+    Calls wait in a priority queue ordered by priority class, then by estimated token cost (so
+    short seed calls overtake long chapters), then by arrival. The head of the queue is admitted
+    once a concurrency slot is free and both token buckets (requests/min and tokens/min) allow
+    it. Interactive calls that would join a queue already `max_queue` deep ahead of them are
+    refused with LLMOverloaded; bulk calls always wait.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_concurrent: int = 16, max_queue: int = 64, retry_after: int = 10):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.running = 0
+        self._queue = []
+        self._order = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self.counters = {"admitted": 0, "shed": 0, "tokens_refunded": 0}
+        self.wait_seconds = {"total": 0.0, "max": 0.0}
+
+    @classmethod
+    def from_env(cls) -> "LLMGovernor":
+        return cls(
+            requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")),
+            tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "0")),
+            max_concurrent=int(os.getenv("LLM_MAX_CONCURRENT", "16")),
+            max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+            retry_after=int(os.getenv("LLM_SHED_RETRY_AFTER_SECONDS", "10")),
+        )
+
+    def _queued_ahead(self, priority: int) -> int:
+        return sum(1 for entry in self._queue if entry[0] <= priority and not entry[3].done())
+
+    def ensure_capacity(self, priority: Optional[int] = None):
+        """Raise LLMOverloaded now if a call at this priority would be shed; lets streaming routes answer 429 up front"""
+        priority = llm_priority.get() if priority is None else priority
+        if priority == PRIORITY_BULK:
+            return
+        depth = self._queued_ahead(priority)
+        if depth >= self.max_queue:
+            self.counters["shed"] += 1
+            raise LLMOverloaded(depth, self.retry_after)
+
+    def _dispatch(self):
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        while self._queue and self.running < self.max_concurrent:
+            _, cost, _, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(cost))
+            if wait > 0:
+                self._wakeup = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(cost)
+            self.running += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int, priority: Optional[int] = None):
+        """
+        Hold one admitted LLM call for the duration of the block.
+
+        Yields a function to report the tokens the call really used; the unused part of the
+        estimate is refunded to the tokens/min bucket.
+        """
+        priority = llm_priority.get() if priority is None else priority
+        self.ensure_capacity(priority)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, estimated_tokens, next(self._order), future))
+        enqueued_at = time.monotonic()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller gave up: hand the slot on
+                self.running -= 1
+                self._dispatch()
+            raise
+
+        waited = time.monotonic() - enqueued_at
+        self.counters["admitted"] += 1
+        self.wait_seconds["total"] += waited
+        self.wait_seconds["max"] = max(self.wait_seconds["max"], waited)
+
+        def record_usage(total_tokens: Optional[int]):
+            if self.tokens.rate_per_minute and total_tokens is not None and total_tokens < estimated_tokens:
+                self.tokens.refund(estimated_tokens - total_tokens)
+                self.counters["tokens_refunded"] += estimated_tokens - total_tokens
+
+        try:
+            yield record_usage
+        finally:
+            self.running -= 1
+            self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        waiting = [entry for entry in self._queue if not entry[3].done()]
+        admitted = self.counters["admitted"]
+        return {
+            **self.counters,
+            "running": self.running,
+            "queue_depth": len(waiting),
+            "queue_depth_interactive": sum(1 for entry in waiting if entry[0] == PRIORITY_INTERACTIVE),
+            "queue_depth_bulk": sum(1 for entry in waiting if entry[0] == PRIORITY_BULK),
+            "avg_wait_seconds": round(self.wait_seconds["total"] / admitted, 3) if admitted else 0.0,
+            "max_wait_seconds": round(self.wait_seconds["max"], 3),
+            "requests_per_minute": self.requests.rate_per_minute,
+            "tokens_per_minute": self.tokens.rate_per_minute,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
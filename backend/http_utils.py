@@ -0,0 +1,147 @@
+import asyncio
+import email.utils
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+import openai
+
+# Completion calls differ a lot in length, so each kind gets its own deadline
+DEFAULT_REQUEST_TIMEOUTS = {
+    "seed_ideas": 60.0,
+    "outline": 120.0,
+    "chapter": 300.0,
+    "surprise": 240.0,
+    "stitch": 60.0,
+    "memory": 60.0,
+}
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_openai_http_client() -> httpx.AsyncClient:
+    """
+    Shared, tuned HTTP transport for AsyncOpenAI.
+
+    Pool sizes and keep-alive come from OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS
+    and OPENAI_KEEPALIVE_EXPIRY_SECONDS. HTTP/2 is used when the h2 package is installed unless
+    OPENAI_HTTP2 is set to false.
+    """
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "64")),
+        max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "32")),
+        keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "60")),
+    )
+    use_http2 = os.getenv("OPENAI_HTTP2", "true").lower() in ("1", "true", "yes") and http2_available()
+    return httpx.AsyncClient(
+        limits=limits,
+        http2=use_http2,
+        timeout=httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT_SECONDS", "120")), connect=10.0),
+    )
+
+
+def request_timeouts_from_env() -> Dict[str, float]:
+    """Per-endpoint deadlines, overridable as OPENAI_TIMEOUT_<ENDPOINT>_SECONDS (e.g. OPENAI_TIMEOUT_CHAPTER_SECONDS)"""
+    return {
+        endpoint: float(os.getenv(f"OPENAI_TIMEOUT_{endpoint.upper()}_SECONDS", str(default)))
+        for endpoint, default in DEFAULT_REQUEST_TIMEOUTS.items()
+    }
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay the server asked for in Retry-After / Retry-After-Ms, if any"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(parsed.timestamp() - time.time(), 0.0)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+class RetryPolicy:
+    """
+    Retry transient LLM failures with jittered exponential backoff.
+
+    Attempt n waits a random delay up to min(max_delay, base_delay * 2**n) ("full jitter"), or
+    exactly what the server's Retry-After asks for. A Retry-After longer than
+    `max_retry_after` is not waited out; the error is raised so the caller can fail fast.
+    """
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 20.0,
+                 max_retry_after: float = 60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.counters = {"retries": 0, "gave_up": 0}
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("OPENAI_RETRY_ATTEMPTS", "4")),
+            base_delay=float(os.getenv("OPENAI_RETRY_BASE_DELAY_SECONDS", "0.5")),
+            max_delay=float(os.getenv("OPENAI_RETRY_MAX_DELAY_SECONDS", "20")),
+            max_retry_after=float(os.getenv("OPENAI_RETRY_MAX_RETRY_AFTER_SECONDS", "60")),
+        )
+
+    def delay_for(self, attempt: int, error: Exception) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up"""
+        if attempt + 1 >= self.max_attempts or not is_retryable(error):
+            return None
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_retry_after else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        attempt = 0
+        while True:
+            try:
+                return await factory()
+            except Exception as e:
+                delay = self.delay_for(attempt, e)
+                if delay is None:
+                    if is_retryable(e):
+                        self.counters["gave_up"] += 1
+                    raise
+                self.counters["retries"] += 1
+                print(f"LLM call failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "max_attempts": self.max_attempts}
@@ -0,0 +1,193 @@
+import base64
+import functools
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image as PILImage
+
+
+def parse_box(value: str) -> Tuple[int, int]:
+    """Parse a "WIDTHxHEIGHT" setting such as "400x540" """
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def fit_to_box(size: Tuple[int, int], box: Tuple[float, float]) -> Tuple[float, float]:
+    """Largest size with the same aspect ratio as `size` that fits inside `box`"""
+    width, height = size
+    scale = min(box[0] / width, box[1] / height)
+    return width * scale, height * scale
+
+
+def decode_data_url(data_url: str) -> bytes:
+    """Bytes of a base64 "data:image/...;base64,..." URL"""
+    header, _, payload = data_url.partition(",")
+    if not header.startswith("data:image") or not payload:
+        raise ValueError("Cover image must be a base64 data:image URL")
+    return base64.b64decode(payload)
+
+
+class CoverImageProcessor:
+    """
+    Turn generated cover art into the JPEG that actually gets embedded in PDFs.
+
+    Images are decoded once, downscaled to fit the print box (in points) at `dpi` while keeping
+    their aspect ratio, and re-encoded as JPEG at `quality`. Results are cached by a hash of the
+    source plus those settings, in memory and optionally in a directory so PdfRenderPool worker
+    processes and the API process share them; the directory keeps at most `max_files` covers.
+    """
+
+    def __init__(
+        self,
+        print_box: Tuple[int, int] = (400, 540),
+        dpi: int = 150,
+        quality: int = 85,
+        cache_dir: Optional[str] = None,
+        max_entries: int = 32,
+        max_files: int = 256
+    ):
+        self.print_box = print_box
+        self.dpi = dpi
+        self.quality = quality
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_files = max_files
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "processed": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "CoverImageProcessor":
+        """Build the processor from the COVER_* settings (print box in points, DPI, JPEG quality, cache)"""
+        default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "covers")
+        return cls(
+            print_box=parse_box(os.getenv("COVER_PRINT_BOX", "400x540")),
+            dpi=int(os.getenv("COVER_PRINT_DPI", "150")),
+            quality=int(os.getenv("COVER_JPEG_QUALITY", "85")),
+            cache_dir=os.getenv("COVER_CACHE_DIR", default_dir) or None,
+            max_files=int(os.getenv("COVER_CACHE_MAX_FILES", "256"))
+        )
+
+    @property
+    def pixel_box(self) -> Tuple[int, int]:
+        return round(self.print_box[0] * self.dpi / 72), round(self.print_box[1] * self.dpi / 72)
+
+    def make_key(self, source: str) -> str:
+        settings = f"{self.print_box[0]}x{self.print_box[1]}@{self.dpi}q{self.quality}"
+        return hashlib.sha256(f"{settings}:{source}".encode("utf-8")).hexdigest()
+
+    def _cache_path(self, key: str) -> Optional[str]:
+        return os.path.join(self.cache_dir, f"{key}.jpg") if self.cache_dir else None
+
+    def _lookup(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return self._entries[key]
+        path = self._cache_path(key)
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                jpeg_bytes = f.read()
+            self.counters["disk_hits"] += 1
+            self._remember(key, jpeg_bytes, persist=False)
+            return jpeg_bytes
+        return None
+
+    def _remember(self, key: str, jpeg_bytes: bytes, persist: bool = True):
+        with self._lock:
+            self._entries[key] = jpeg_bytes
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        path = self._cache_path(key)
+        if persist and path:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(jpeg_bytes)
+            os.replace(tmp_path, path)
+            self._prune()
+
+    def _prune(self):
+        entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".jpg")]
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def process(self, image_bytes: bytes) -> bytes:
+        """Downscale and re-encode raw image bytes; no caching"""
+        with PILImage.open(io.BytesIO(image_bytes)) as image:
+            image.draft("RGB", self.pixel_box)
+            image = image.convert("RGB")
+            image.thumbnail(self.pixel_box, PILImage.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=self.quality, optimize=True, progressive=True)
+        self.counters["processed"] += 1
+        return output.getvalue()
+
+    def process_data_url(self, data_url: str) -> bytes:
+        """Processed JPEG for a data URL, keyed by the URL itself so cache hits skip base64 decoding"""
+        key = self.make_key(data_url)
+        jpeg_bytes = self._lookup(key)
+        if jpeg_bytes is None:
+            jpeg_bytes = self.process(decode_data_url(data_url))
+            self._remember(key, jpeg_bytes)
+        return jpeg_bytes
+
+    def process_blob(self, blob_id: str, path: str) -> bytes:
+        """Processed JPEG for a file in the BlobStore; blob ids are content hashes, so they are the cache key"""
+        key = self.make_key(f"blob:{blob_id}")
+        jpeg_bytes = self._lookup(key)
+        if jpeg_bytes is None:
+            with open(path, "rb") as f:
+                jpeg_bytes = self.process(f.read())
+            self._remember(key, jpeg_bytes)
+        return jpeg_bytes
+
+    def register_blob(self, blob_id: str, jpeg_bytes: bytes):
+        """Record that a stored blob already is a processed cover, so exports embed it as is"""
+        self._remember(self.make_key(f"blob:{blob_id}"), jpeg_bytes)
+
+    def prepare_generated_cover(self, image_bytes: bytes) -> Tuple[bytes, str]:
+        """
+        Process freshly generated cover art and return it as JPEG bytes and a JPEG data URL.
+
+        The result is cached under that data URL, so when a client posts it back for a PDF
+        export the processed image is used without decoding anything.
+        """
+        jpeg_bytes = self.process(image_bytes)
+        data_url = f"data:image/jpeg;base64,{base64.b64encode(jpeg_bytes).decode('ascii')}"
+        self._remember(self.make_key(data_url), jpeg_bytes)
+        return jpeg_bytes, data_url
+
+    def draw_size(self, jpeg_bytes: bytes) -> Tuple[float, float]:
+        """Size in points to draw a processed cover at, filling the print box without distortion"""
+        with PILImage.open(io.BytesIO(jpeg_bytes)) as image:
+            return fit_to_box(image.size, self.print_box)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            **self.counters,
+            "entries": entries,
+            "print_box": list(self.print_box),
+            "dpi": self.dpi,
+            "quality": self.quality,
+        }
+
+
+@functools.lru_cache(maxsize=1)
+def get_cover_processor() -> CoverImageProcessor:
+    return CoverImageProcessor.from_env()
@@ -0,0 +1,457 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from story_utils import Chapter, StoryGenerator
+from governor_utils import PRIORITY_BULK, llm_priority
+
+
+class BookJob(BaseModel):
+    """Progress of a whole-book generation job"""
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    story_id: str
+    status: str = "queued"  # queued, seeding, outlining, generating, stitching, completed, failed
+    title: str = ""
+    genre: str = ""
+    idea: Optional[str] = None
+    seed_summary: Optional[str] = None
+    target_chapters: int = 0
+    chapter_outlines: List[Dict[str, Any]] = []
+    writing_style: str = "default"
+    target_word_count: int = 2000
+    max_parallel_chapters: int = 4
+    total_chapters: int = 0
+    completed_chapters: List[int] = []
+    stitched_boundaries: int = 0
+    resumed_count: int = 0
+    error: Optional[str] = None
+    created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+    updated_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+
+    def update_timestamp(self):
+        self.updated_at = datetime.now().isoformat()
+
+    def is_finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+
+async def gather_or_cancel(*coros) -> List[Any]:
+    """
+    Like asyncio.gather, but the first failure cancels the steps still running instead of
+    letting them spend tokens on a job that has already failed
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+class JobStore:
+    """
+    SQLite store for book jobs and their per-step checkpoints.
+
+    Every completed LLM step (seed, outline, each chapter, each stitched boundary) is written as a
+    checkpoint, so a restarted worker can resume a job without paying for those steps again.
+    Workers claim a job with a time-limited lease, so several processes sharing one database
+    never run the same job twice.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS book_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                data TEXT NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_book_jobs_status ON book_jobs (status);
+            CREATE TABLE IF NOT EXISTS book_job_checkpoints (
+                job_id TEXT NOT NULL,
+                step TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (job_id, step)
+            );
+        """)
+        self._conn.commit()
+
+    def save_job(self, job: BookJob):
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO book_jobs (id, status, data) VALUES (?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET status = excluded.status, data = excluded.data""",
+                (job.id, job.status, job.model_dump_json())
+            )
+            self._conn.commit()
+
+    def load_job(self, job_id: str) -> Optional[BookJob]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM book_jobs WHERE id = ?", (job_id,)).fetchone()
+        return BookJob.model_validate_json(row[0]) if row else None
+
+    def unfinished_jobs(self) -> List[BookJob]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM book_jobs WHERE status NOT IN ('completed', 'failed')"
+            ).fetchall()
+        return [BookJob.model_validate_json(row[0]) for row in rows]
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Take the job's lease if it is free, expired or already ours"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                """UPDATE book_jobs SET lease_owner = ?, lease_expires = ?
+                   WHERE id = ? AND (lease_owner IS NULL OR lease_owner = ? OR lease_expires < ?)""",
+                (owner, now + lease_seconds, job_id, owner, now)
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def renew(self, job_id: str, owner: str, lease_seconds: float):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE book_jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ?",
+                (time.time() + lease_seconds, job_id, owner)
+            )
+            self._conn.commit()
+
+    def release(self, job_id: str, owner: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE book_jobs SET lease_owner = NULL, lease_expires = 0 WHERE id = ? AND lease_owner = ?",
+                (job_id, owner)
+            )
+            self._conn.commit()
+
+    def save_checkpoint(self, job_id: str, step: str, payload: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO book_job_checkpoints (job_id, step, payload, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, step, json.dumps(payload), time.time())
+            )
+            self._conn.commit()
+
+    def load_checkpoints(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT step, payload FROM book_job_checkpoints WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return {step: json.loads(payload) for step, payload in rows}
+
+
+class BookJobScheduler:
+    """
+    Generate every chapter of a story server-side from its outline.
+
+    Chapters do not wait for each other: each one is written from its own outline summary plus
+    the neighbouring outline summaries, up to `max_parallel_chapters` at a time. Each finished
+    chapter is saved on the story right away; the rolling summary still folds them in chapter
+    order, picking up every chapter that finished early once the one before it arrives. Once all chapters
+    exist, a cheap stitching pass rewrites the opening of every chapter after the first so it
+    follows on from the actual ending of the chapter before it.
+
+    Jobs can also start from a bare idea, in which case the seed summary and the outline are
+    generated first. Each step is checkpointed in the JobStore and skipped when a job resumes.
+    """
+
+    def __init__(self, generator: StoryGenerator, store: Optional[JobStore] = None,
+                 max_parallel_chapters: Optional[int] = None, lease_seconds: float = 120.0):
+        self.generator = generator
+        self.store = store or JobStore(os.getenv(
+            "BOOK_JOB_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "book_jobs.db")
+        ))
+        self.max_parallel_chapters = max_parallel_chapters or int(os.getenv("BOOK_JOB_MAX_PARALLEL_CHAPTERS", "4"))
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.jobs: Dict[str, BookJob] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._tasks = set()
+
+    def submit(self, story_id: str, writing_style: Optional[str] = None, target_word_count: Optional[int] = None,
+               max_parallel_chapters: Optional[int] = None) -> BookJob:
+        """Start a job for a story whose outline was stored by store_chapter_outlines"""
+        story = self.generator.get_story(story_id)
+        memory = self.generator.get_memory(story_id)
+        if not story or not memory:
+            raise KeyError(f"Story with ID {story_id} not found")
+        outlines = memory.get_chapter_outlines()
+        if not outlines:
+            raise ValueError(f"Story {story_id} has no stored chapter outlines")
+
+        job = BookJob(
+            story_id=story_id,
+            title=story.title,
+            genre=story.genre,
+            target_chapters=len(outlines),
+            chapter_outlines=outlines,
+            writing_style=writing_style or story.writing_style,
+            target_word_count=target_word_count or story.target_chapter_length,
+            max_parallel_chapters=max_parallel_chapters or self.max_parallel_chapters,
+            total_chapters=len(outlines)
+        )
+        return self._start(job)
+
+    def submit_from_idea(self, title: str, genre: str, idea: str, target_chapters: int,
+                         writing_style: str = "default", target_word_count: Optional[int] = None,
+                         max_parallel_chapters: Optional[int] = None) -> BookJob:
+        """Start a job that generates the seed summary and outline before the chapters"""
+        story = self.generator.create_story(title=title, genre=genre, style=writing_style)
+        job = BookJob(
+            story_id=story.id,
+            title=title,
+            genre=genre,
+            idea=idea,
+            target_chapters=target_chapters,
+            writing_style=writing_style,
+            target_word_count=target_word_count or story.target_chapter_length,
+            max_parallel_chapters=max_parallel_chapters or self.max_parallel_chapters,
+            total_chapters=target_chapters
+        )
+        return self._start(job)
+
+    def _start(self, job: BookJob) -> BookJob:
+        self.store.save_job(job)
+        if not self.store.claim(job.id, self.worker_id, self.lease_seconds):
+            return job
+        self.jobs[job.id] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def retry(self, job_id: str) -> BookJob:
+        """
+        Run a failed job again. Steps it checkpointed before failing (seed, outline, finished
+        chapters and stitches) are reused, so only the missing work is generated.
+        """
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(f"Book job {job_id} not found")
+        if job.status != "failed":
+            raise ValueError(f"Book job {job_id} is {job.status}; only failed jobs can be retried")
+        job.status = "queued"
+        job.error = None
+        job.update_timestamp()
+        return self._start(job)
+
+    def resume_unfinished(self) -> List[BookJob]:
+        """Pick up jobs a previous worker left unfinished; call once the event loop is running"""
+        resumed = []
+        for job in self.store.unfinished_jobs():
+            if job.id in self.jobs:
+                continue
+            if self.store.claim(job.id, self.worker_id, self.lease_seconds):
+                print(f"Resuming book job {job.id} (status {job.status})")
+                job.resumed_count += 1
+                self.jobs[job.id] = job
+                task = asyncio.create_task(self._run(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                resumed.append(job)
+        return resumed
+
+    def start_resume_loop(self, interval_seconds: Optional[float] = None):
+        """
+        Resume unfinished jobs now and keep checking periodically, so jobs whose previous worker
+        died mid-lease are picked up once that lease expires
+        """
+        async def loop():
+            while True:
+                try:
+                    self.resume_unfinished()
+                except Exception as e:
+                    print(f"Error resuming book jobs: {e}")
+                await asyncio.sleep(interval_seconds or self.lease_seconds / 2)
+
+        task = asyncio.create_task(loop())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def get(self, job_id: str) -> Optional[BookJob]:
+        return self.jobs.get(job_id) or self.store.load_job(job_id)
+
+    def _publish(self, job: BookJob, event: Dict[str, Any]):
+        job.update_timestamp()
+        self.store.save_job(job)
+        for queue in self._subscribers.get(job.id, []):
+            queue.put_nowait({"job_id": job.id, "status": job.status, **event})
+
+    async def events(self, job_id: str):
+        """Yield a snapshot of the job, then its progress events until it finishes"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            # Running in another worker (or already finished): follow it through the store
+            job = self.store.load_job(job_id)
+            yield {"event": "snapshot", **job.model_dump()}
+            while not job.is_finished():
+                await asyncio.sleep(2)
+                latest = self.store.load_job(job_id)
+                if latest.updated_at != job.updated_at:
+                    yield {"event": "snapshot", **latest.model_dump()}
+                job = latest
+            return
+
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        try:
+            yield {"event": "snapshot", **job.model_dump()}
+            while not job.is_finished():
+                event = await queue.get()
+                yield event
+                if event["event"] in ("completed", "failed"):
+                    break
+        finally:
+            self._subscribers[job_id].remove(queue)
+
+    async def _heartbeat(self, job: BookJob):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            self.store.renew(job.id, self.worker_id, self.lease_seconds)
+
+    def _ensure_story(self, job: BookJob):
+        """Recreate the in-memory story when the job resumes in a fresh process"""
+        if not self.generator.get_story(job.story_id):
+            self.generator.create_story(title=job.title, genre=job.genre, style=job.writing_style, story_id=job.story_id)
+        if job.chapter_outlines and not self.generator.get_memory(job.story_id).get_chapter_outlines():
+            self.generator.store_chapter_outlines(job.story_id, job.chapter_outlines)
+
+    async def _plan(self, job: BookJob, checkpoints: Dict[str, Dict[str, Any]]):
+        """Produce the seed summary and outline for idea-based jobs, reusing checkpoints"""
+        if job.chapter_outlines:
+            return
+
+        if "seed" in checkpoints:
+            job.seed_summary = checkpoints["seed"]["summary"]
+        elif not job.seed_summary:
+            job.status = "seeding"
+            self._publish(job, {"event": "seeding"})
+            seed_ideas = await self.generator.generate_seed_ideas(
+                genre=job.genre, idea=job.idea, target_chapters=job.target_chapters, style=job.writing_style
+            )
+            job.seed_summary = seed_ideas[0]
+            self.store.save_checkpoint(job.id, "seed", {"summary": job.seed_summary})
+
+        if "outline" in checkpoints:
+            job.chapter_outlines = checkpoints["outline"]["chapter_outlines"]
+        else:
+            job.status = "outlining"
+            self._publish(job, {"event": "outlining"})
+            job.chapter_outlines = await self.generator.create_detailed_outline(
+                seed_summary=job.seed_summary, genre=job.genre,
+                target_chapters=job.target_chapters, style=job.writing_style
+            )
+            self.store.save_checkpoint(job.id, "outline", {"chapter_outlines": job.chapter_outlines})
+
+        job.total_chapters = len(job.chapter_outlines)
+        self.generator.store_chapter_outlines(job.story_id, job.chapter_outlines)
+        self._publish(job, {"event": "outlined", "total_chapters": job.total_chapters})
+
+    async def _generate_chapter(self, job: BookJob, index: int, checkpoints: Dict[str, Dict[str, Any]],
+                                semaphore: asyncio.Semaphore) -> Chapter:
+        outlines = job.chapter_outlines
+        outline = outlines[index]
+        step = f"chapter:{outline['number']}"
+        if step in checkpoints:
+            chapter = Chapter(**checkpoints[step])
+            if self.generator.store.get_chapter(job.story_id, chapter.number) is None:
+                # Resumed in a fresh process: put the chapter back so the rolling summary can fold past it
+                self.generator.remember_chapter(job.story_id, chapter)
+            return chapter
+
+        previous_outline = outlines[index - 1] if index > 0 else None
+        next_outline = outlines[index + 1] if index + 1 < len(outlines) else None
+        async with semaphore:
+            chapter = await self.generator.generate_chapter(
+                chapter_number=outline["number"],
+                chapter_summary=outline["summary"],
+                writing_style=job.writing_style,
+                previous_chapter_title=previous_outline["title"] if previous_outline else None,
+                previous_chapter_summary=previous_outline["summary"] if previous_outline else None,
+                next_chapter_summary=next_outline["summary"] if next_outline else None,
+                target_word_count=job.target_word_count,
+                story_id=job.story_id
+            )
+        self.store.save_checkpoint(job.id, step, chapter.model_dump())
+        job.completed_chapters = sorted(set(job.completed_chapters + [chapter.number]))
+        self._publish(job, {"event": "chapter", "number": chapter.number, "title": chapter.title,
+                            "word_count": chapter.word_count})
+        return chapter
+
+    async def _stitch(self, job: BookJob, previous_chapter: Chapter, chapter: Chapter,
+                      checkpoints: Dict[str, Dict[str, Any]], semaphore: asyncio.Semaphore) -> Chapter:
+        step = f"stitch:{chapter.number}"
+        if step in checkpoints:
+            return Chapter(**checkpoints[step])
+
+        async with semaphore:
+            stitched = await self.generator.stitch_chapter_boundary(previous_chapter, chapter, job.writing_style)
+        self.store.save_checkpoint(job.id, step, stitched.model_dump())
+        job.stitched_boundaries += 1
+        self._publish(job, {"event": "stitched", "number": chapter.number})
+        return stitched
+
+    async def _run(self, job: BookJob):
+        # Background work: every LLM call of this job queues behind interactive requests
+        llm_priority.set(PRIORITY_BULK)
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        semaphore = asyncio.Semaphore(job.max_parallel_chapters)
+        try:
+            checkpoints = self.store.load_checkpoints(job.id)
+            self._ensure_story(job)
+            await self._plan(job, checkpoints)
+
+            job.status = "generating"
+            self._publish(job, {"event": "started", "total_chapters": job.total_chapters})
+            chapters = await gather_or_cancel(*(
+                self._generate_chapter(job, index, checkpoints, semaphore)
+                for index in range(len(job.chapter_outlines))
+            ))
+            job.completed_chapters = [chapter.number for chapter in chapters]
+
+            # Openings only depend on the untouched endings before them, so boundaries stitch in parallel
+            job.status = "stitching"
+            stitched = await gather_or_cancel(*(
+                self._stitch(job, chapters[index - 1], chapters[index], checkpoints, semaphore)
+                for index in range(1, len(chapters))
+            ))
+            chapters = [chapters[0]] + list(stitched)
+            job.stitched_boundaries = len(stitched)
+
+            # Stitching only rewrites openings: re-index the passages, but do not fold the summary again
+            for chapter in chapters:
+                self.generator.save_chapter(job.story_id, chapter)
+                self.generator.passage_index.add_chapter(job.story_id, chapter.number, chapter.title, chapter.content)
+            story = self.generator.get_story(job.story_id)
+            story.is_complete = True
+            self.generator.save_story(story)
+
+            job.status = "completed"
+            self._publish(job, {"event": "completed", "total_word_count": story.total_word_count()})
+        except Exception as e:
+            print(f"Error in book job {job.id}: {e}")
+            job.status = "failed"
+            job.error = str(e)
+            self._publish(job, {"event": "failed", "error": job.error})
+        finally:
+            heartbeat.cancel()
+            self.store.release(job.id, self.worker_id)
@@ -0,0 +1,122 @@
+import math
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from budget_utils import TokenBudgeter
+from context_utils import split_pieces
+
+# generate(prompt, words) runs one completion expected to be about `words` words long
+Generate = Callable[[str, int], Awaitable[str]]
+
+
+class LengthController:
+    """
+    Bring generated text within `tolerance` of its word target without regenerating it.
+
+    Text that is too short gets only the missing words as a continuation; text that is too long
+    gets only its tail condensed. Either result is spliced onto the untouched part. At most
+    `max_rounds` corrections are made per text. Tokens saved are estimated against writing the
+    whole text again, using the budgeter's calibrated words-per-token ratio.
+    """
+
+    def __init__(self, budgeter: TokenBudgeter, tolerance: float = 0.1, max_rounds: int = 2):
+        self.budgeter = budgeter
+        self.tolerance = tolerance
+        self.max_rounds = max_rounds
+        self.counters = {"checked": 0, "extended": 0, "trimmed": 0, "gave_up": 0, "tokens_saved": 0}
+
+    @classmethod
+    def from_env(cls, budgeter: TokenBudgeter) -> "LengthController":
+        return cls(
+            budgeter,
+            tolerance=float(os.getenv("LENGTH_TOLERANCE", "0.1")),
+            max_rounds=int(os.getenv("LENGTH_MAX_CORRECTION_ROUNDS", "2")),
+        )
+
+    def _build_extension_prompt(self, subject: str, text: str, missing_words: int) -> str:
+        tail = " ".join(text.split()[-300:])
+        return f"""
+        Below is the end of {subject}. It is about {missing_words} words shorter than planned.
+
+        ...{tail}
+
+        Continue directly from that point with about {missing_words} more words in the same voice
+        and style, deepening the final scene before closing it naturally. Do not repeat anything,
+        do not add a title or heading, and return only the new text.
+        """
+
+    def _build_trim_prompt(self, subject: str, passage: str, words: int) -> str:
+        return f"""
+        The passage below is the final part of {subject}. Condense it to about {words} words.
+        Keep its events, the essential dialogue and the meaning of its last line; do not add
+        anything new. Return only the condensed passage.
+
+        {passage}
+        """
+
+    def _split_tail(self, text: str, tail_words: int) -> Tuple[str, str, int]:
+        """
+        Split text so the tail holds at least `tail_words` words (and not much more), at a
+        paragraph break if possible and otherwise at a line break or sentence end. The first piece
+        (a title line or the opening) always stays in the head, so it is never rewritten.
+        """
+        split = ("", text, len(text.split()))
+        for pieces in split_pieces(text):
+            count = 0
+            cut = len(pieces)
+            while cut > 1 and count < tail_words:
+                cut -= 1
+                count += len(pieces[cut].split())
+            split = ("".join(pieces[:cut]), "".join(pieces[cut:]), count)
+            if tail_words <= count <= 2 * tail_words:
+                break
+        return split
+
+    def _record_savings(self, target_words: int, generated_words: int, scope: Optional[str]):
+        ratio = self.budgeter.words_per_token(scope)
+        regenerate_tokens = math.ceil(target_words / ratio)
+        correction_tokens = math.ceil(generated_words / ratio)
+        self.counters["tokens_saved"] += max(0, regenerate_tokens - correction_tokens)
+
+    async def correct(self, text: str, target_words: int, generate: Generate, subject: str,
+                      scope: Optional[str] = None, extend: Optional[Generate] = None) -> str:
+        """
+        Return `text` adjusted toward `target_words` with continuation or trim calls.
+        Continuations are written by `extend` when given (e.g. to stream them), else by `generate`.
+        """
+        self.counters["checked"] += 1
+        low = target_words * (1 - self.tolerance)
+        high = target_words * (1 + self.tolerance)
+
+        for _ in range(self.max_rounds):
+            words = len(text.split())
+            if low <= words <= high:
+                return text
+
+            if words < low:
+                missing = target_words - words
+                continuation = (await (extend or generate)(self._build_extension_prompt(subject, text, missing), missing)).strip()
+                if not continuation:
+                    break
+                text = text.rstrip() + "\n\n" + continuation
+                self.counters["extended"] += 1
+                self._record_savings(target_words, len(continuation.split()), scope)
+            else:
+                excess = words - target_words
+                head, tail, tail_words = self._split_tail(text, max(2 * excess, 150))
+                condensed_words = max(tail_words - excess, 1)
+                condensed = (await generate(self._build_trim_prompt(subject, tail, condensed_words), condensed_words)).strip()
+                if not condensed:
+                    break
+                # Rejoined with the same kind of break (paragraph, line or space) the text was cut at
+                separator = head[len(head.rstrip()):].lstrip(" \t") or " "
+                text = (head.rstrip() + separator + condensed) if head else condensed
+                self.counters["trimmed"] += 1
+                self._record_savings(target_words, len(condensed.split()), scope)
+
+        if not low <= len(text.split()) <= high:
+            self.counters["gave_up"] += 1
+        return text
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "tolerance": self.tolerance, "max_rounds": self.max_rounds}
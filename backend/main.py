@@ -1,6 +1,8 @@
 from fastapi import FastAPI, Request
+import asyncio
+import os
 from fastapi.middleware.cors import CORSMiddleware
-from routes.story_routes import story_router
+from routes.story_routes import story_router, story_generator, book_jobs, pdf_render_pool
 
 app = FastAPI()
 
@@ -19,3 +21,25 @@ app.include_router(story_router, prefix="/api/story")
 def read_root():
     return {"message": "FastAPI is running"}
 
+@app.on_event("startup")
+async def resume_book_jobs():
+    # Pick up whole-book jobs that a previous worker left unfinished
+    book_jobs.start_resume_loop()
+
+@app.on_event("startup")
+async def warm_image_client():
+    # Opt-in: set up the Gemini client in the background so the first cover request is not slower
+    if os.getenv("GEMINI_PREWARM", "false").lower() in ("1", "true", "yes"):
+        async def warm():
+            try:
+                await story_generator.warm_image_client()
+            except Exception as e:
+                print(f"Could not warm up the image client: {e}")
+        app.state.image_client_warmup = asyncio.create_task(warm())
+
+@app.on_event("shutdown")
+async def close_story_generator():
+    await story_generator.aclose()
+    # Flushes the write-behind snapshot of in-memory stories when it is enabled
+    story_generator.store.close()
+    pdf_render_pool.shutdown()
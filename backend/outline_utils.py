@@ -0,0 +1,114 @@
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+_FENCE = re.compile(r"```[a-zA-Z]*")
+
+
+def strip_code_fences(text: str) -> str:
+    return _FENCE.sub("", text)
+
+
+def normalize_chapter(item: Any, titles: Optional[Dict[int, str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    A chapter outline with an int number, a title and a summary, or None if `item` is not one.
+    A missing title is taken from `titles` (by chapter number) before falling back to "Chapter N".
+    """
+    if not isinstance(item, dict) or not item.get("summary"):
+        return None
+    try:
+        number = int(str(item.get("number", "")).strip())
+    except ValueError:
+        return None
+    title = item.get("title") or (titles or {}).get(number) or f"Chapter {number}"
+    return {**item, "number": number, "title": str(title), "summary": str(item["summary"])}
+
+
+class ChapterStreamParser:
+    """
+    Incremental parser for outline JSON that arrives in chunks.
+
+    It tracks string and nesting state across feed() calls and returns each chapter object as
+    soon as its closing brace arrives. Chapters are the objects that sit directly in an array, so
+    both {"chapters": [...]} and a bare [...] work. Code fences and prose outside the JSON are
+    skipped, and a response cut off mid-array still yields every chapter completed before the cut.
+    """
+
+    def __init__(self, titles: Optional[Dict[int, str]] = None):
+        self.titles = titles
+        self._text = ""
+        self._position = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._start: Optional[int] = None
+        self._start_depth = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        chapters = []
+        text = self._text + chunk
+        for index in range(self._position, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif not self._stack and char not in "{[":
+                # Prose or a code fence before (or between) JSON values
+                continue
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if char == "{" and self._start is None and self._stack and self._stack[-1] == "[":
+                    self._start = index
+                    self._start_depth = len(self._stack)
+                self._stack.append(char)
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                if char == "}" and self._start is not None and len(self._stack) == self._start_depth:
+                    chapter = self._parse(text[self._start:index + 1])
+                    self._start = None
+                    if chapter:
+                        chapters.append(chapter)
+
+        # Only the chapter object still being written needs to be kept
+        keep = self._start if self._start is not None else len(text)
+        self._text = text[keep:]
+        self._position = len(self._text)
+        if self._start is not None:
+            self._start = 0
+        return chapters
+
+    def _parse(self, raw: str) -> Optional[Dict[str, Any]]:
+        try:
+            return normalize_chapter(json.loads(raw), self.titles)
+        except ValueError:
+            return None
+
+
+def salvage_chapters(text: str, titles: Optional[Dict[int, str]] = None) -> List[Dict[str, Any]]:
+    """
+    Every chapter object that can be recovered from a complete or cut-off outline response,
+    with missing titles filled from `titles` as in normalize_chapter
+    """
+    cleaned = strip_code_fences(text).strip()
+    try:
+        data = json.loads(cleaned)
+        items = data.get("chapters", []) if isinstance(data, dict) else data
+        if isinstance(items, list):
+            return [chapter for chapter in (normalize_chapter(item, titles) for item in items) if chapter]
+    except ValueError:
+        pass
+    return ChapterStreamParser(titles).feed(cleaned)
+
+
+def merge_chapters(chapters: Iterable[Dict[str, Any]], target_chapters: int) -> Dict[int, Dict[str, Any]]:
+    """Chapters keyed by number, first one wins, dropping numbers outside 1..target_chapters"""
+    merged: Dict[int, Dict[str, Any]] = {}
+    for chapter in chapters:
+        if 1 <= chapter["number"] <= target_chapters and chapter["number"] not in merged:
+            merged[chapter["number"]] = chapter
+    return merged
@@ -2,9 +2,255 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Image
 from reportlab.lib.enums import TA_CENTER
+from reportlab.pdfbase.pdfmetrics import stringWidth
 import io
-import base64
-from typing import Dict, List, Any, Optional
+import os
+import re
+import json
+import hashlib
+import asyncio
+import functools
+import time
+from xml.sax.saxutils import escape
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+from image_utils import get_cover_processor
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+except ImportError:  # Without pypdf every export is laid out in one pass, as before
+    PdfReader = PdfWriter = None
+
+# Bump whenever styles or section layout change so cached fragments are not reused
+PDF_LAYOUT_VERSION = "2"
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+@functools.lru_cache(maxsize=1)
+def get_pdf_styles() -> Dict[str, ParagraphStyle]:
+    """Build the document styles once per process and reuse them for every export"""
+    styles = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle(name="Title", parent=styles["Title"], alignment=TA_CENTER, fontSize=24, spaceAfter=20),
+        "heading": ParagraphStyle(name="Heading", parent=styles["Heading2"], fontSize=16, spaceAfter=10),
+        "normal": styles["Normal"],
+        "body": ParagraphStyle(name="Body", parent=styles["Normal"], leading=14, spaceAfter=6),
+    }
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """
+    Split chapter text into paragraphs.
+    
+    Blank lines separate paragraphs. Text without any blank line but with single newlines
+    (a common LLM output shape) is split on those instead, and line wraps inside a paragraph
+    are folded into spaces.
+    """
+    text = (text or "").replace("\r\n", "\n").strip()
+    if not text:
+        return []
+    blocks = _PARAGRAPH_BREAK.split(text)
+    if len(blocks) == 1:
+        blocks = text.split("\n")
+    return [" ".join(block.split()) for block in blocks if block.strip()]
+
+
+def text_flowables(text: str, style: ParagraphStyle) -> List[Paragraph]:
+    """One escaped Paragraph per paragraph of text, so reportlab wraps and splits small pieces"""
+    return [Paragraph(escape(paragraph), style) for paragraph in split_paragraphs(text)]
+
+
+def front_matter_flowables(
+    title: str,
+    genre: str,
+    setting: str,
+    cover_image_url: Optional[str] = None,
+    cover_blob: Optional[Tuple[str, str]] = None
+) -> List[Any]:
+    styles = get_pdf_styles()
+    content = [
+        Paragraph(escape(title or ""), styles["title"]),
+        Paragraph(f"Genre: {escape(genre or '')}", styles["normal"]),
+        Paragraph(f"Setting: {escape(setting or '')}", styles["normal"]),
+    ]
+    
+    # Add cover image if provided, downscaled and recompressed once and reused from the cover cache
+    if cover_blob or cover_image_url:
+        try:
+            processor = get_cover_processor()
+            jpeg_bytes = None
+            if cover_blob:
+                jpeg_bytes = processor.process_blob(*cover_blob)
+            elif cover_image_url.startswith('data:image'):
+                jpeg_bytes = processor.process_data_url(cover_image_url)
+            if jpeg_bytes:
+                width, height = processor.draw_size(jpeg_bytes)
+                content.append(Spacer(1, 20))
+                content.append(Image(io.BytesIO(jpeg_bytes), width=width, height=height))
+                content.append(Spacer(1, 20))
+        except Exception as e:
+            print(f"Error adding cover image: {e}")
+    
+    content.append(PageBreak())
+    return content
+
+
+def chapter_flowables(chapter: Dict[str, Any]) -> List[Any]:
+    styles = get_pdf_styles()
+    content = [Paragraph(f"Chapter: {escape(chapter.get('title', 'Untitled Chapter'))}", styles["heading"])]
+    content.extend(text_flowables(chapter.get('content', ''), styles["body"]))
+
+    content.append(Spacer(1, 12))
+    content.append(Paragraph(f"Chapter Summary: {escape(chapter.get('summary', '') or '')}", styles["normal"]))
+    content.append(Spacer(1, 12))
+    content.append(Paragraph(f"Word Count: {chapter.get('word_count', 0)}", styles["normal"]))
+    content.append(PageBreak())
+    return content
+
+
+def characters_flowables(characters: Any) -> List[Any]:
+    styles = get_pdf_styles()
+    content = [Paragraph("Characters", styles["heading"])]
+    if isinstance(characters, dict):
+        for name, description in characters.items():
+            content.append(Paragraph(f"<b>{escape(str(name))}</b>: {escape(str(description))}", styles["normal"]))
+            content.append(Spacer(1, 6))
+    elif isinstance(characters, str):
+        content.extend(text_flowables(characters, styles["normal"]))
+    content.append(PageBreak())
+    return content
+
+
+def _draw_page_number(canvas, doc):
+    canvas.saveState()
+    canvas.setFont("Helvetica", 9)
+    canvas.drawCentredString(A4[0] / 2, 20, str(doc.page - 1))
+    canvas.restoreState()
+
+
+def _build_document(flowables: List[Any], number_pages: bool = False, output: Optional[str] = None) -> Optional[bytes]:
+    """Build flowables into a PDF written to `output` when given, otherwise returned as bytes"""
+    target = output or io.BytesIO()
+    doc = SimpleDocTemplate(target, pagesize=A4)
+    if number_pages:
+        # The cover is page one and goes unnumbered, so chapters start at page 1
+        doc.build(flowables, onLaterPages=_draw_page_number)
+    else:
+        doc.build(flowables)
+    if output is not None:
+        return None
+    pdf_bytes = target.getvalue()
+    target.close()
+    return pdf_bytes
+
+
+class PdfFragmentCache:
+    """
+    Rendered PDF fragments (cover, one per chapter, characters page) stored on disk by content hash.
+    
+    The cache lives in a directory rather than in memory so every PdfRenderPool worker process
+    shares it. Keys cover the fragment text plus PDF_LAYOUT_VERSION, so changing styles or layout
+    only needs a version bump. The least recently used files are pruned beyond `max_entries`.
+    """
+    def __init__(self, directory: str, max_entries: int = 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["PdfFragmentCache"]:
+        """Build the cache from PDF_FRAGMENT_CACHE_DIR (empty disables it) and PDF_FRAGMENT_CACHE_MAX_ENTRIES"""
+        default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "pdf_fragments")
+        directory = os.getenv("PDF_FRAGMENT_CACHE_DIR", default_dir)
+        if not directory or PdfWriter is None:
+            return None
+        return cls(directory, max_entries=int(os.getenv("PDF_FRAGMENT_CACHE_MAX_ENTRIES", "1024")))
+
+    @staticmethod
+    def make_key(kind: str, payload: Dict[str, Any]) -> str:
+        body = json.dumps({"kind": kind, "layout": PDF_LAYOUT_VERSION, **payload}, sort_keys=True, default=str)
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                fragment = f.read()
+            os.utime(path)
+            return fragment
+        except OSError:
+            return None
+
+    def set(self, key: str, fragment: bytes):
+        path = self._path(key)
+        # Write then rename so a worker never reads a half-written fragment
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(fragment)
+        os.replace(tmp_path, path)
+        self._prune()
+
+    def _prune(self):
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".pdf")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+@functools.lru_cache(maxsize=1)
+def get_fragment_cache() -> Optional[PdfFragmentCache]:
+    return PdfFragmentCache.from_env()
+
+
+def _number_pages(writer: "PdfWriter"):
+    """
+    Stamp page numbers onto merged fragments, matching _draw_page_number on single builds.
+    
+    The number is appended to each page's own content stream instead of merging an overlay
+    page, which would re-parse every page and cost more than the fragments saved.
+    """
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for number, page in enumerate(writer.pages[1:], start=1):
+        label = str(number)
+        x = (A4[0] - stringWidth(label, "Helvetica", 9)) / 2
+        stream = DecodedStreamObject()
+        stream.set_data(
+            b"q\n" + page.get_contents().get_data()
+            + b"\nQ\nBT /PageNumberFont 9 Tf %.2f 20 Td (%s) Tj ET\n" % (x, label.encode("ascii"))
+        )
+        resources = page[NameObject("/Resources")].get_object()
+        fonts = resources.setdefault(NameObject("/Font"), DictionaryObject()).get_object()
+        fonts[NameObject("/PageNumberFont")] = font
+        page.replace_contents(stream)
+        page.compress_content_streams()
+
+
+def _merge_fragments(fragments: List[bytes], output: Optional[str] = None) -> Optional[bytes]:
+    writer = PdfWriter()
+    for fragment in fragments:
+        writer.append(PdfReader(io.BytesIO(fragment)))
+    _number_pages(writer)
+    if output is not None:
+        writer.write(output)
+        return None
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
 
 def generate_pdf_from_chapters(
     title: str,
@@ -12,8 +258,11 @@ def generate_pdf_from_chapters(
     setting: str,
     chapters: List[Dict[str, Any]],
     characters: Dict[str, str],
-    cover_image_url: Optional[str] = None
-) -> bytes:
+    cover_image_url: Optional[str] = None,
+    cover_blob: Optional[Tuple[str, str]] = None,
+    fragment_cache: Optional[PdfFragmentCache] = None,
+    output: Optional[str] = None
+) -> Optional[bytes]:
     """
     Generate a PDF from chapter data
     
@@ -24,71 +273,214 @@ def generate_pdf_from_chapters(
         chapters (List[Dict[str, Any]]): List of chapter data
         characters (Dict[str, str]): Dictionary of character names and descriptions
         cover_image_url (Optional[str]): URL or base64 of the cover image
+        cover_blob (Optional[Tuple[str, str]]): Blob id and path of a cover in the BlobStore,
+            used instead of cover_image_url
+        fragment_cache (Optional[PdfFragmentCache]): Cache of rendered sections; defaults to the
+            one configured by PDF_FRAGMENT_CACHE_DIR
+        output (Optional[str]): File path to write the PDF to instead of returning it
         
     Returns:
-        bytes: The PDF file as bytes
+        Optional[bytes]: The PDF file as bytes, or None when it was written to `output`
     """
-    # Create a buffer to store the PDF
-    buffer = io.BytesIO()
-    
-    # Create the PDF document
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    content = []
+    fragment_cache = fragment_cache or get_fragment_cache()
+    sections = [(
+        "front",
+        {
+            "title": title, "genre": genre, "setting": setting,
+            "cover_image_url": cover_image_url, "cover_blob": cover_blob[0] if cover_blob else None
+        },
+        lambda: front_matter_flowables(title, genre, setting, cover_image_url, cover_blob)
+    )]
+    for chapter in chapters:
+        chapter_payload = {
+            field: chapter.get(field) for field in ("title", "content", "summary", "word_count")
+        }
+        sections.append(("chapter", chapter_payload, functools.partial(chapter_flowables, chapter)))
+    sections.append(("characters", {"characters": characters}, lambda: characters_flowables(characters)))
 
-    # Custom styles
-    title_style = ParagraphStyle(name="Title", parent=styles["Title"], alignment=TA_CENTER, fontSize=24, spaceAfter=20)
-    header_style = ParagraphStyle(name="Heading", parent=styles["Heading2"], fontSize=16, spaceAfter=10)
-    normal_style = styles["Normal"]
+    if fragment_cache is None:
+        content = []
+        for _, _, build_flowables in sections:
+            content.extend(build_flowables())
+        return _build_document(content, number_pages=True, output=output)
 
-    # ===== FRONT COVER =====
-    content.append(Paragraph(title, title_style))
-    content.append(Paragraph(f"Genre: {genre}", normal_style))
-    content.append(Paragraph(f"Setting: {setting}", normal_style))
+    # Each section renders as its own small document; unchanged ones come straight from the cache
+    fragments = []
+    rendered = 0
+    for kind, payload, build_flowables in sections:
+        key = PdfFragmentCache.make_key(kind, payload)
+        fragment = fragment_cache.get(key)
+        if fragment is None:
+            fragment = _build_document(build_flowables())
+            fragment_cache.set(key, fragment)
+            rendered += 1
+        fragments.append(fragment)
+    print(f"PDF export: rendered {rendered} of {len(sections)} sections, {len(sections) - rendered} from cache")
+    return _merge_fragments(fragments, output=output)
+
+
+class PdfExportStore:
+    """
+    Finished PDF exports on disk, named by a hash of everything that went into them.
     
-    # Add cover image if provided
-    if cover_image_url:
+    Exporting the same book twice reuses the file, and a stored export can be re-downloaded
+    by id in byte ranges. The least recently used exports are deleted beyond `max_entries`.
+    """
+    _EXPORT_ID = re.compile(r"[0-9a-f]{64}")
+
+    def __init__(self, directory: str, max_entries: int = 64):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "PdfExportStore":
+        """Build the store from PDF_EXPORT_DIR and PDF_EXPORT_MAX_ENTRIES"""
+        default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "pdf_exports")
+        return cls(
+            os.getenv("PDF_EXPORT_DIR") or default_dir,
+            max_entries=int(os.getenv("PDF_EXPORT_MAX_ENTRIES", "64"))
+        )
+
+    @staticmethod
+    def make_id(payload: Dict[str, Any]) -> str:
+        body = json.dumps({"layout": PDF_LAYOUT_VERSION, **payload}, sort_keys=True, default=str)
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    def path(self, export_id: str) -> str:
+        if not self._EXPORT_ID.fullmatch(export_id):
+            raise ValueError(f"Invalid export id: {export_id}")
+        return os.path.join(self.directory, f"{export_id}.pdf")
+
+    def get(self, export_id: str) -> Optional[str]:
+        """Path of a stored export, or None if it was never rendered or has been pruned"""
+        path = self.path(export_id)
         try:
-            # Handle base64 image
-            if cover_image_url.startswith('data:image'):
-                img_data = cover_image_url.split(',')[1]
-                img_bytes = base64.b64decode(img_data)
-                img_buffer = io.BytesIO(img_bytes)
-                img = Image(img_buffer, width=400, height=300)
-                content.append(Spacer(1, 20))
-                content.append(img)
-                content.append(Spacer(1, 20))
-        except Exception as e:
-            print(f"Error adding cover image: {e}")
-    
-    content.append(PageBreak())
+            os.utime(path)
+        except OSError:
+            return None
+        return path
 
-    # ===== CHAPTER CONTENT =====
-    for chapter in chapters:
-        content.append(Paragraph(f"Chapter: {chapter.get('title', 'Untitled Chapter')}", header_style))
-        content.append(Paragraph(chapter.get('content', ''), normal_style))
+    def staging_path(self, export_id: str) -> str:
+        return f"{self.path(export_id)}.{os.getpid()}.{time.monotonic_ns()}.tmp"
 
-        content.append(Spacer(1, 12))
-        content.append(Paragraph(f"Chapter Summary: {chapter.get('summary', '')}", normal_style))
-        content.append(Spacer(1, 12))
-        content.append(Paragraph(f"Word Count: {chapter.get('word_count', 0)}", normal_style))
-        content.append(PageBreak())
+    def commit(self, staging_path: str, export_id: str) -> str:
+        path = self.path(export_id)
+        os.replace(staging_path, path)
+        self._prune()
+        return path
 
-    # ===== CHARACTERS =====
-    content.append(Paragraph("Characters", header_style))
-    if isinstance(characters, dict):
-        for name, description in characters.items():
-            content.append(Paragraph(f"<b>{name}</b>: {description}", normal_style))
-            content.append(Spacer(1, 6))
-    elif isinstance(characters, str):
-        content.append(Paragraph(characters, normal_style))
-    content.append(PageBreak())
+    def _prune(self):
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".pdf")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
 
-    # ===== BUILD PDF =====
-    doc.build(content)
-    
-    # Get the PDF bytes
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
+
+class PdfRenderPoolSaturated(Exception):
+    """Raised when too many PDF renders are already running or queued"""
+    def __init__(self, pending: int, retry_after: int):
+        super().__init__(f"PDF renderer is busy ({pending} exports in progress), retry in {retry_after}s")
+        self.pending = pending
+        self.retry_after = retry_after
+
+
+class PdfRenderPool:
+    """
+    Run generate_pdf_from_chapters in worker processes so rendering never blocks the event loop.
     
-    return pdf_bytes 
\ No newline at end of file
+    At most `max_workers` documents render at once and at most `max_queue` more wait for a worker;
+    beyond that render() and export() raise PdfRenderPoolSaturated so the route can answer 503
+    right away instead of piling up work.
+    """
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queue: int = 4,
+        retry_after: int = 5,
+        exports: Optional[PdfExportStore] = None
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.exports = exports
+        self.pending = 0
+        self.counters = {"rendered": 0, "failed": 0, "rejected": 0, "export_hits": 0}
+        self._executor = None
+
+    @classmethod
+    def from_env(cls) -> "PdfRenderPool":
+        return cls(
+            max_workers=int(os.getenv("PDF_RENDER_WORKERS", str(min(2, os.cpu_count() or 1)))),
+            max_queue=int(os.getenv("PDF_RENDER_MAX_QUEUE", "4")),
+            retry_after=int(os.getenv("PDF_RENDER_RETRY_AFTER_SECONDS", "5")),
+            exports=PdfExportStore.from_env()
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created on first use so importing this module never forks worker processes
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def _submit(self, **kwargs) -> Optional[bytes]:
+        if self.pending >= self.max_workers + self.max_queue:
+            self.counters["rejected"] += 1
+            raise PdfRenderPoolSaturated(self.pending, self.retry_after)
+        
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._get_executor(), functools.partial(generate_pdf_from_chapters, **kwargs)
+            )
+            self.counters["rendered"] += 1
+            return result
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+        finally:
+            self.pending -= 1
+
+    async def render(self, **kwargs) -> bytes:
+        """Render a PDF in the pool; takes the same keyword arguments as generate_pdf_from_chapters"""
+        return await self._submit(**kwargs)
+
+    async def export(self, **kwargs) -> str:
+        """
+        Render a PDF straight to a file in the export store and return its export id.
+        
+        The worker writes the document to disk, so it never travels back through the event loop
+        as one large bytes object. An identical earlier export is reused without rendering.
+        """
+        export_id = self.exports.make_id(kwargs)
+        if self.exports.get(export_id) is not None:
+            self.counters["export_hits"] += 1
+            return export_id
+
+        staging_path = self.exports.staging_path(export_id)
+        try:
+            await self._submit(output=staging_path, **kwargs)
+            self.exports.commit(staging_path, export_id)
+        finally:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+        return export_id
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "pending": self.pending,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
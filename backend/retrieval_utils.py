@@ -0,0 +1,276 @@
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from context_utils import fit_to_tokens
+from governor_utils import estimate_tokens
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset("""
+a about after again against all am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers herself
+him himself his how i if in into is it its itself just me more most my myself no nor not now of off on once only
+or other our ours out over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which while who whom why
+will with would you your yours yourself said says say
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS and len(token) > 1]
+
+
+def split_passages(text: str, min_words: int = 40) -> List[str]:
+    """Split chapter text into paragraphs, merging short ones (dialogue lines) into passages of `min_words` or more"""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    if len(paragraphs) <= 1:
+        paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
+    passages = []
+    current = []
+    words = 0
+    for paragraph in paragraphs:
+        current.append(paragraph)
+        words += len(paragraph.split())
+        if words >= min_words:
+            passages.append("\n".join(current))
+            current, words = [], 0
+    if current:
+        if passages and words < min_words // 2:
+            passages[-1] += "\n" + "\n".join(current)
+        else:
+            passages.append("\n".join(current))
+    return passages
+
+
+def chapter_fingerprint(title: str, content: str) -> str:
+    return hashlib.sha1(f"{title}\n{content}".encode("utf-8")).hexdigest()[:16]
+
+
+class PassageIndex:
+    """
+    BM25 inverted index over the passages of one story's chapters.
+
+    Chapters are added (or replaced) one at a time, touching only the postings of their own
+    passages, so keeping the index current as chapters arrive costs one tokenization of the new
+    chapter. A search only scores passages that share a term with the query.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.passages: Dict[int, Tuple[int, str, int]] = {}  # id -> (chapter, text, length in terms)
+        self.postings: Dict[str, Dict[int, int]] = {}         # term -> {passage id: term frequency}
+        self.chapters: Dict[int, List[int]] = {}              # chapter -> passage ids
+        self.fingerprints: Dict[int, str] = {}
+        self.total_length = 0
+        self._next_id = 0
+
+    def remove_chapter(self, number: int):
+        for passage_id in self.chapters.pop(number, []):
+            _, text, length = self.passages.pop(passage_id)
+            self.total_length -= length
+            for term in set(tokenize(text)):
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(passage_id, None)
+                    if not postings:
+                        del self.postings[term]
+        self.fingerprints.pop(number, None)
+
+    def add_chapter(self, number: int, title: str, content: str) -> bool:
+        """Index a chapter, replacing an older version of it; False if it was already indexed as is"""
+        fingerprint = chapter_fingerprint(title, content)
+        if self.fingerprints.get(number) == fingerprint:
+            return False
+        self.remove_chapter(number)
+        self._add_passages(number, split_passages(content))
+        self.fingerprints[number] = fingerprint
+        return True
+
+    def _add_passages(self, number: int, texts: List[str]):
+        ids = []
+        for text in texts:
+            terms = tokenize(text)
+            passage_id = self._next_id
+            self._next_id += 1
+            self.passages[passage_id] = (number, text, len(terms))
+            self.total_length += len(terms)
+            for term, count in Counter(terms).items():
+                self.postings.setdefault(term, {})[passage_id] = count
+            ids.append(passage_id)
+        self.chapters[number] = ids
+
+    def search(self, query: str, top_k: int = 5, before_chapter: Optional[int] = None) -> List[Tuple[float, int, str]]:
+        """Best (score, chapter, passage) matches for `query`, optionally only from chapters before `before_chapter`"""
+        if not self.passages:
+            return []
+        count = len(self.passages)
+        average_length = self.total_length / count or 1.0
+        scores: Dict[int, float] = {}
+        for term, query_count in Counter(tokenize(query)).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for passage_id, frequency in postings.items():
+                length = self.passages[passage_id][2]
+                norm = frequency * (self.k1 + 1) / (frequency + self.k1 * (1 - self.b + self.b * length / average_length))
+                scores[passage_id] = scores.get(passage_id, 0.0) + idf * norm * query_count
+        if before_chapter is not None:
+            scores = {pid: score for pid, score in scores.items() if self.passages[pid][0] < before_chapter}
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(score, self.passages[pid][0], self.passages[pid][1]) for pid, score in best]
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Postings are rebuilt on load; storing the passages keeps the file close to the text size
+        return {
+            "chapters": {
+                number: [self.passages[pid][1] for pid in ids] for number, ids in self.chapters.items()
+            },
+            "fingerprints": self.fingerprints,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PassageIndex":
+        index = cls()
+        fingerprints = {int(k): v for k, v in data.get("fingerprints", {}).items()}
+        for number, texts in data.get("chapters", {}).items():
+            number = int(number)
+            index._add_passages(number, texts)
+            if number in fingerprints:
+                index.fingerprints[number] = fingerprints[number]
+        return index
+
+
+class PassageIndexStore:
+    """
+    Per-story PassageIndex objects, kept in a small LRU and written as JSON next to the other
+    story data so a restarted or different worker loads them instead of re-indexing every chapter.
+    sync() brings an index in line with a story's stored chapters, indexing only changed ones;
+    recall() turns the best `top_k` matches into a prompt section of at most `context_tokens`.
+    """
+    _STORY_ID = re.compile(r"[A-Za-z0-9_-]+")
+
+    def __init__(self, directory: Optional[str] = None, max_resident: int = 32, top_k: int = 5,
+                 context_tokens: int = 800):
+        self.directory = directory
+        self.max_resident = max_resident
+        self.top_k = top_k
+        self.context_tokens = context_tokens
+        self._indexes: "OrderedDict[str, PassageIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"loads": 0, "chapters_indexed": 0, "searches": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "PassageIndexStore":
+        """Build the store from PASSAGE_INDEX_DIR (empty keeps indexes in memory only) and the STORY_RETRIEVAL_* settings"""
+        default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "passage_index")
+        return cls(
+            os.getenv("PASSAGE_INDEX_DIR", default_dir) or None,
+            max_resident=int(os.getenv("PASSAGE_INDEX_CACHE_SIZE", "32")),
+            top_k=int(os.getenv("STORY_RETRIEVAL_TOP_K", "5")),
+            context_tokens=int(os.getenv("STORY_RETRIEVAL_TOKENS", "800")),
+        )
+
+    def _path(self, story_id: str) -> Optional[str]:
+        if not self.directory or not self._STORY_ID.fullmatch(story_id):
+            return None
+        return os.path.join(self.directory, f"{story_id}.json")
+
+    def get(self, story_id: str) -> PassageIndex:
+        with self._lock:
+            index = self._indexes.get(story_id)
+            if index is not None:
+                self._indexes.move_to_end(story_id)
+                return index
+        index = PassageIndex()
+        path = self._path(story_id)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    index = PassageIndex.from_dict(json.load(f))
+                self.counters["loads"] += 1
+            except (OSError, ValueError) as e:
+                print(f"Could not load passage index of story {story_id}, rebuilding it: {e}")
+        with self._lock:
+            self._indexes[story_id] = index
+            while len(self._indexes) > self.max_resident:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _save(self, story_id: str, index: PassageIndex):
+        path = self._path(story_id)
+        if not path:
+            return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def delete(self, story_id: str):
+        with self._lock:
+            self._indexes.pop(story_id, None)
+        path = self._path(story_id)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def add_chapter(self, story_id: str, number: int, title: str, content: str):
+        index = self.get(story_id)
+        if index.add_chapter(number, title, content):
+            self.counters["chapters_indexed"] += 1
+            self._save(story_id, index)
+
+    def sync(self, story_id: str, chapters: List[Any]) -> PassageIndex:
+        """Index chapters that are new or changed since the index was saved, and drop deleted ones"""
+        index = self.get(story_id)
+        changed = False
+        for chapter in chapters:
+            if index.add_chapter(chapter.number, chapter.title, chapter.content):
+                self.counters["chapters_indexed"] += 1
+                changed = True
+        numbers = {chapter.number for chapter in chapters}
+        for number in [n for n in index.chapters if n not in numbers]:
+            index.remove_chapter(number)
+            changed = True
+        if changed:
+            self._save(story_id, index)
+        return index
+
+    def recall(self, story_id: str, chapters: List[Any], query: str, before_chapter: int) -> str:
+        """Prompt section with the earlier passages that best match `query`, or "" if none do"""
+        if self.top_k <= 0 or self.context_tokens <= 0:
+            return ""
+        index = self.sync(story_id, chapters)
+        self.counters["searches"] += 1
+        hits = index.search(query, top_k=self.top_k, before_chapter=before_chapter)
+        if not hits:
+            return ""
+
+        remaining = self.context_tokens
+        excerpts = []
+        # Shown in story order; the budget is spent on the best matches first
+        for _, number, text in hits:
+            excerpt = fit_to_tokens(text, remaining)
+            if not excerpt:
+                break
+            remaining -= estimate_tokens(excerpt, 0)
+            excerpts.append((number, excerpt))
+        lines = "\n\n".join(f"[Chapter {number}] {excerpt}" for number, excerpt in sorted(excerpts, key=lambda e: e[0]))
+        return f"""
+            Details from earlier chapters to stay consistent with:
+            {lines}
+            """
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            resident = len(self._indexes)
+        return {**self.counters, "resident": resident, "top_k": self.top_k, "context_tokens": self.context_tokens,
+                "directory": self.directory}
@@ -1,17 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
 from pydantic import BaseModel, field_validator
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import os
 from dotenv import load_dotenv
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 import io
+import json
 
 # Import StoryGenerator
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from story_utils import StoryGenerator
-from pdf_utils import generate_pdf_from_chapters
+from pdf_utils import PdfRenderPool, PdfRenderPoolSaturated
+from coalesce_utils import SingleFlight
+from governor_utils import LLMOverloaded
+from job_utils import BookJobScheduler
+from character_utils import parse_character_arcs
 
 # Load environment variables
 load_dotenv()
@@ -24,6 +29,15 @@ if api_key:
 else:
     print("WARNING: No OpenAI API key found. Story generation may fail.")
 
+# Shares one upstream call between duplicate in-flight requests (double clicks, client retries)
+request_coalescer = SingleFlight.from_env()
+
+# Runs whole-book generation jobs in the background of this worker
+book_jobs = BookJobScheduler(story_generator)
+
+# CPU-bound PDF rendering runs in worker processes, away from the event loop
+pdf_render_pool = PdfRenderPool.from_env()
+
 # Router for story-related endpoints
 story_router = APIRouter()
 
@@ -36,6 +50,7 @@ class CharacterDetail(BaseModel):
     personality_traits: Optional[List[str]] = None
     relationships: Optional[Dict[str, str]] = None
     arc_description: Optional[str] = None
+    aliases: Optional[List[str]] = None  # Other names the character goes by in outlines and chapters
 
 class StorySettings(BaseModel):
     narrative_perspective: Optional[str] = None  # "First Person", "Third Person", etc.
@@ -52,6 +67,7 @@ class GenerateSeedIdeasRequest(BaseModel):
     character_count: Optional[int] = None
     characters: Optional[List[CharacterDetail]] = None
     story_settings: StorySettings
+    parallel_summaries: bool = False  # Three concurrent single-summary calls instead of one long call
     
     @field_validator('target_chapter_count')
     def validate_chapter_count(cls, v):
@@ -163,6 +179,7 @@ class GenerateChapterRequest(BaseModel):
     previous_chapter_ending: Optional[str] = None
     next_chapter_summary: Optional[str] = None
     target_word_count: int = 6000
+    story_id: Optional[str] = None  # Build context from this stored story and save the chapter to it
 
 class StoryResponse(BaseModel):
     id: str
@@ -185,11 +202,14 @@ class GenerateBookCoverRequest(BaseModel):
     story_summary: str
     characters: Optional[List[CharacterDetail]] = None
     genre: Optional[str] = None
+    include_image_data: bool = False  # Also return the image inline as base64
 
 class BookCoverResponse(BaseModel):
     """Response model for book cover generation"""
-    image_data: str  # Base64 encoded image
-    mime_type: str   # Mime type of the image
+    cover_id: str                     # Blob id to pass as cover_id when generating a PDF
+    cover_url: str                    # Where the image can be fetched (cacheable)
+    mime_type: str                    # Mime type of the image
+    image_data: Optional[str] = None  # Base64 encoded image, only when include_image_data was set
 
 class GeneratePdfRequest(BaseModel):
     """Request model for PDF generation"""
@@ -199,6 +219,35 @@ class GeneratePdfRequest(BaseModel):
     chapters: List[Dict[str, Any]]
     characters: Dict[str, str]
     cover_image_url: Optional[str] = None
+    cover_id: Optional[str] = None  # Cover from /generate-book-cover, used instead of cover_image_url
+
+class BookJobRequest(BaseModel):
+    """
+    Request model for generating a whole book: either every chapter of a stored story (story_id),
+    or a new book from an idea (title, genre, idea and target_chapter_count)
+    """
+    story_id: Optional[str] = None
+    title: Optional[str] = None
+    genre: Optional[str] = None
+    idea: Optional[str] = None
+    target_chapter_count: Optional[int] = None
+    writing_style: Optional[str] = None
+    target_word_count: Optional[int] = None
+    max_parallel_chapters: Optional[int] = None
+
+    @field_validator('target_chapter_count')
+    def validate_chapter_count(cls, v):
+        if v is not None:
+            if v < 1: raise ValueError('Minimum 1 chapter')
+            if v > 30: raise ValueError('Maximum 30 chapters')
+        return v
+
+    @field_validator('max_parallel_chapters')
+    def validate_max_parallel_chapters(cls, v):
+        if v is not None:
+            if v < 1: raise ValueError('Minimum 1 parallel chapter')
+            if v > 12: raise ValueError('Maximum 12 parallel chapters')
+        return v
 
 class SurpriseMeRequest(BaseModel):
     """Request model for surprise-me story generation"""
@@ -209,24 +258,120 @@ class SurpriseMeRequest(BaseModel):
     target_audience: str
     prompt: str
 
+PDF_CHUNK_SIZE = 64 * 1024
+
+def parse_byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=start-end" Range header into an inclusive (start, end) pair.
+    
+    Returns None when the whole file should be sent (no header, another unit, or several ranges,
+    which the spec lets a server ignore). Raises ValueError when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if not start_text:
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise ValueError(range_header)
+            return max(size - suffix, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        raise ValueError(f"Malformed range: {range_header}")
+    if start >= size or end < start:
+        raise ValueError(f"Range not satisfiable: {range_header}")
+    return start, min(end, size - 1)
+
+def iter_file_chunks(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(PDF_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def pdf_file_response(path: str, export_id: str, filename: str, range_header: Optional[str] = None) -> StreamingResponse:
+    """Stream a stored PDF export from disk in chunks, honouring a single byte range"""
+    size = os.path.getsize(path)
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{export_id}"',
+        "X-Export-Id": export_id,
+        "Cache-Control": "private, max-age=3600",
+    }
+    try:
+        byte_range = parse_byte_range(range_header, size)
+    except ValueError as e:
+        raise HTTPException(status_code=416, detail=str(e), headers={"Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file_chunks(path, start, end - start + 1),
+        status_code=status_code,
+        media_type="application/pdf",
+        headers=headers
+    )
+
+def ndjson_response(events) -> StreamingResponse:
+    """
+    Wrap an async iterator of event dicts as a newline-delimited JSON stream.
+    
+    Errors raised after the response has started cannot become an HTTP status any more,
+    so they are reported as a final "error" event instead.
+    """
+    async def body():
+        try:
+            async for event in events:
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            print(f"Error while streaming: {e}")
+            yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # API Endpoints
 @story_router.post("/generate-seed-ideas")
-async def generate_seed_ideas(request: GenerateSeedIdeasRequest):
+async def generate_seed_ideas(
+    request: GenerateSeedIdeasRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Generate three different seed ideas based on input parameters"""
     try:
-        seed_ideas = story_generator.generate_seed_ideas(
-            genre=request.genre,
-            idea=request.idea,
-            target_chapters=request.target_chapter_count,
-            style=request.writing_style,
-            characters=request.characters,
-            story_settings=request.story_settings,
-            character_count=request.character_count
+        seed_ideas = await request_coalescer.run(
+            SingleFlight.make_key("seed-ideas", request.model_dump_json(), idempotency_key),
+            lambda: story_generator.generate_seed_ideas(
+                genre=request.genre,
+                idea=request.idea,
+                target_chapters=request.target_chapter_count,
+                style=request.writing_style,
+                characters=request.characters,
+                story_settings=request.story_settings,
+                character_count=request.character_count,
+                parallel_summaries=request.parallel_summaries
+            )
         )
         return {"seed_ideas": [
             {"id": f"seed_{i}", "summary": idea} 
             for i, idea in enumerate(seed_ideas)
         ]}
+    except LLMOverloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -293,24 +438,32 @@ async def generate_seed_ideas(request: GenerateSeedIdeasRequest):
     #     raise HTTPException(status_code=500, detail=str(e))
 
 @story_router.post("/create-detailed-outline")
-async def create_detailed_outline(request: DetailedOutlineRequest):
+async def create_detailed_outline(
+    request: DetailedOutlineRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Create detailed chapter-by-chapter outline and create a story automatically"""
-    try:
-        print("Received request:", request)  # Add debug print
-        
+    async def create_story_with_outline():
         # Always create a new story
         story = story_generator.create_story(
             title=request.title,
             genre=request.genre,
             style=request.writing_style
         )
+        if request.characters:
+            # Kept on the story so chapters and covers get the same character sheets
+            story.characters = request.characters
+            story.character_arcs = parse_character_arcs(request.seed_summary, request.characters)
+            story_generator.save_story(story)
         
         # Generate chapter outlines
-        chapter_outlines = story_generator.create_detailed_outline(
+        chapter_outlines = await story_generator.create_detailed_outline(
             seed_summary=request.seed_summary,
             genre=request.genre,
             target_chapters=request.target_chapter_count,
-            style=request.writing_style
+            style=request.writing_style,
+            characters=request.characters,
+            character_arcs=story.character_arcs
         )
         
         # Store the outlines in the story's memory
@@ -323,22 +476,85 @@ async def create_detailed_outline(request: DetailedOutlineRequest):
             "created_at": story.created_at,
             "chapter_outlines": chapter_outlines
         }
+
+    try:
+        print("Received request:", request)  # Add debug print
+        
+        # Retries share the first attempt's story instead of creating a duplicate one
+        return await request_coalescer.run(
+            SingleFlight.make_key("detailed-outline", request.model_dump_json(), idempotency_key),
+            create_story_with_outline
+        )
+    except LLMOverloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         print("Error details:", str(e))  # Add debug print
         raise HTTPException(status_code=500, detail=str(e))
 
+@story_router.post("/create-detailed-outline/stream")
+async def create_detailed_outline_stream(request: DetailedOutlineRequest):
+    """
+    Create a story and stream its outline as newline-delimited JSON events: "story" with the new
+    story's id, "chapter" for each chapter outline as soon as it is complete, and a final "outline"
+    with all chapter outlines (in order) once they are stored on the story
+    """
+    try:
+        story_generator.governor.ensure_capacity()
+    except LLMOverloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    async def events():
+        story = story_generator.create_story(
+            title=request.title,
+            genre=request.genre,
+            style=request.writing_style
+        )
+        if request.characters:
+            story.characters = request.characters
+            story.character_arcs = parse_character_arcs(request.seed_summary, request.characters)
+            story_generator.save_story(story)
+        yield {"event": "story", "story_id": story.id, "title": story.title, "genre": story.genre,
+               "created_at": story.created_at}
+
+        chapter_outlines = []
+        async for chapter in story_generator.stream_detailed_outline(
+            seed_summary=request.seed_summary,
+            genre=request.genre,
+            target_chapters=request.target_chapter_count,
+            style=request.writing_style,
+            characters=request.characters,
+            character_arcs=story.character_arcs
+        ):
+            chapter_outlines.append(chapter)
+            yield {"event": "chapter", **chapter}
+
+        chapter_outlines.sort(key=lambda chapter: chapter["number"])
+        story_generator.store_chapter_outlines(story.id, chapter_outlines)
+        yield {"event": "outline", "story_id": story.id, "chapter_outlines": chapter_outlines}
+
+    return ndjson_response(events())
+
 @story_router.post("/generate-chapter")
-async def generate_chapter(request: GenerateChapterRequest):
+async def generate_chapter(
+    request: GenerateChapterRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Generate a full chapter based on its summary and context provided by frontend"""
+    if request.story_id and not story_generator.get_story(request.story_id, include_chapters=False):
+        raise HTTPException(status_code=404, detail="Story not found")
     try:
-        chapter = story_generator.generate_chapter(
-            chapter_number=request.chapter_number,
-            chapter_summary=request.chapter_summary,
-            writing_style=request.writing_style,
-            previous_chapter_title=request.previous_chapter_title,
-            previous_chapter_ending=request.previous_chapter_ending,
-            next_chapter_summary=request.next_chapter_summary,
-            target_word_count=request.target_word_count
+        chapter = await request_coalescer.run(
+            SingleFlight.make_key("chapter", request.model_dump_json(), idempotency_key),
+            lambda: story_generator.generate_chapter(
+                chapter_number=request.chapter_number,
+                chapter_summary=request.chapter_summary,
+                writing_style=request.writing_style,
+                previous_chapter_title=request.previous_chapter_title,
+                previous_chapter_ending=request.previous_chapter_ending,
+                next_chapter_summary=request.next_chapter_summary,
+                target_word_count=request.target_word_count,
+                story_id=request.story_id
+            )
         )
         return {
             "number": chapter.number,
@@ -346,19 +562,100 @@ async def generate_chapter(request: GenerateChapterRequest):
             "content": chapter.content,
             "word_count": chapter.word_count
         }
+    except LLMOverloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@story_router.post("/generate-chapter/stream")
+async def generate_chapter_stream(request: GenerateChapterRequest):
+    """
+    Stream a chapter as newline-delimited JSON events: "title" as soon as the title line
+    is written, "delta" for each chunk of chapter text and a final "chapter" with metadata.
+    A chapter that came out too long is condensed at the end and sent as a "replace" event,
+    whose text replaces all chapter text received so far.
+    """
+    if request.story_id and not story_generator.get_story(request.story_id, include_chapters=False):
+        raise HTTPException(status_code=404, detail="Story not found")
+    try:
+        # Refuse before the 200 is sent; once streaming, errors can only be reported as events
+        story_generator.governor.ensure_capacity()
+    except LLMOverloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return ndjson_response(story_generator.stream_chapter(
+        chapter_number=request.chapter_number,
+        chapter_summary=request.chapter_summary,
+        writing_style=request.writing_style,
+        previous_chapter_title=request.previous_chapter_title,
+        previous_chapter_ending=request.previous_chapter_ending,
+        next_chapter_summary=request.next_chapter_summary,
+        target_word_count=request.target_word_count,
+        story_id=request.story_id
+    ))
+
+@story_router.get("/stats")
+async def get_stats():
+    """Runtime counters for the story generation backend"""
+    return {
+        "llm_cache": story_generator.cache.stats(),
+        "llm_retries": story_generator.retry_policy.stats(),
+        "llm_governor": story_generator.governor.stats(),
+        "token_budgets": story_generator.budgeter.stats(),
+        "length_control": story_generator.length_controller.stats(),
+        "narrative_context": story_generator.narrative_context.stats(),
+        "passage_index": story_generator.passage_index.stats(),
+        "character_bible": story_generator.character_bible.stats(),
+        "request_coalescing": request_coalescer.stats(),
+        "story_store": story_generator.store.stats(),
+        "pdf_render_pool": pdf_render_pool.stats(),
+        "cover_images": story_generator.cover_processor.stats(),
+        "blobs": story_generator.blobs.stats()
+    }
+
+@story_router.get("/stories")
+async def list_stories():
+    """List stored stories with chapter titles and word counts, without chapter text"""
+    return {"stories": story_generator.list_stories()}
+
 @story_router.get("/story/{story_id}", response_model=StoryResponse)
 async def get_story(story_id: str):
     """Get a story by ID with all its details"""
     story = story_generator.get_story(story_id)
     if not story:
         raise HTTPException(status_code=404, detail="Story not found")
-    return story
+    return StoryResponse(
+        id=story.id,
+        title=story.title,
+        genre=story.genre,
+        chapters=[chapter.model_dump() for chapter in story.chapters],
+        is_complete=story.is_complete,
+        total_word_count=story.total_word_count(),
+        created_at=story.created_at,
+        updated_at=story.updated_at
+    )
+
+@story_router.delete("/story/{story_id}")
+async def delete_story(story_id: str):
+    """Delete a story with its chapters and memory"""
+    if not story_generator.get_story(story_id, include_chapters=False):
+        raise HTTPException(status_code=404, detail="Story not found")
+    story_generator.delete_story(story_id)
+    return {"deleted": story_id}
+
+@story_router.get("/story/{story_id}/chapters/{chapter_number}")
+async def get_story_chapter(story_id: str, chapter_number: int):
+    """Get a single chapter of a stored story"""
+    chapter = story_generator.store.get_chapter(story_id, chapter_number)
+    if not chapter:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    return chapter
 
-@story_router.post("/generate-book-cover", response_model=BookCoverResponse)
-async def generate_book_cover(request: GenerateBookCoverRequest):
+@story_router.post("/generate-book-cover", response_model=BookCoverResponse, response_model_exclude_none=True)
+async def generate_book_cover(
+    request: GenerateBookCoverRequest,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Generate a book cover image using Gemini API based on story details"""
     try:
         # Check if Gemini API key is configured
@@ -371,20 +668,27 @@ async def generate_book_cover(request: GenerateBookCoverRequest):
         print(f"Generating book cover for story: {request.story_title}")
         
         # Call the StoryGenerator method to generate the book cover
-        result = story_generator.generate_book_cover(
-            story_title=request.story_title,
-            story_summary=request.story_summary,
-            characters=request.characters,
-            genre=request.genre
+        result = await request_coalescer.run(
+            SingleFlight.make_key("book-cover", request.model_dump_json(), idempotency_key),
+            lambda: story_generator.generate_book_cover(
+                story_title=request.story_title,
+                story_summary=request.story_summary,
+                characters=request.characters,
+                genre=request.genre
+            )
         )
         
         return BookCoverResponse(
-            image_data=result["image_data"],
-            mime_type=result["mime_type"]
+            cover_id=result["cover_id"],
+            cover_url=str(http_request.url_for("get_blob", blob_id=result["cover_id"])),
+            mime_type=result["mime_type"],
+            image_data=result["image_data"] if request.include_image_data else None
         )
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         print(f"Error generating book cover: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate book cover: {str(e)}")
@@ -398,30 +702,73 @@ async def generate_pdf(request: GeneratePdfRequest):
         request (GeneratePdfRequest): The request containing story data
         
     Returns:
-        StreamingResponse: The PDF file as a streaming response
+        StreamingResponse: The PDF file streamed from disk; its X-Export-Id header can be used
+        to download it again from /exports/{export_id}
     """
+    cover_blob = None
+    if request.cover_id:
+        try:
+            stored_cover = story_generator.blobs.get(request.cover_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if stored_cover is None:
+            raise HTTPException(status_code=404, detail=f"Cover {request.cover_id} not found")
+        cover_blob = (request.cover_id, stored_cover[0])
+
     try:
-        # Generate the PDF
-        pdf_bytes = generate_pdf_from_chapters(
+        # Render straight to the export store in the pool; identical concurrent exports share one render
+        key = request_coalescer.make_key("generate-pdf", request.model_dump_json())
+        export_id = await request_coalescer.run(key, lambda: pdf_render_pool.export(
             title=request.title,
             genre=request.genre,
             setting=request.setting,
             chapters=request.chapters,
             characters=request.characters,
-            cover_image_url=request.cover_image_url
-        )
-        
-        # Create a streaming response
-        return StreamingResponse(
-            io.BytesIO(pdf_bytes),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={request.title.replace(' ', '_')}.pdf"
-            }
-        )
+            cover_image_url=None if cover_blob else request.cover_image_url,
+            cover_blob=cover_blob
+        ))
+        path = pdf_render_pool.exports.get(export_id)
+        if path is None:
+            raise RuntimeError("PDF export was pruned before it could be sent")
+        return pdf_file_response(path, export_id, f"{request.title.replace(' ', '_')}.pdf")
+    except PdfRenderPoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
 
+@story_router.get("/blobs/{blob_id}")
+async def get_blob(blob_id: str, if_none_match: Optional[str] = Header(None, alias="If-None-Match")):
+    """Serve a stored cover; blob ids are content hashes, so responses can be cached for good"""
+    try:
+        stored = story_generator.blobs.get(blob_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"Blob {blob_id} not found")
+
+    headers = {"ETag": f'"{blob_id}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if if_none_match and blob_id in if_none_match:
+        return Response(status_code=304, headers=headers)
+    path, mime_type = stored
+    return FileResponse(path, media_type=mime_type, headers=headers)
+
+@story_router.get("/exports/{export_id}")
+async def download_pdf_export(
+    export_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+):
+    """Download a PDF export again, whole or in byte ranges"""
+    try:
+        path = pdf_render_pool.exports.get(export_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Export {export_id} not found")
+    if if_none_match and export_id in if_none_match:
+        return Response(status_code=304, headers={"ETag": f'"{export_id}"'})
+    return pdf_file_response(path, export_id, f"{export_id}.pdf", range_header)
+
 @story_router.post("/surprise-me")
 async def surprise_me(request: SurpriseMeRequest):
     """
@@ -430,7 +777,7 @@ async def surprise_me(request: SurpriseMeRequest):
     """
     try:
         # Generate a story based on the user's preferences
-        story = story_generator.generate_surprise_story(
+        story = await story_generator.generate_surprise_story(
             category=request.category,
             story_type=request.story_type,
             length=request.length,
@@ -440,5 +787,85 @@ async def surprise_me(request: SurpriseMeRequest):
         )
         
         return story
+    except LLMOverloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating surprise story: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error generating surprise story: {str(e)}")
+
+@story_router.post("/surprise-me/stream")
+async def surprise_me_stream(request: SurpriseMeRequest):
+    """
+    Stream a surprise story as newline-delimited JSON events: "title", then "delta" chunks
+    of the story body, then a final "story" event with the story metadata. A body that came
+    out too long is condensed at the end and sent as a "replace" event before "story".
+    """
+    try:
+        story_generator.governor.ensure_capacity()
+    except LLMOverloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return ndjson_response(story_generator.stream_surprise_story(
+        category=request.category,
+        story_type=request.story_type,
+        length=request.length,
+        tone=request.tone,
+        target_audience=request.target_audience,
+        prompt=request.prompt
+    ))
+
+@story_router.post("/books/jobs")
+async def create_book_job(request: BookJobRequest):
+    """
+    Start generating every chapter of a story from the outlines stored by /create-detailed-outline,
+    or a whole new book from an idea. Every step is checkpointed, so the job survives a restart.
+    Returns immediately with the job; poll /books/jobs/{job_id} or stream /books/jobs/{job_id}/events.
+    """
+    try:
+        if request.story_id:
+            job = book_jobs.submit(
+                story_id=request.story_id,
+                writing_style=request.writing_style,
+                target_word_count=request.target_word_count,
+                max_parallel_chapters=request.max_parallel_chapters
+            )
+        elif request.idea and request.title and request.genre and request.target_chapter_count:
+            job = book_jobs.submit_from_idea(
+                title=request.title,
+                genre=request.genre,
+                idea=request.idea,
+                target_chapters=request.target_chapter_count,
+                writing_style=request.writing_style or "default",
+                target_word_count=request.target_word_count,
+                max_parallel_chapters=request.max_parallel_chapters
+            )
+        else:
+            raise ValueError("Provide either story_id or title, genre, idea and target_chapter_count")
+        return job
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Story not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@story_router.get("/books/jobs/{job_id}")
+async def get_book_job(job_id: str):
+    """Get the progress of a book generation job"""
+    job = book_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@story_router.post("/books/jobs/{job_id}/retry")
+async def retry_book_job(job_id: str):
+    """Run a failed book job again, reusing every step it checkpointed before failing"""
+    try:
+        return book_jobs.retry(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@story_router.get("/books/jobs/{job_id}/events")
+async def stream_book_job(job_id: str):
+    """Stream the progress of a book generation job as newline-delimited JSON events"""
+    if not book_jobs.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return ndjson_response(book_jobs.events(job_id))
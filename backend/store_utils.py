@@ -0,0 +1,594 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from story_utils import Chapter, Story, StoryMemory
+
+
+def story_listing(story: Story, chapters: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Listing entry for a story: its metadata plus chapter titles and word counts, never chapter text"""
+    return {
+        "id": story.id,
+        "title": story.title,
+        "genre": story.genre,
+        "writing_style": story.writing_style,
+        "is_complete": story.is_complete,
+        "chapter_count": len(chapters),
+        "total_word_count": sum(chapter["word_count"] for chapter in chapters),
+        "chapters": chapters,
+        "created_at": story.created_at,
+        "updated_at": story.updated_at,
+    }
+
+
+class StoryStore(ABC):
+    """
+    Storage backend for stories, their chapters and their StoryMemory.
+
+    Story metadata and chapters are stored separately: get_story(include_chapters=False) and
+    list_stories() never load chapter bodies. Objects returned by a store are copies, so every
+    change has to be written back with save_story, save_chapter or save_memory.
+    """
+
+    @abstractmethod
+    def save_story(self, story: Story):
+        """Upsert the story metadata and any chapters present on it (never deletes chapters)"""
+
+    @abstractmethod
+    def get_story(self, story_id: str, include_chapters: bool = True) -> Optional[Story]:
+        pass
+
+    @abstractmethod
+    def list_stories(self) -> List[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def save_chapter(self, story_id: str, chapter: Chapter):
+        pass
+
+    @abstractmethod
+    def get_chapter(self, story_id: str, number: int) -> Optional[Chapter]:
+        pass
+
+    @abstractmethod
+    def save_memory(self, memory: StoryMemory):
+        pass
+
+    @abstractmethod
+    def get_memory(self, story_id: str) -> Optional[StoryMemory]:
+        pass
+
+    @abstractmethod
+    def delete_story(self, story_id: str):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Backend-specific counters reported by GET /stats"""
+        return {}
+
+    def close(self):
+        pass
+
+
+class InMemoryStoryStore(StoryStore):
+    """
+    Process-local store, bounded by story count, approximate size and idle time.
+
+    Stories are kept in least-recently-used order. When the store grows past `max_stories` or
+    `max_bytes`, or a story has been idle for longer than `ttl_seconds`, the story is evicted. If a
+    `spill_dir` is set, the evicted story is written there as JSON and reloaded on next access.
+    Otherwise it is dropped. With `snapshot_on_close`, close() spills every resident story, so a
+    restarted worker finds them again.
+    """
+
+    def __init__(self, max_stories: Optional[int] = None, max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None, spill_dir: Optional[str] = None,
+                 snapshot_on_close: bool = False):
+        self.max_stories = max_stories
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.spill_dir = spill_dir
+        self.snapshot_on_close = snapshot_on_close
+        self._stories: "OrderedDict[str, Story]" = OrderedDict()
+        self._chapters: Dict[str, Dict[int, Chapter]] = {}
+        self._memories: Dict[str, StoryMemory] = {}
+        self._sizes: Dict[str, Dict[str, Any]] = {}
+        self._story_bytes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._last_access: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self.counters = {"evictions": 0, "expirations": 0, "spills": 0, "reloads": 0, "dropped": 0}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    # ----- bookkeeping -----
+
+    def _resize(self, story_id: str):
+        """Recompute one story's approximate footprint after any of its parts changed"""
+        sizes = self._sizes.get(story_id, {})
+        size = sizes.get("story", 0) + sizes.get("memory", 0) + sum(sizes.get("chapters", {}).values())
+        self._total_bytes += size - self._story_bytes.get(story_id, 0)
+        self._story_bytes[story_id] = size
+
+    def estimated_bytes(self) -> int:
+        return self._total_bytes
+
+    def _touch(self, story_id: str):
+        self._stories.move_to_end(story_id)
+        self._last_access[story_id] = time.monotonic()
+
+    def _spill_path(self, story_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.spill_dir, f"{story_id}{suffix}")
+
+    def _spill(self, story_id: str):
+        """Write one resident story, with its chapters and memory, to the spill directory"""
+        story = self._stories[story_id]
+        chapters = [self._chapters[story_id][number] for number in sorted(self._chapters.get(story_id, {}))]
+        memory = self._memories.get(story_id)
+        payload = {
+            "story": json.loads(story.model_dump_json(exclude={"chapters"})),
+            "chapters": [chapter.model_dump() for chapter in chapters],
+            "memory": memory.to_dict() if memory else None,
+        }
+        listing = story_listing(story, [
+            {"number": chapter.number, "title": chapter.title, "word_count": chapter.word_count}
+            for chapter in chapters
+        ])
+        with open(self._spill_path(story_id), "w") as file:
+            json.dump(payload, file)
+        with open(self._spill_path(story_id, ".meta.json"), "w") as file:
+            json.dump(listing, file)
+        self.counters["spills"] += 1
+
+    def _evict(self, story_id: str):
+        if self.spill_dir:
+            self._spill(story_id)
+        else:
+            self.counters["dropped"] += 1
+            print(f"Evicting story {story_id} from memory without a spill directory; it is lost")
+        self._stories.pop(story_id, None)
+        self._chapters.pop(story_id, None)
+        self._memories.pop(story_id, None)
+        self._sizes.pop(story_id, None)
+        self._total_bytes -= self._story_bytes.pop(story_id, 0)
+        self._last_access.pop(story_id, None)
+
+    def _enforce_limits(self, keep: Optional[str] = None):
+        if self.ttl_seconds is not None:
+            cutoff = time.monotonic() - self.ttl_seconds
+            for story_id in list(self._stories):
+                if story_id != keep and self._last_access.get(story_id, 0) < cutoff:
+                    self._evict(story_id)
+                    self.counters["expirations"] += 1
+
+        def over_limit():
+            if self.max_stories is not None and len(self._stories) > self.max_stories:
+                return True
+            return self.max_bytes is not None and self.estimated_bytes() > self.max_bytes
+
+        while over_limit() and len(self._stories) > (1 if keep else 0):
+            story_id = next(iter(self._stories))
+            if story_id == keep:
+                self._stories.move_to_end(story_id)
+                story_id = next(iter(self._stories))
+            self._evict(story_id)
+            self.counters["evictions"] += 1
+
+    def _ensure_resident(self, story_id: str) -> bool:
+        """Make sure a story is in memory, reloading it from the spill directory if needed"""
+        if story_id in self._stories:
+            self._touch(story_id)
+            self._enforce_limits(keep=story_id)
+            return True
+        if not self.spill_dir or not os.path.exists(self._spill_path(story_id)):
+            return False
+
+        with open(self._spill_path(story_id)) as file:
+            payload = json.load(file)
+        os.remove(self._spill_path(story_id))
+        if os.path.exists(self._spill_path(story_id, ".meta.json")):
+            os.remove(self._spill_path(story_id, ".meta.json"))
+
+        story = Story.model_validate(payload["story"])
+        self._stories[story_id] = story
+        self._sizes[story_id] = {"story": len(story.model_dump_json()), "chapters": {}, "memory": 0}
+        self._chapters[story_id] = {}
+        for data in payload["chapters"]:
+            chapter = Chapter(**data)
+            self._chapters[story_id][chapter.number] = chapter
+            self._sizes[story_id]["chapters"][chapter.number] = len(chapter.content) + len(chapter.title)
+        if payload.get("memory"):
+            memory = StoryMemory.from_dict(payload["memory"])
+            self._memories[story_id] = memory
+            self._sizes[story_id]["memory"] = len(json.dumps(payload["memory"]))
+        self._resize(story_id)
+        self.counters["reloads"] += 1
+        self._touch(story_id)
+        self._enforce_limits(keep=story_id)
+        return True
+
+    # ----- StoryStore API -----
+
+    def save_story(self, story: Story):
+        with self._lock:
+            self._ensure_resident(story.id)
+            self._stories[story.id] = story.model_copy(update={"chapters": []})
+            sizes = self._sizes.setdefault(story.id, {"story": 0, "chapters": {}, "memory": 0})
+            sizes["story"] = len(self._stories[story.id].model_dump_json())
+            chapters = self._chapters.setdefault(story.id, {})
+            for chapter in story.chapters:
+                chapters[chapter.number] = chapter.model_copy()
+                sizes["chapters"][chapter.number] = len(chapter.content) + len(chapter.title)
+            self._resize(story.id)
+            self._touch(story.id)
+            self._enforce_limits(keep=story.id)
+
+    def get_story(self, story_id: str, include_chapters: bool = True) -> Optional[Story]:
+        with self._lock:
+            if not self._ensure_resident(story_id):
+                return None
+            story = self._stories[story_id]
+            chapters = []
+            if include_chapters:
+                chapters = [self._chapters[story_id][number].model_copy() for number in sorted(self._chapters[story_id])]
+            return story.model_copy(update={"chapters": chapters})
+
+    def list_stories(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            listings = [
+                story_listing(story, [
+                    {"number": chapter.number, "title": chapter.title, "word_count": chapter.word_count}
+                    for _, chapter in sorted(self._chapters.get(story_id, {}).items())
+                ])
+                for story_id, story in self._stories.items()
+            ]
+            if self.spill_dir:
+                for name in sorted(os.listdir(self.spill_dir)):
+                    # A snapshotted story can be both resident and on disk; list it once
+                    if name.endswith(".meta.json") and name[:-len(".meta.json")] not in self._stories:
+                        with open(os.path.join(self.spill_dir, name)) as file:
+                            listings.append(json.load(file))
+            return listings
+
+    def save_chapter(self, story_id: str, chapter: Chapter):
+        with self._lock:
+            if not self._ensure_resident(story_id):
+                raise KeyError(f"Story with ID {story_id} not found")
+            self._chapters.setdefault(story_id, {})[chapter.number] = chapter.model_copy()
+            self._sizes[story_id]["chapters"][chapter.number] = len(chapter.content) + len(chapter.title)
+            self._resize(story_id)
+            self._enforce_limits(keep=story_id)
+
+    def get_chapter(self, story_id: str, number: int) -> Optional[Chapter]:
+        with self._lock:
+            if not self._ensure_resident(story_id):
+                return None
+            chapter = self._chapters.get(story_id, {}).get(number)
+            return chapter.model_copy() if chapter else None
+
+    def save_memory(self, memory: StoryMemory):
+        with self._lock:
+            if not self._ensure_resident(memory.story_id):
+                raise KeyError(f"Story with ID {memory.story_id} not found")
+            data = memory.to_dict()
+            self._memories[memory.story_id] = StoryMemory.from_dict(data)
+            self._sizes[memory.story_id]["memory"] = len(json.dumps(data))
+            self._resize(memory.story_id)
+            self._enforce_limits(keep=memory.story_id)
+
+    def get_memory(self, story_id: str) -> Optional[StoryMemory]:
+        with self._lock:
+            if not self._ensure_resident(story_id):
+                return None
+            memory = self._memories.get(story_id)
+            return StoryMemory.from_dict(memory.to_dict()) if memory else None
+
+    def delete_story(self, story_id: str):
+        with self._lock:
+            self._stories.pop(story_id, None)
+            self._chapters.pop(story_id, None)
+            self._memories.pop(story_id, None)
+            self._sizes.pop(story_id, None)
+            self._total_bytes -= self._story_bytes.pop(story_id, 0)
+            self._last_access.pop(story_id, None)
+            if self.spill_dir:
+                for suffix in (".json", ".meta.json"):
+                    if os.path.exists(self._spill_path(story_id, suffix)):
+                        os.remove(self._spill_path(story_id, suffix))
+
+    def snapshot(self) -> int:
+        """Write every resident story to the spill directory without evicting it"""
+        if not self.spill_dir:
+            return 0
+        with self._lock:
+            for story_id in list(self._stories):
+                self._spill(story_id)
+            return len(self._stories)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.counters,
+                "resident_stories": len(self._stories),
+                "estimated_bytes": self.estimated_bytes(),
+                "max_stories": self.max_stories,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "spill_dir": self.spill_dir,
+            }
+
+    def close(self):
+        if self.snapshot_on_close:
+            count = self.snapshot()
+            print(f"Snapshotted {count} in-memory stories to {self.spill_dir}")
+
+
+class SQLiteStoryStore(StoryStore):
+    """
+    SQLite store in WAL mode, safe to share between uvicorn workers on one host.
+
+    Chapters live in their own table keyed by (story_id, number), so listing stories reads only
+    the small metadata columns.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS stories (
+                id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS story_chapters (
+                story_id TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                word_count INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                PRIMARY KEY (story_id, number)
+            );
+            CREATE TABLE IF NOT EXISTS story_memories (
+                story_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def _write_chapter(self, story_id: str, chapter: Chapter):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO story_chapters (story_id, number, title, word_count, content) VALUES (?, ?, ?, ?, ?)",
+            (story_id, chapter.number, chapter.title, chapter.word_count, chapter.content)
+        )
+
+    def save_story(self, story: Story):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stories (id, data, created_at) VALUES (?, ?, ?)",
+                (story.id, story.model_dump_json(exclude={"chapters"}), story.created_at)
+            )
+            for chapter in story.chapters:
+                self._write_chapter(story.id, chapter)
+            self._conn.commit()
+
+    def get_story(self, story_id: str, include_chapters: bool = True) -> Optional[Story]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM stories WHERE id = ?", (story_id,)).fetchone()
+            if row is None:
+                return None
+            story = Story.model_validate_json(row[0])
+            if include_chapters:
+                story.chapters = [
+                    Chapter(number=number, title=title, word_count=word_count, content=content)
+                    for number, title, word_count, content in self._conn.execute(
+                        "SELECT number, title, word_count, content FROM story_chapters WHERE story_id = ? ORDER BY number",
+                        (story_id,)
+                    )
+                ]
+            return story
+
+    def list_stories(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            stories = [Story.model_validate_json(data) for (data,) in
+                       self._conn.execute("SELECT data FROM stories ORDER BY created_at")]
+            chapters: Dict[str, List[Dict[str, Any]]] = {}
+            for story_id, number, title, word_count in self._conn.execute(
+                "SELECT story_id, number, title, word_count FROM story_chapters ORDER BY story_id, number"
+            ):
+                chapters.setdefault(story_id, []).append({"number": number, "title": title, "word_count": word_count})
+        return [story_listing(story, chapters.get(story.id, [])) for story in stories]
+
+    def save_chapter(self, story_id: str, chapter: Chapter):
+        with self._lock:
+            self._write_chapter(story_id, chapter)
+            self._conn.commit()
+
+    def get_chapter(self, story_id: str, number: int) -> Optional[Chapter]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, word_count, content FROM story_chapters WHERE story_id = ? AND number = ?",
+                (story_id, number)
+            ).fetchone()
+        if row is None:
+            return None
+        return Chapter(number=number, title=row[0], word_count=row[1], content=row[2])
+
+    def save_memory(self, memory: StoryMemory):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO story_memories (story_id, data) VALUES (?, ?)",
+                (memory.story_id, json.dumps(memory.to_dict()))
+            )
+            self._conn.commit()
+
+    def get_memory(self, story_id: str) -> Optional[StoryMemory]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM story_memories WHERE story_id = ?", (story_id,)).fetchone()
+        return StoryMemory.from_dict(json.loads(row[0])) if row else None
+
+    def delete_story(self, story_id: str):
+        with self._lock:
+            for table, column in (("stories", "id"), ("story_chapters", "story_id"), ("story_memories", "story_id")):
+                self._conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (story_id,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisStoryStore(StoryStore):
+    """
+    Store for any Redis-compatible server (or a fake client with the same API in tests).
+
+    Layout per story: "{prefix}story:{id}" holds the metadata JSON, "{prefix}story:{id}:chapters"
+    is a hash of chapter number to chapter JSON, "{prefix}story:{id}:chapter_index" the same hash
+    without the content, and "{prefix}story:{id}:memory" the StoryMemory JSON. All ids are kept in
+    the sorted set "{prefix}stories", scored by creation time. With `ttl_seconds`, every write
+    and every get_story() pushes the expiry of all four keys forward, so Redis drops stories that
+    have been idle that long; their ids are pruned from the sorted set when stories are listed.
+    """
+
+    def __init__(self, client, prefix: str = "kathai:", ttl_seconds: Optional[float] = None):
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "kathai:", ttl_seconds: Optional[float] = None) -> "RedisStoryStore":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("STORY_STORE=redis requires the 'redis' package (pip install redis)") from e
+        return cls(redis.Redis.from_url(url), prefix=prefix, ttl_seconds=ttl_seconds)
+
+    def _key(self, story_id: str, suffix: str = "") -> str:
+        return f"{self.prefix}story:{story_id}{suffix}"
+
+    def _touch(self, pipe, story_id: str):
+        if self.ttl_seconds is None:
+            return
+        ttl = max(1, int(self.ttl_seconds))
+        for suffix in ("", ":chapters", ":chapter_index", ":memory"):
+            pipe.expire(self._key(story_id, suffix), ttl)
+
+    @staticmethod
+    def _text(value) -> str:
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def _chapter_fields(self, chapter: Chapter):
+        index = json.dumps({"number": chapter.number, "title": chapter.title, "word_count": chapter.word_count})
+        return str(chapter.number), chapter.model_dump_json(), index
+
+    def save_story(self, story: Story):
+        pipe = self.client.pipeline()
+        pipe.set(self._key(story.id), story.model_dump_json(exclude={"chapters"}))
+        pipe.zadd(f"{self.prefix}stories", {story.id: self._created_score(story)})
+        for chapter in story.chapters:
+            field, data, index = self._chapter_fields(chapter)
+            pipe.hset(self._key(story.id, ":chapters"), field, data)
+            pipe.hset(self._key(story.id, ":chapter_index"), field, index)
+        self._touch(pipe, story.id)
+        pipe.execute()
+
+    @staticmethod
+    def _created_score(story: Story) -> float:
+        return datetime.fromisoformat(story.created_at).timestamp()
+
+    def get_story(self, story_id: str, include_chapters: bool = True) -> Optional[Story]:
+        data = self.client.get(self._key(story_id))
+        if data is None:
+            return None
+        story = Story.model_validate_json(self._text(data))
+        if self.ttl_seconds is not None:
+            pipe = self.client.pipeline()
+            self._touch(pipe, story_id)
+            pipe.execute()
+        if include_chapters:
+            chapters = self.client.hgetall(self._key(story_id, ":chapters"))
+            story.chapters = sorted(
+                (Chapter.model_validate_json(self._text(value)) for value in chapters.values()),
+                key=lambda chapter: chapter.number
+            )
+        return story
+
+    def list_stories(self) -> List[Dict[str, Any]]:
+        listings = []
+        for story_id in self.client.zrange(f"{self.prefix}stories", 0, -1):
+            # Read directly so that listing does not count as using the story
+            data = self.client.get(self._key(self._text(story_id)))
+            if data is None:
+                # Expired (or half-deleted) stories leave their id behind in the sorted set
+                self.client.zrem(f"{self.prefix}stories", story_id)
+                continue
+            story = Story.model_validate_json(self._text(data))
+            index = self.client.hgetall(self._key(story.id, ":chapter_index"))
+            chapters = sorted((json.loads(self._text(value)) for value in index.values()), key=lambda c: c["number"])
+            listings.append(story_listing(story, chapters))
+        return listings
+
+    def save_chapter(self, story_id: str, chapter: Chapter):
+        field, data, index = self._chapter_fields(chapter)
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(story_id, ":chapters"), field, data)
+        pipe.hset(self._key(story_id, ":chapter_index"), field, index)
+        self._touch(pipe, story_id)
+        pipe.execute()
+
+    def get_chapter(self, story_id: str, number: int) -> Optional[Chapter]:
+        data = self.client.hget(self._key(story_id, ":chapters"), str(number))
+        return Chapter.model_validate_json(self._text(data)) if data is not None else None
+
+    def save_memory(self, memory: StoryMemory):
+        pipe = self.client.pipeline()
+        pipe.set(self._key(memory.story_id, ":memory"), json.dumps(memory.to_dict()))
+        self._touch(pipe, memory.story_id)
+        pipe.execute()
+
+    def get_memory(self, story_id: str) -> Optional[StoryMemory]:
+        data = self.client.get(self._key(story_id, ":memory"))
+        return StoryMemory.from_dict(json.loads(self._text(data))) if data is not None else None
+
+    def delete_story(self, story_id: str):
+        self.client.delete(
+            self._key(story_id), self._key(story_id, ":chapters"),
+            self._key(story_id, ":chapter_index"), self._key(story_id, ":memory")
+        )
+        self.client.zrem(f"{self.prefix}stories", story_id)
+
+
+def create_story_store_from_env() -> StoryStore:
+    """Build the story store selected by STORY_STORE (memory, sqlite or redis)"""
+    backend = os.getenv("STORY_STORE", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteStoryStore(os.getenv(
+            "STORY_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "stories.db")
+        ))
+    ttl = os.getenv("STORY_STORE_TTL_SECONDS")
+    if backend == "redis":
+        return RedisStoryStore.from_url(
+            os.getenv("STORY_STORE_REDIS_URL", "redis://localhost:6379/0"), ttl_seconds=float(ttl) if ttl else None
+        )
+    if backend != "memory":
+        raise ValueError(f"Unknown STORY_STORE backend: {backend}")
+
+    max_mb = os.getenv("STORY_STORE_MAX_MB", "256")
+    return InMemoryStoryStore(
+        max_stories=int(os.getenv("STORY_STORE_MAX_STORIES", "1000")),
+        max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb else None,
+        ttl_seconds=float(ttl) if ttl else None,
+        spill_dir=os.getenv(
+            "STORY_STORE_SPILL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "story_spill")
+        ) or None,
+        snapshot_on_close=os.getenv("STORY_STORE_SNAPSHOT_ON_SHUTDOWN", "false").lower() in ("1", "true", "yes")
+    )
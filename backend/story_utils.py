@@ -1,15 +1,28 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Any
-import json
+from typing import List, Dict, Optional, Any, Tuple
+import asyncio
+import functools
+import inspect
 import os
 from datetime import datetime
 import uuid
 from dotenv import load_dotenv
 import base64
 import mimetypes
-import google.generativeai as genai
-from google.generativeai import types
+from google import genai
+from google.genai import types
+from budget_utils import TokenBudgeter
+from cache_utils import LLMCache
+from character_utils import CharacterBible
+from context_utils import NarrativeContext, split_opening
+from governor_utils import PRIORITY_BULK, LLMGovernor, estimate_tokens, llm_priority
+from http_utils import RetryPolicy, build_openai_http_client, request_timeouts_from_env
+from length_utils import LengthController
+from outline_utils import ChapterStreamParser, merge_chapters, salvage_chapters
+from image_utils import get_cover_processor
+from retrieval_utils import PassageIndexStore, chapter_fingerprint
+from blob_utils import BlobStore
 
 # Load environment variables
 load_dotenv()
@@ -29,6 +42,7 @@ class CharacterDetail(BaseModel):
     personality_traits: Optional[List[str]] = None
     relationships: Optional[Dict[str, str]] = None
     arc_description: Optional[str] = None
+    aliases: Optional[List[str]] = None  # Other names the character goes by in outlines and chapters
 
 class StorySettings(BaseModel):
     narrative_perspective: Optional[str] = None  # "First Person", "Third Person", etc.
@@ -57,72 +71,427 @@ class Story(BaseModel):
         return sum(chapter.word_count for chapter in self.chapters)
 
 class StoryMemory:
+    # Oldest chat messages are dropped beyond this many so memories stay bounded
+    max_chat_history = int(os.getenv("STORY_MEMORY_MAX_CHAT_HISTORY", "50"))
+    
     def __init__(self, story_id: str):
         self.story_id = story_id
         self.chat_history = []
         self.chapter_summaries = {}
+        self.chapter_outlines = {}
+        # Rolling story summary after each chapter it was folded through, keyed by chapter number,
+        # and a fingerprint of the chapter text each snapshot was folded from
+        self.rolling_summaries = {}
+        self.rolling_fingerprints = {}
         
     def add_chapter_summary(self, chapter_number: int, summary: str):
         self.chapter_summaries[chapter_number] = summary
         
+    def add_chat_message(self, role: str, content: str):
+        self.chat_history.append({"role": role, "content": content})
+        del self.chat_history[:-self.max_chat_history]
+        
+    def add_chapter_outline(self, outline: Dict[str, Any]):
+        self.chapter_outlines[outline["number"]] = outline
+        self.add_chapter_summary(outline["number"], outline["summary"])
+        
+    def get_chapter_outlines(self) -> List[Dict[str, Any]]:
+        return [self.chapter_outlines[number] for number in sorted(self.chapter_outlines)]
+        
+    def set_rolling_summary(self, chapter_number: int, summary: str, fingerprint: Optional[str] = None):
+        """Record the summary through a chapter; later snapshots were built on the old text and are dropped"""
+        self.drop_rolling_summaries_from(chapter_number)
+        self.rolling_summaries[chapter_number] = summary
+        if fingerprint:
+            self.rolling_fingerprints[chapter_number] = fingerprint
+        
+    def drop_rolling_summaries_from(self, chapter_number: int):
+        self.rolling_summaries = {n: v for n, v in self.rolling_summaries.items() if n < chapter_number}
+        self.rolling_fingerprints = {n: v for n, v in self.rolling_fingerprints.items() if n < chapter_number}
+        
+    def folded_through(self) -> int:
+        """Last chapter of the unbroken run of snapshots from chapter 1, or 0 if there is none"""
+        number = 0
+        while number + 1 in self.rolling_summaries:
+            number += 1
+        return number
+        
+    def rolling_summary_before(self, chapter_number: int) -> Optional[str]:
+        """Latest rolling summary covering only chapters before `chapter_number`"""
+        earlier = [n for n in self.rolling_summaries if n < chapter_number]
+        return self.rolling_summaries[max(earlier)] if earlier else None
+        
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "story_id": self.story_id,
+            "chat_history": self.chat_history,
+            "chapter_summaries": self.chapter_summaries,
+            "chapter_outlines": self.chapter_outlines,
+            "rolling_summaries": self.rolling_summaries,
+            "rolling_fingerprints": self.rolling_fingerprints
+        }
+        
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StoryMemory":
+        # JSON turns the integer chapter numbers into string keys
+        memory = cls(data["story_id"])
+        memory.chat_history = list(data.get("chat_history", []))[-cls.max_chat_history:]
+        memory.chapter_summaries = {int(k): v for k, v in data.get("chapter_summaries", {}).items()}
+        memory.chapter_outlines = {int(k): v for k, v in data.get("chapter_outlines", {}).items()}
+        memory.rolling_summaries = {int(k): v for k, v in data.get("rolling_summaries", {}).items()}
+        memory.rolling_fingerprints = {int(k): v for k, v in data.get("rolling_fingerprints", {}).items()}
+        return memory
+        
     def get_chapter_summary(self, chapter_number: int) -> Optional[str]:
         return self.chapter_summaries.get(chapter_number)
 
 class StoryGenerator:
-    def __init__(self, api_key: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        cache: Optional[LLMCache] = None,
+        store=None,
+        blobs: Optional[BlobStore] = None,
+        image_client=None,
+        governor: Optional[LLMGovernor] = None
+    ):
         if api_key:
             os.environ["OPENAI_API_KEY"] = api_key
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Pooled keep-alive transport; retries are done by self.retry_policy rather than the SDK
+        self.client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=build_openai_http_client(),
+            max_retries=0
+        )
+        self.retry_policy = RetryPolicy.from_env()
+        # Every completion waits for a slot here: rate limits, concurrency cap and priorities
+        self.governor = governor or LLMGovernor.from_env()
+        self.request_timeouts = request_timeouts_from_env()
+        self.default_request_timeout = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "120"))
         self.model = "gpt-4"
-        self.max_output_tokens = 7000
-        self.stories = {}
+        # Word targets become max_tokens budgets here, calibrated from the responses we get back
+        self.budgeter = TokenBudgeter.from_env()
+        # Off-target lengths are fixed with a continuation or a tail trim, never a full rewrite
+        self.length_controller = LengthController.from_env(self.budgeter)
+        self.max_parallel_requests = int(os.getenv("STORY_MAX_PARALLEL_REQUESTS", "4"))
+        # Calls made at most to fill in chapters an outline response lost
+        self.outline_repair_rounds = int(os.getenv("OUTLINE_REPAIR_ROUNDS", "2"))
+        # Longer outlines than fit one 3000-token call are written as a skeleton plus parallel batches
+        self.outline_segment_threshold = int(os.getenv("OUTLINE_SEGMENT_THRESHOLD", "6"))
+        self.outline_batch_size = int(os.getenv("OUTLINE_BATCH_SIZE", "5"))
+        # Chapter openings longer than this are not sent to the stitching pass, which could cut them off
+        self.stitch_opening_words = int(os.getenv("STITCH_OPENING_WORDS", "200"))
         
-        # Initialize Gemini client if API key exists
+        # Stories, chapters and memories live in a StoryStore so every worker sees the same data.
+        # Imported here because store_utils itself imports the models defined in this module.
+        if store is None:
+            from store_utils import create_story_store_from_env
+            store = create_story_store_from_env()
+        self.store = store
+        
+        # Rolling "story so far" kept per story; summary updates run in the background, one story at a time
+        self.narrative_context = NarrativeContext.from_env()
+        self._memory_locks: Dict[str, asyncio.Lock] = {}
+        self._background_tasks = set()
+        # Compact character sheets: full entries for the characters a prompt is about, digests for the rest
+        self.character_bible = CharacterBible.from_env()
+        # BM25 index over each story's paragraphs, for recalling earlier details in chapter prompts
+        self.passage_index = PassageIndexStore.from_env()
+        
+        # Response cache; only calls whose cache_scope is listed in LLM_CACHE_SCOPES use it.
+        # Outlines are cached by default, creative scopes (seed_ideas, chapter, surprise) are opt-in.
+        self.cache = cache or LLMCache.from_env()
+        self.cache_scopes = {
+            scope.strip() for scope in os.getenv("LLM_CACHE_SCOPES", "outline").split(",") if scope.strip()
+        }
+        
+        # Generated covers are downscaled once here, kept in the blob store and reused by PDF exports
+        self.cover_processor = get_cover_processor()
+        self.blobs = blobs or BlobStore.from_env()
+        
+        # Gemini image client, created on first use (or by warm_image_client) and reused for every cover
+        self.image_model = os.getenv("GEMINI_IMAGE_MODEL", "gemini-2.0-flash-exp-image-generation")
+        self.cover_timeout_seconds = float(os.getenv("COVER_GENERATION_TIMEOUT_SECONDS", "90"))
+        self._image_client = image_client
         gemini_api_key = os.getenv("GEMINI_API_KEY")
         if gemini_api_key:
-            genai.configure(api_key=gemini_api_key)
             print(f"Loaded Gemini API Key for image generation: {bool(gemini_api_key)}")
         else:
             print("WARNING: No Gemini API key found. Book cover generation may fail.")
         
-    def _generate_text(self, prompt: str, temperature: float = 0.8, max_tokens: int = 2000) -> str:
+    def _build_messages(self, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": "You are a master storyteller."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _request_timeout(self, endpoint: Optional[str]) -> float:
+        return self.request_timeouts.get(endpoint, self.default_request_timeout)
+
+    async def _generate_text(self, prompt: str, temperature: float = 0.8, max_tokens: int = 2000,
+                             cache_scope: Optional[str] = None, endpoint: Optional[str] = None) -> str:
+        """
+        Run one completion. `endpoint` picks the request deadline and defaults to `cache_scope`;
+        each attempt is admitted by self.governor and transient failures are retried by
+        self.retry_policy.
+        """
+        endpoint = endpoint or cache_scope
+        messages = self._build_messages(prompt)
+        cache_key = None
+        if cache_scope in self.cache_scopes:
+            cache_key = LLMCache.make_key(self.model, messages, temperature, max_tokens)
+            cached = self.cache.get(cache_key, scope=cache_scope)
+            if cached is not None:
+                return cached
+        
+        async def attempt():
+            async with self.governor.slot(estimate_tokens(prompt, max_tokens)) as record_usage:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout=self._request_timeout(endpoint)
+                )
+                record_usage(response.usage.total_tokens if response.usage else None)
+                self.budgeter.observe(
+                    endpoint,
+                    response.choices[0].message.content,
+                    response.usage.completion_tokens if response.usage else None
+                )
+                return response
+        
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a master storyteller."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            return response.choices[0].message.content
+            response = await self.retry_policy.run(attempt)
+            text = response.choices[0].message.content
         except Exception as e:
             print(f"Error in text generation: {e}")
             raise
+        
+        if cache_key and text:
+            self.cache.set(cache_key, text)
+        return text
 
-    def generate_seed_ideas(
-        self, 
-        genre: str, 
-        idea: str, 
-        target_chapters: int, 
-        style: str = "default",
+    async def _stream_text(self, prompt: str, temperature: float = 0.8, max_tokens: int = 2000,
+                           endpoint: Optional[str] = None):
+        """
+        Yield completion deltas as the model emits them; only opening the stream is retried.
+        The governor slot is held until the stream ends.
+        """
+        try:
+            async with self.governor.slot(estimate_tokens(prompt, max_tokens)):
+                stream = await self.retry_policy.run(lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=self._build_messages(prompt),
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=self._request_timeout(endpoint)
+                ))
+                parts = []
+                completion_tokens = None
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+                    if getattr(chunk, "usage", None):
+                        completion_tokens = chunk.usage.completion_tokens
+                self.budgeter.observe(endpoint, "".join(parts), completion_tokens)
+        except Exception as e:
+            print(f"Error in streaming text generation: {e}")
+            raise
+
+    async def _stream_titled_text(self, prompt: str, temperature: float = 0.8, max_tokens: int = 2000,
+                                  endpoint: Optional[str] = None):
+        """
+        Stream a completion whose first line is a title.
+        
+        Yields ("title", line) once the first non-empty line is complete, then ("text", delta)
+        pairs for everything after it. The title line itself is not repeated as text.
+        """
+        head = ""
+        title_sent = False
+        async for delta in self._stream_text(prompt, temperature=temperature, max_tokens=max_tokens, endpoint=endpoint):
+            if title_sent:
+                yield "text", delta
+                continue
+            head += delta
+            stripped = head.lstrip()
+            if '\n' not in stripped:
+                continue
+            title, rest = stripped.split('\n', 1)
+            title_sent = True
+            yield "title", title.strip()
+            if rest:
+                yield "text", rest
+        
+        if not title_sent and head.strip():
+            yield "title", head.strip()
+
+    def _build_segment_note(self, segment_words: List[int]) -> str:
+        """Instruction appended to a prompt whose text is written in several planned calls"""
+        return f"""
+
+        IMPORTANT: This text is too long for one response, so it will be written in {len(segment_words)} parts.
+        Write ONLY part 1: the title line and about {segment_words[0]} words. Stop at a natural paragraph
+        break and do not conclude the story yet; the following parts will continue from where you stop.
+        """
+
+    def _build_continuation_prompt(self, subject: str, text_so_far: str, words: int, conclude: bool) -> str:
+        """Prompt for the next planned segment of a long text, given only the tail written so far"""
+        tail = " ".join(text_so_far.split()[-400:])
+        ending = (
+            "Bring the text to its planned conclusion in this part."
+            if conclude else
+            "Do not conclude yet; stop at a natural paragraph break so the next part can continue."
+        )
+        return f"""
+        You are continuing {subject}.
+        
+        The text so far ends with:
+        ...{tail}
+        
+        Continue directly from that point in the same voice and style. Do not repeat what was
+        already written and do not add a title or heading. Write about {words} words.
+        {ending}
+        """
+
+    async def _generate_segmented(self, prompt: str, words: int, subject: str, scope: str,
+                                  temperature: float = 0.8, cache_scope: Optional[str] = None) -> str:
+        """
+        Write about `words` words, in one call when the budget allows and otherwise in the
+        continuation segments planned by self.budgeter, spliced together in order.
+        """
+        segment_words = self.budgeter.plan_segments(words, scope)
+        if len(segment_words) > 1:
+            prompt += self._build_segment_note(segment_words)
+        text = await self._generate_text(
+            prompt, temperature=temperature, max_tokens=self.budgeter.tokens_for(segment_words[0], scope),
+            cache_scope=cache_scope, endpoint=scope
+        )
+        for index, segment in enumerate(segment_words[1:], start=2):
+            continuation = await self._generate_text(
+                self._build_continuation_prompt(subject, text, segment, conclude=index == len(segment_words)),
+                temperature=temperature, max_tokens=self.budgeter.tokens_for(segment, scope),
+                cache_scope=cache_scope, endpoint=scope
+            )
+            text = text.rstrip() + "\n\n" + continuation.strip()
+        return text
+
+    async def _stream_segmented(self, prompt: str, words: int, subject: str, scope: str, temperature: float = 0.8):
+        """Streaming counterpart of _generate_segmented, yielding ("title", line) then ("text", delta) pairs"""
+        segment_words = self.budgeter.plan_segments(words, scope)
+        if len(segment_words) > 1:
+            prompt += self._build_segment_note(segment_words)
+        parts = []
+        async for kind, text in self._stream_titled_text(
+            prompt, temperature=temperature, max_tokens=self.budgeter.tokens_for(segment_words[0], scope), endpoint=scope
+        ):
+            if kind == "text":
+                parts.append(text)
+            yield kind, text
+        for index, segment in enumerate(segment_words[1:], start=2):
+            continuation_prompt = self._build_continuation_prompt(
+                subject, "".join(parts), segment, conclude=index == len(segment_words)
+            )
+            parts.append("\n\n")
+            yield "text", "\n\n"
+            async for delta in self._stream_text(
+                continuation_prompt, temperature=temperature, max_tokens=self.budgeter.tokens_for(segment, scope), endpoint=scope
+            ):
+                parts.append(delta)
+                yield "text", delta
+
+    async def _correct_length(self, text: str, words: int, subject: str, scope: str, temperature: float = 0.7) -> str:
+        """Bring `text` near `words` words through self.length_controller, budgeting each correction call"""
+        async def generate(prompt: str, correction_words: int) -> str:
+            return await self._generate_text(
+                prompt, temperature=temperature,
+                max_tokens=self.budgeter.tokens_for(correction_words, scope), endpoint=scope
+            )
+
+        return await self.length_controller.correct(text, words, generate, subject, scope=scope)
+
+    async def _stream_length_correction(self, text: str, words: int, subject: str, scope: str,
+                                        temperature: float = 0.7):
+        """
+        Streaming counterpart of _correct_length for `text` that has already been streamed.
+        
+        A continuation is streamed as ("text", delta) pairs to append. When the corrected text is
+        not just `text` plus those deltas (its tail was condensed), a final ("replace", text) pair
+        carries the whole corrected text.
+        """
+        queue = asyncio.Queue()
+        
+        async def generate(prompt: str, correction_words: int) -> str:
+            return await self._generate_text(
+                prompt, temperature=temperature,
+                max_tokens=self.budgeter.tokens_for(correction_words, scope), endpoint=scope
+            )
+        
+        async def extend(prompt: str, correction_words: int) -> str:
+            parts = []
+            async for delta in self._stream_text(
+                prompt, temperature=temperature,
+                max_tokens=self.budgeter.tokens_for(correction_words, scope), endpoint=scope
+            ):
+                if not parts:
+                    # Spliced on after a paragraph break, as LengthController does
+                    delta = delta.lstrip()
+                    if not delta:
+                        continue
+                    queue.put_nowait("\n\n")
+                parts.append(delta)
+                queue.put_nowait(delta)
+            return "".join(parts)
+        
+        task = asyncio.create_task(
+            self.length_controller.correct(text, words, generate, subject, scope=scope, extend=extend)
+        )
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            sent = text
+            while True:
+                delta = await queue.get()
+                if delta is None:
+                    break
+                sent += delta
+                yield "text", delta
+            corrected = await task
+            if corrected.split() != sent.split():
+                yield "replace", corrected
+        finally:
+            task.cancel()
+
+    async def aclose(self):
+        """Close the underlying HTTP connections of the async clients"""
+        await self.client.close()
+        if self._image_client is not None and hasattr(self._image_client.aio, "aclose"):
+            await self._image_client.aio.aclose()
+
+    async def _gather_bounded(self, coros: List[Any], limit: Optional[int] = None) -> List[Any]:
+        """Await coroutines concurrently, at most `limit` at a time, returning results in input order"""
+        semaphore = asyncio.Semaphore(limit or self.max_parallel_requests)
+
+        async def run(coro):
+            async with semaphore:
+                return await coro
+
+        return await asyncio.gather(*(run(coro) for coro in coros))
+
+    def _build_seed_context(
+        self,
         characters: Optional[List[CharacterDetail]] = None,
         story_settings: Optional[StorySettings] = None,
-        character_count: Optional[int] = None
-    ) -> List[str]:
-        """Generate three different 300-word story summaries with character consideration"""
-        
-        # Build character context
+        character_count: Optional[int] = None,
+        idea: str = ""
+    ) -> tuple:
+        """Build the character and settings sections of the seed-idea prompts"""
+        # Build character context: full sheets for characters the idea names, digests for the rest
         character_context = ""
         if characters:
-            character_context = "Predefined characters:\n" + "\n".join([
-                f"- {char.name}: {char.description}" +
-                (f"\n  Background: {char.background}" if char.background else "") +
-                (f"\n  Goals: {char.goals}" if char.goals else "") +
-                (f"\n  Traits: {', '.join(char.personality_traits)}" if char.personality_traits else "")
-                for char in characters
-            ])
+            character_context = "Predefined characters:\n" + self.character_bible.render(characters, idea)
         elif character_count:
             character_context = f"Generate {character_count} distinct characters appropriate for the story."
         else:
@@ -138,11 +507,132 @@ class StoryGenerator:
             World Details: {story_settings.world_building_details or 'Develop as needed'}
             """
 
-        prompt = f"""
-        Create THREE different engaging story summaries for a {genre} story. Each summary MUST be EXACTLY 300 words long (not including character arcs).
+        return character_context, settings_context
+
+    def _split_seed_summary(self, raw_summary: str) -> Optional[tuple]:
+        """Split one raw seed block into (summary, character arcs), or None if it is malformed"""
+        parts = raw_summary.split('[CHARACTER ARCS]')
+        if len(parts) < 2:
+            return None
+        
+        # Clean up the summary part
+        summary = parts[0]
+        for marker in ('[SUMMARY 1]', '[SUMMARY 2]', '[SUMMARY 3]', '[SUMMARY]'):
+            summary = summary.replace(marker, '')
+        return summary.strip(), parts[1].strip()
+
+    async def generate_seed_ideas(
+        self, 
+        genre: str, 
+        idea: str, 
+        target_chapters: int, 
+        style: str = "default",
+        characters: Optional[List[CharacterDetail]] = None,
+        story_settings: Optional[StorySettings] = None,
+        character_count: Optional[int] = None,
+        parallel_summaries: bool = False
+    ) -> List[str]:
+        """
+        Generate three different 300-word story summaries with character consideration
+        
+        With parallel_summaries the three summaries are requested as three independent,
+        concurrent calls instead of one long completion. Length corrections and refill calls
+        are always fanned out concurrently, bounded by max_parallel_requests.
+        """
+        character_context, settings_context = self._build_seed_context(characters, story_settings, character_count, idea)
+
+        if parallel_summaries:
+            raw_summaries = await self._gather_bounded([
+                self._generate_text(
+                    self._build_seed_prompt(genre, idea, style, character_context, settings_context, variant=variant),
+                    temperature=0.9,
+                    max_tokens=1000,
+                    cache_scope="seed_ideas"
+                )
+                for variant in range(1, 4)
+            ])
+        else:
+            result = await self._generate_text(
+                self._build_seed_prompt(genre, idea, style, character_context, settings_context),
+                temperature=0.9,
+                max_tokens=3000,
+                cache_scope="seed_ideas"
+            )
+            raw_summaries = [s.strip() for s in result.split('---') if s.strip()]
+        
+        # Process and validate summaries
+        # Only the first three are used, so extra ones are dropped before paying for their corrections
+        split_summaries = [parts for parts in map(self._split_seed_summary, raw_summaries) if parts][:3]
+        
+        # Length corrections and refills for missing summaries are independent, so they all go
+        # out in one concurrent round and are put back in order afterwards. Off-length summaries
+        # only get the missing words appended (or their ending condensed), not a full rewrite.
+        missing = max(0, 3 - len(split_summaries))
+        correction_calls = [
+            self._correct_length(summary, 300, subject=f"a 300-word summary of a {genre} story", scope="seed_ideas")
+            for summary, _ in split_summaries
+        ]
+        refill_calls = [
+            self._generate_text(f"""
+            Create a NEW and DIFFERENT 300-word story summary for a {genre} story based on this idea:
+            {idea}
+            
+            The summary must be EXACTLY 300 words and different from any previous summaries.
+            This is alternative #{len(split_summaries) + n}.
+            Include character arcs after the summary.
+            """, temperature=0.9, max_tokens=2000, cache_scope="seed_ideas")
+            for n in range(1, missing + 1)
+        ]
+        results = await self._gather_bounded(correction_calls + refill_calls)
+        
+        corrected = results[:len(split_summaries)]
+        split_summaries = [
+            (summary.strip(), character_arcs)
+            for summary, (_, character_arcs) in zip(corrected, split_summaries)
+        ]
+        
+        # Combine summary and character arcs
+        processed_summaries = [
+            f"{summary}\n\nCharacter Arcs:\n{character_arcs}"
+            for summary, character_arcs in split_summaries
+        ]
+        
+        # Ensure we have three summaries
+        processed_summaries.extend(new_summary.strip() for new_summary in results[len(split_summaries):])
+        
+        return processed_summaries
+
+    def _build_seed_prompt(self, genre: str, idea: str, style: str, character_context: str, settings_context: str,
+                           variant: Optional[int] = None) -> str:
+        """
+        Prompt asking for all three seed summaries in a single completion, or with `variant` for
+        just that one of the three, used for parallel generation
+        """
+        if variant is None:
+            request = f"Create THREE different engaging story summaries for a {genre} story. Each summary MUST be EXACTLY 300 words long (not including character arcs)."
+            take = ""
+            format_block = "\n        ---\n".join(f"""        [SUMMARY {n}]
+        [Write a compelling 300-word story summary here, as a continuous narrative]
+        [CHARACTER ARCS]
+        [Brief description of how each character grows or changes through the story]""" for n in range(1, 4))
+            each = "Each summary should:"
+        else:
+            request = f"Create ONE engaging story summary for a {genre} story. The summary MUST be EXACTLY 300 words long (not including character arcs)."
+            take = f"""
+        This is take #{variant} of 3 on the idea. Take #1 stays closest to the idea as given, take #2 explores
+        a bolder twist on the central conflict, take #3 approaches it from an unexpected character's perspective.
+"""
+            format_block = """        [SUMMARY]
+        [Write a compelling 300-word story summary here, as a continuous narrative]
+        [CHARACTER ARCS]
+        [Brief description of how each character grows or changes through the story]"""
+            each = "The summary should:"
+
+        return f"""
+        {request}
         Initial idea: {idea}
         Writing style: {style}
-
+{take}
         {character_context}
 
         {settings_context}
@@ -156,22 +646,9 @@ class StoryGenerator:
         - Write as a flowing, engaging story summary that captures the entire narrative
 
         Format Requirements:
-        [SUMMARY 1]
-        [Write a compelling 300-word story summary here, as a continuous narrative]
-        [CHARACTER ARCS]
-        [Brief description of how each character grows or changes through the story]
-        ---
-        [SUMMARY 2]
-        [Write a compelling 300-word story summary here, as a continuous narrative]
-        [CHARACTER ARCS]
-        [Brief description of how each character grows or changes through the story]
-        ---
-        [SUMMARY 3]
-        [Write a compelling 300-word story summary here, as a continuous narrative]
-        [CHARACTER ARCS]
-        [Brief description of how each character grows or changes through the story]
+{format_block}
 
-        Each summary should:
+        {each}
         1. Read like a professional book synopsis
         2. Present a complete story arc with conflict and resolution
         3. Focus on themes, character development, and major plot points
@@ -189,58 +666,16 @@ class StoryGenerator:
         - "The story concludes..."
         - "In this chapter..."
         """
-        
-        result = self._generate_text(prompt, temperature=0.9, max_tokens=3000)
-        
-        # Process and validate summaries
-        raw_summaries = [s.strip() for s in result.split('---') if s.strip()]
-        processed_summaries = []
-        
-        for raw_summary in raw_summaries:
-            # Split summary and character arcs
-            parts = raw_summary.split('[CHARACTER ARCS]')
-            if len(parts) < 2:
-                continue
-            
-            # Clean up the summary part
-            summary = parts[0].replace('[SUMMARY 1]', '').replace('[SUMMARY 2]', '').replace('[SUMMARY 3]', '').strip()
-            character_arcs = parts[1].strip()
-            
-            # Count words in summary
-            word_count = len(summary.split())
-            
-            # If summary is too short, try to expand it
-            if word_count < 300:
-                expansion_prompt = f"""
-                The following story summary is {word_count} words. Expand it to EXACTLY 300 words while maintaining the same story and style:
-                
-                {summary}
-                """
-                expanded_summary = self._generate_text(expansion_prompt, temperature=0.7, max_tokens=2000)
-                summary = expanded_summary.strip()
-            
-            # Combine summary and character arcs
-            processed_summaries.append(f"{summary}\n\nCharacter Arcs:\n{character_arcs}")
-        
-        # Ensure we have three summaries
-        while len(processed_summaries) < 3:
-            new_summary_prompt = f"""
-            Create a NEW and DIFFERENT 300-word story summary for a {genre} story based on this idea:
-            {idea}
-            
-            The summary must be EXACTLY 300 words and different from any previous summaries.
-            Include character arcs after the summary.
-            """
-            new_summary = self._generate_text(new_summary_prompt, temperature=0.9, max_tokens=2000)
-            processed_summaries.append(new_summary.strip())
-        
-        return processed_summaries[:3]  # Ensure we only return 3 summaries
 
-    def create_detailed_outline(self, seed_summary: str, genre: str, target_chapters: int, style: str = "default") -> List[Dict[str, Any]]:
-        """Create detailed chapter outlines from seed summary"""
-        prompt = f"""
+    def _build_outline_prompt(self, seed_summary: str, genre: str, target_chapters: int, style: str,
+                              characters: Optional[List[CharacterDetail]] = None,
+                              character_arcs: Optional[Dict[str, List[Dict[str, str]]]] = None) -> str:
+        """Build the single-call outline prompt shared by create_detailed_outline and stream_detailed_outline"""
+        character_context = self._build_outline_character_context(seed_summary, characters, character_arcs)
+        return f"""
         Based on this story summary:
         {seed_summary}
+        {character_context}
 
         Create a detailed chapter-by-chapter outline for a {genre} story with {target_chapters} chapters.
         Writing style: {style}
@@ -263,42 +698,262 @@ class StoryGenerator:
             ]
         }}
         """
-        
-        result = self._generate_text(prompt, temperature=0.7, max_tokens=3000)
+
+    def _build_outline_character_context(self, seed_summary: str, characters: Optional[List[CharacterDetail]] = None,
+                                         character_arcs: Optional[Dict[str, List[Dict[str, str]]]] = None) -> str:
+        character_sheet = self.character_bible.render(characters, seed_summary, character_arcs)
+        return f"""
+        Characters:
+        {character_sheet}
+        """ if character_sheet else ""
+
+    def _build_outline_skeleton_prompt(self, seed_summary: str, genre: str, target_chapters: int, style: str,
+                                       character_context: str) -> str:
+        """Prompt for the cheap first pass of a segmented outline: a title and one sentence per chapter"""
+        return f"""
+        Based on this story summary:
+        {seed_summary}
+        {character_context}
+
+        Plan a {genre} story in {style} style with exactly {target_chapters} chapters. For every chapter give
+        an engaging title and ONE sentence saying what happens in it. Together the chapters must tell the
+        whole story from beginning to end.
+
+        Respond with JSON only, in this format:
+        {{
+            "chapters": [
+                {{
+                    "number": 1,
+                    "title": "Chapter Title",
+                    "summary": "One sentence."
+                }},
+                ...
+            ]
+        }}
+        """
+
+    def _build_outline_batch_prompt(self, seed_summary: str, genre: str, style: str, character_context: str,
+                                    skeleton: Dict[int, Dict[str, Any]], numbers: List[int]) -> str:
+        """Prompt for detailed outlines of some chapters, with the whole skeleton as shared context"""
+        plan = "\n".join(
+            f"{number}. {skeleton[number]['title']}: {skeleton[number]['summary']}" for number in sorted(skeleton)
+        )
+        return f"""
+        Based on this story summary:
+        {seed_summary}
+        {character_context}
+
+        The {genre} story, in {style} style, is planned chapter by chapter as follows:
+        {plan}
+
+        Write the detailed outline of ONLY chapters {', '.join(str(n) for n in numbers)}, following the plan above
+        and keeping their planned titles. Each needs a 350-word summary of the chapter's events, key character
+        developments and important plot points.
+
+        Respond with JSON only, in this format:
+        {{
+            "chapters": [
+                {{
+                    "number": {numbers[0]},
+                    "title": "Chapter Title",
+                    "summary": "350-word summary"
+                }}
+            ]
+        }}
+        """
+
+    async def _segmented_outline(self, seed_summary: str, genre: str, target_chapters: int, style: str,
+                                 characters: Optional[List[CharacterDetail]] = None,
+                                 character_arcs: Optional[Dict[str, List[Dict[str, str]]]] = None):
+        """
+        Outline a long book in parts: one cheap skeleton call with a title and a sentence per chapter,
+        then batches of self.outline_batch_size detailed chapters written concurrently with the
+        skeleton as shared context. Yields chapter outlines as their batches finish; a detailed
+        chapter without a title keeps its skeleton title. When no skeleton chapter can be parsed,
+        the outline is written in a single call instead.
+        """
+        character_context = self._build_outline_character_context(seed_summary, characters, character_arcs)
+        result = await self._generate_text(
+            self._build_outline_skeleton_prompt(seed_summary, genre, target_chapters, style, character_context),
+            temperature=0.7, max_tokens=self.budgeter.tokens_for(40 * target_chapters, "outline"),
+            cache_scope="outline"
+        )
+        skeleton = merge_chapters(salvage_chapters(result), target_chapters)
+        if not skeleton:
+            print("Outline skeleton could not be parsed, outlining in a single call instead")
+            result = await self._generate_text(
+                self._build_outline_prompt(seed_summary, genre, target_chapters, style, characters, character_arcs),
+                temperature=0.7, max_tokens=3000, cache_scope="outline"
+            )
+            for chapter in merge_chapters(salvage_chapters(result), target_chapters).values():
+                yield chapter
+            return
+        titles = {number: chapter["title"] for number, chapter in skeleton.items()}
+
+        numbers = list(range(1, target_chapters + 1))
+        batches = [numbers[i:i + self.outline_batch_size] for i in range(0, len(numbers), self.outline_batch_size)]
+        semaphore = asyncio.Semaphore(self.max_parallel_requests)
+
+        async def detail(batch: List[int]) -> Dict[int, Dict[str, Any]]:
+            async with semaphore:
+                text = await self._generate_text(
+                    self._build_outline_batch_prompt(seed_summary, genre, style, character_context, skeleton, batch),
+                    temperature=0.7, max_tokens=self.budgeter.tokens_for(350 * len(batch) + 50, "outline"),
+                    cache_scope="outline"
+                )
+            detailed = merge_chapters(salvage_chapters(text, titles), target_chapters)
+            return {number: detailed[number] for number in batch if number in detailed}
+
+        tasks = [asyncio.ensure_future(detail(batch)) for batch in batches]
         try:
-            outline_data = json.loads(result)
-            return outline_data["chapters"]
-        except Exception as e:
-            print(f"Error parsing outline: {e}")
-            raise
+            for finished in asyncio.as_completed(tasks):
+                for _, chapter in sorted((await finished).items()):
+                    yield chapter
+        finally:
+            for task in tasks:
+                task.cancel()
 
-    def create_story(self, title: str, genre: str, style: str = "default") -> Story:
-        """Create a new story with basic metadata"""
+    def _build_outline_repair_prompt(self, seed_summary: str, genre: str, style: str, target_chapters: int,
+                                     chapters: Dict[int, Dict[str, Any]], missing: List[int]) -> str:
+        """Prompt for only the chapters an outline response lost, with the others' titles as context"""
+        known = "\n".join(f"{number}. {chapters[number]['title']}" for number in sorted(chapters))
+        return f"""
+        Based on this story summary:
+        {seed_summary}
+
+        A {genre} story in {style} style has {target_chapters} chapters. These chapters are already outlined:
+        {known or '(none yet)'}
+
+        Write the outline of ONLY chapters {', '.join(str(n) for n in missing)}, fitting between the chapters above.
+        Each needs an engaging title and a 350-word summary of the chapter's events, key character
+        developments and important plot points.
+
+        Respond with JSON only, in this format:
+        {{
+            "chapters": [
+                {{
+                    "number": {missing[0]},
+                    "title": "Chapter Title",
+                    "summary": "350-word summary"
+                }}
+            ]
+        }}
+        """
+
+    async def _repair_outline(self, seed_summary: str, genre: str, style: str, target_chapters: int,
+                              chapters: Dict[int, Dict[str, Any]]):
+        """
+        Request only the chapters missing from `chapters` (which is filled in place), for at most
+        self.outline_repair_rounds calls, yielding each recovered chapter
+        """
+        for _ in range(self.outline_repair_rounds):
+            missing = [number for number in range(1, target_chapters + 1) if number not in chapters]
+            if not missing:
+                return
+            print(f"Outline is missing chapters {missing}, requesting only those")
+            result = await self._generate_text(
+                self._build_outline_repair_prompt(seed_summary, genre, style, target_chapters, chapters, missing),
+                temperature=0.7, max_tokens=self.budgeter.tokens_for(350 * len(missing) + 50, "outline"),
+                endpoint="outline"
+            )
+            recovered = merge_chapters(salvage_chapters(result), target_chapters)
+            for number in missing:
+                if number in recovered:
+                    chapters[number] = recovered[number]
+                    yield recovered[number]
+
+        missing = [number for number in range(1, target_chapters + 1) if number not in chapters]
+        if missing:
+            raise ValueError(f"Outline is still missing chapters {missing}")
+
+    async def create_detailed_outline(self, seed_summary: str, genre: str, target_chapters: int, style: str = "default",
+                                      characters: Optional[List[CharacterDetail]] = None,
+                                      character_arcs: Optional[Dict[str, List[Dict[str, str]]]] = None) -> List[Dict[str, Any]]:
+        """
+        Create detailed chapter outlines from seed summary.
+        
+        Code fences, stray prose and cut-off arrays are salvaged; chapters that are still missing
+        are requested on their own instead of regenerating the whole outline. Books with more than
+        self.outline_segment_threshold chapters are outlined with _segmented_outline.
+        """
+        chapters: Dict[int, Dict[str, Any]] = {}
+        if target_chapters > self.outline_segment_threshold:
+            async for chapter in self._segmented_outline(
+                seed_summary, genre, target_chapters, style, characters, character_arcs
+            ):
+                chapters[chapter["number"]] = chapter
+        else:
+            prompt = self._build_outline_prompt(seed_summary, genre, target_chapters, style, characters, character_arcs)
+            result = await self._generate_text(prompt, temperature=0.7, max_tokens=3000, cache_scope="outline")
+            chapters = merge_chapters(salvage_chapters(result), target_chapters)
+        async for _ in self._repair_outline(seed_summary, genre, style, target_chapters, chapters):
+            pass
+        return [chapters[number] for number in sorted(chapters)]
+
+    async def stream_detailed_outline(self, seed_summary: str, genre: str, target_chapters: int, style: str = "default",
+                                      characters: Optional[List[CharacterDetail]] = None,
+                                      character_arcs: Optional[Dict[str, List[Dict[str, str]]]] = None):
+        """
+        Stream an outline, yielding each chapter outline dict as soon as its JSON object is complete.
+        
+        Chapters come in the order the model writes them (for segmented outlines, batch by batch
+        as batches finish); chapters re-requested by the repair step follow at the end.
+        """
+        chapters: Dict[int, Dict[str, Any]] = {}
+        if target_chapters > self.outline_segment_threshold:
+            async for chapter in self._segmented_outline(
+                seed_summary, genre, target_chapters, style, characters, character_arcs
+            ):
+                chapters[chapter["number"]] = chapter
+                yield chapter
+        else:
+            prompt = self._build_outline_prompt(seed_summary, genre, target_chapters, style, characters, character_arcs)
+            parser = ChapterStreamParser()
+            async for delta in self._stream_text(prompt, temperature=0.7, max_tokens=3000, endpoint="outline"):
+                for chapter in parser.feed(delta):
+                    if 1 <= chapter["number"] <= target_chapters and chapter["number"] not in chapters:
+                        chapters[chapter["number"]] = chapter
+                        yield chapter
+        async for chapter in self._repair_outline(seed_summary, genre, style, target_chapters, chapters):
+            yield chapter
+
+    def create_story(self, title: str, genre: str, style: str = "default", story_id: Optional[str] = None) -> Story:
+        """Create a new story with basic metadata, optionally re-using a known ID (e.g. when resuming a job)"""
         story = Story(
             title=title,
             genre=genre,
             writing_style=style
         )
+        if story_id:
+            story.id = story_id
         
-        self.stories[story.id] = {
-            "data": story,
-            "memory": StoryMemory(story.id)
-        }
+        self.store.save_story(story)
+        self.store.save_memory(StoryMemory(story.id))
         
         return story
         
-    def generate_chapter(self, chapter_number: int, chapter_summary: str, writing_style: str = "default", 
-                        previous_chapter_title: str = None, previous_chapter_ending: str = None, 
-                        next_chapter_summary: str = None, target_word_count: int = 2500) -> Chapter:
-        """Generate full chapter using summary and optional context provided by the frontend"""
+    def _build_chapter_prompt(self, chapter_number: int, chapter_summary: str, writing_style: str = "default",
+                              previous_chapter_title: str = None, previous_chapter_ending: str = None,
+                              next_chapter_summary: str = None, target_word_count: int = 2500,
+                              previous_chapter_summary: str = None, story_context: str = None,
+                              character_sheet: str = None) -> str:
+        """Build the chapter-writing prompt shared by generate_chapter and stream_chapter"""
         
-        # Build context based on provided parameters instead of in-memory storage
+        # Server-side story context when the chapter belongs to a stored story, else what the client sent
         previous_context = ""
-        if previous_chapter_title and previous_chapter_ending:
+        if story_context:
+            previous_context = story_context
+        elif previous_chapter_title and previous_chapter_ending:
             previous_context = f"""
             Previous chapter ({previous_chapter_title}) ended with:
             {previous_chapter_ending}
             """
+        elif previous_chapter_summary:
+            # Used when chapters are written in parallel and the previous text does not exist yet
+            previous_context = f"""
+            Previous chapter ({previous_chapter_title or f'Chapter {chapter_number - 1}'}) covers:
+            {previous_chapter_summary}
+            """
         elif chapter_number > 1:
             previous_context = "This follows the previous chapter."
         
@@ -312,10 +967,15 @@ class StoryGenerator:
             Make sure this chapter's ending leads naturally into these events.
             """
         
+        character_context = f"""
+            Characters:
+            {character_sheet}
+            """ if character_sheet else ""
+        
         prompt = f"""
         Write Chapter {chapter_number} based on this summary:
         {chapter_summary}
-
+        {character_context}
         {previous_context if previous_context else 'This is the first chapter.'}
 
         {next_chapter_context if next_chapter_context else 'This is the final chapter.' if not next_chapter_summary else ''}
@@ -338,74 +998,340 @@ class StoryGenerator:
         Then write the chapter content. Your chapter MUST be at least {target_word_count} words but not exceed {target_word_count + 500} words.
         """
         
-        result = self._generate_text(
-            prompt, 
-            temperature=0.7, 
-            max_tokens=self.max_output_tokens
-        )
-        
-        # Extract title and content
+        return prompt
+
+    def _parse_chapter(self, chapter_number: int, result: str) -> Chapter:
+        """Split a raw chapter completion into its title line and content"""
         lines = result.strip().split('\n')
         title = lines[0].replace('#', '').strip()
         content = '\n'.join(lines[1:]).strip()
         
-        # Create chapter
-        chapter = Chapter(
+        return Chapter(
             number=chapter_number,
             title=title,
             content=content,
             word_count=len(content.split())
         )
+
+    async def generate_chapter(self, chapter_number: int, chapter_summary: str, writing_style: str = "default", 
+                        previous_chapter_title: str = None, previous_chapter_ending: str = None, 
+                        next_chapter_summary: str = None, target_word_count: int = 2500,
+                        previous_chapter_summary: str = None, story_id: str = None) -> Chapter:
+        """
+        Generate full chapter using summary and optional context provided by the frontend.
         
+        With story_id the previous-chapter context comes from the stored story instead, and the
+        new chapter is saved to it and folded into its rolling summary.
+        """
+        character_sheet, story_context = (
+            self._story_context(story_id, chapter_number, chapter_summary, previous_chapter_ending) if story_id else (None, None)
+        )
+        prompt = self._build_chapter_prompt(
+            chapter_number, chapter_summary, writing_style, previous_chapter_title,
+            previous_chapter_ending, next_chapter_summary, target_word_count, previous_chapter_summary,
+            story_context, character_sheet
+        )
+        
+        subject = f"Chapter {chapter_number} of a story in {writing_style} style, covering: {chapter_summary}"
+        result = await self._generate_segmented(
+            prompt,
+            target_word_count,
+            subject=subject,
+            scope="chapter",
+            temperature=0.7,
+            cache_scope="chapter"
+        )
+        
+        # The prompt allows target..target+500 words, so correct toward the middle of that range
+        chapter = self._parse_chapter(chapter_number, result)
+        content = await self._correct_length(chapter.content, target_word_count + 250, subject, scope="chapter")
+        chapter = chapter.model_copy(update={"content": content, "word_count": len(content.split())})
+        if story_id:
+            self.remember_chapter(story_id, chapter)
         return chapter
+
+    async def stream_chapter(self, chapter_number: int, chapter_summary: str, writing_style: str = "default",
+                             previous_chapter_title: str = None, previous_chapter_ending: str = None,
+                             next_chapter_summary: str = None, target_word_count: int = 2500,
+                             story_id: str = None):
+        """
+        Stream a chapter as it is written.
         
-    def get_story(self, story_id: str) -> Optional[Story]:
-        """Retrieve a story by ID"""
-        if story_id in self.stories:
-            return self.stories[story_id]["data"]
-        return None
+        Yields a "title" event as soon as the "# Chapter Title" line is complete, "delta" events
+        with the chapter text as the model emits it, and a final "chapter" event carrying the
+        parsed Chapter metadata and word count. story_id works as in generate_chapter.
+        
+        The length is corrected as in generate_chapter: a short chapter gets its continuation as
+        more "delta" events, and a long one a "replace" event whose text replaces all chapter
+        text sent so far.
+        """
+        character_sheet, story_context = (
+            self._story_context(story_id, chapter_number, chapter_summary, previous_chapter_ending) if story_id else (None, None)
+        )
+        prompt = self._build_chapter_prompt(
+            chapter_number, chapter_summary, writing_style, previous_chapter_title,
+            previous_chapter_ending, next_chapter_summary, target_word_count,
+            story_context=story_context, character_sheet=character_sheet
+        )
+        
+        subject = f"Chapter {chapter_number} of a story in {writing_style} style, covering: {chapter_summary}"
+        title = ""
+        parts = []
+        async for kind, text in self._stream_segmented(
+            prompt,
+            target_word_count,
+            subject=subject,
+            scope="chapter",
+            temperature=0.7
+        ):
+            if kind == "title":
+                title = text.replace('#', '').strip()
+                yield {"event": "title", "number": chapter_number, "title": title}
+            else:
+                parts.append(text)
+                yield {"event": "delta", "text": text}
+        
+        content = "".join(parts)
+        async for kind, text in self._stream_length_correction(content, target_word_count + 250, subject, scope="chapter"):
+            if kind == "text":
+                content += text
+                yield {"event": "delta", "text": text}
+            else:
+                content = text
+                yield {"event": "replace", "text": text}
+        content = content.strip()
+        if story_id:
+            self.remember_chapter(story_id, Chapter(
+                number=chapter_number, title=title, content=content, word_count=len(content.split())
+            ))
+        yield {
+            "event": "chapter",
+            "number": chapter_number,
+            "title": title,
+            "word_count": len(content.split())
+        }
+        
+    async def stitch_chapter_boundary(self, previous_chapter: Chapter, chapter: Chapter, writing_style: str = "default") -> Chapter:
+        """
+        Smooth the transition into a chapter that was written without seeing the previous one.
+        
+        Only the opening paragraphs of `chapter` (at most STITCH_OPENING_WORDS words, cut at lines
+        or sentences when the paragraphs are longer) are sent and rewritten, together with the ending
+        of `previous_chapter`, so the call stays cheap regardless of chapter length. A chapter whose
+        first sentence is already longer than that is returned unchanged rather than truncated.
+        """
+        split = split_opening(chapter.content, self.stitch_opening_words)
+        if split is None:
+            print(f"Not stitching chapter {chapter.number}: its opening is longer than {self.stitch_opening_words} words")
+            return chapter
+        opening, rest = split
+        opening_text = opening.strip()
+        # The break after the opening (paragraph, line or space) goes back in after the rewrite
+        separator = opening[len(opening.rstrip()):].lstrip(" \t") or " "
+        previous_ending = " ".join(previous_chapter.content.split()[-200:])
+        
+        prompt = f"""
+        The previous chapter ("{previous_chapter.title}") ends with:
+        {previous_ending}
+
+        The next chapter ("{chapter.title}") currently opens with:
+        {opening_text}
+
+        Rewrite ONLY this opening so it follows on naturally from the previous chapter's ending:
+        fix any contradictions in time, place or who is present, and keep the same events, length and style ({writing_style}).
+        Return only the rewritten opening, with no title or commentary.
+        """
+        
+        rewritten = await self._generate_text(prompt, temperature=0.5, max_tokens=600, endpoint="stitch")
+        content = rewritten.strip() + (separator + rest if rest else "")
+        return Chapter(
+            number=chapter.number,
+            title=chapter.title,
+            content=content,
+            word_count=len(content.split())
+        )
+
+    def get_story(self, story_id: str, include_chapters: bool = True) -> Optional[Story]:
+        """Retrieve a story by ID, optionally without loading the chapter bodies"""
+        return self.store.get_story(story_id, include_chapters=include_chapters)
+
+    def delete_story(self, story_id: str):
+        """Delete a story with its chapters, memory and passage index"""
+        self.store.delete_story(story_id)
+        self.passage_index.delete(story_id)
+        self._memory_locks.pop(story_id, None)
+
+    def list_stories(self) -> List[Dict[str, Any]]:
+        """List stored stories with chapter titles and word counts but no chapter text"""
+        return self.store.list_stories()
+
+    def save_story(self, story: Story):
+        """Write back changes made to a story's metadata"""
+        story.update_timestamp()
+        self.store.save_story(story)
+
+    def get_memory(self, story_id: str) -> Optional[StoryMemory]:
+        """Retrieve the memory of a story by ID"""
+        return self.store.get_memory(story_id)
+
+    def save_chapter(self, story_id: str, chapter: Chapter):
+        """Add or replace a generated chapter on a stored story"""
+        story = self.get_story(story_id, include_chapters=False)
+        if not story:
+            raise ValueError(f"Story with ID {story_id} not found")
+        
+        self.store.save_chapter(story_id, chapter)
+        self.save_story(story)
 
     def store_chapter_outlines(self, story_id: str, chapter_outlines: List[Dict[str, Any]]):
         """Store all chapter outlines in the story's memory for future reference"""
-        if story_id not in self.stories:
+        memory = self.store.get_memory(story_id)
+        if memory is None:
             raise ValueError(f"Story with ID {story_id} not found")
         
-        memory = self.stories[story_id]["memory"]
-        
         for outline in chapter_outlines:
-            memory.add_chapter_summary(outline["number"], outline["summary"])
+            memory.add_chapter_outline(outline)
+        self.store.save_memory(memory)
         
         return True
 
-    def generate_book_cover(self, story_title: str, story_summary: str, characters: List[CharacterDetail] = None, genre: str = None) -> dict:
+    def _story_context(self, story_id: str, chapter_number: int, chapter_summary: str,
+                       previous_chapter_ending: str = None) -> Tuple[Optional[str], Optional[str]]:
         """
-        Generate a book cover image using Gemini API based on the story details
+        Context sections of a chapter prompt built from a stored story: (character sheet for the
+        characters the outline summary names, story-so-far context). The latter holds the rolling
+        summary, the previous chapter's ending and earlier passages that match the outline summary
+        and those characters.
+        """
+        memory = self.store.get_memory(story_id)
+        story = self.store.get_story(story_id)
+        if memory is None or story is None:
+            raise ValueError(f"Story with ID {story_id} not found")
         
-        Returns:
-            dict: Contains base64 encoded image and mime type
+        character_sheet = self.character_bible.render(
+            story.characters, chapter_summary, story.character_arcs, chapter_number=chapter_number
+        )
+        if chapter_number <= 1:
+            return character_sheet or None, None
+        
+        chapters = {chapter.number: chapter for chapter in story.chapters}
+        previous_chapter = chapters.get(chapter_number - 1)
+        previous_outline = memory.chapter_outlines.get(chapter_number - 1, {})
+        context = self.narrative_context.build(
+            chapter_number,
+            memory.rolling_summary_before(chapter_number),
+            previous_title=previous_chapter.title if previous_chapter else previous_outline.get("title"),
+            previous_ending=previous_chapter_ending or (previous_chapter.content if previous_chapter else None),
+            previous_outline=memory.get_chapter_summary(chapter_number - 1)
+        )
+        
+        # Names the outline mentions are repeated in the query so passages about those characters rank higher
+        summary_lower = chapter_summary.lower()
+        names = [c.name for c in story.characters if c.name and c.name.lower() in summary_lower]
+        context += self.passage_index.recall(
+            story_id, story.chapters, " ".join([chapter_summary] + names), before_chapter=chapter_number
+        )
+        return character_sheet or None, context or None
+
+    async def update_rolling_summary(self, story_id: str, chapter: Chapter):
         """
-        try:
+        Fold chapters into the story's rolling summary, strictly in chapter order.
+        
+        A changed `chapter` first drops the snapshots from its number on. Then, one short call per
+        chapter, every stored chapter after the last unbroken snapshot is folded in until one is
+        missing. A chapter finished before the one ahead of it is therefore folded when that one
+        arrives, and later chapters whose snapshots were dropped are folded again.
+        """
+        lock = self._memory_locks.setdefault(story_id, asyncio.Lock())
+        async with lock:
+            memory = self.store.get_memory(story_id)
+            if memory is None:
+                self._memory_locks.pop(story_id, None)
+                return
+            fingerprint = chapter_fingerprint(chapter.title, chapter.content)
+            if memory.rolling_fingerprints.get(chapter.number, fingerprint) != fingerprint:
+                memory.drop_rolling_summaries_from(chapter.number)
+                self.store.save_memory(memory)
+            
+            number = memory.folded_through() + 1
+            while True:
+                current = chapter if number == chapter.number else self.store.get_chapter(story_id, number)
+                if current is None:
+                    return
+                prompt = self.narrative_context.build_update_prompt(
+                    memory.rolling_summary_before(number), number, current.title, current.content
+                )
+                summary = await self._generate_text(
+                    prompt, temperature=0.3,
+                    max_tokens=self.budgeter.tokens_for(self.narrative_context.summary_words, "memory"),
+                    endpoint="memory"
+                )
+                # Re-read: outlines or other summaries may have been saved while the call ran
+                memory = self.store.get_memory(story_id)
+                if memory is None:
+                    # Deleted or evicted while the call ran
+                    self._memory_locks.pop(story_id, None)
+                    return
+                memory.set_rolling_summary(number, summary.strip(), chapter_fingerprint(current.title, current.content))
+                self.store.save_memory(memory)
+                self.narrative_context.counters["updates"] += 1
+                number += 1
+
+    def remember_chapter(self, story_id: str, chapter: Chapter):
+        """Save and index a generated chapter and update the rolling summary without holding up the response"""
+        self.save_chapter(story_id, chapter)
+        self.passage_index.add_chapter(story_id, chapter.number, chapter.title, chapter.content)
+
+        async def update():
+            # Bookkeeping queues behind interactive calls
+            llm_priority.set(PRIORITY_BULK)
+            try:
+                await self.update_rolling_summary(story_id, chapter)
+            except Exception as e:
+                print(f"Error updating rolling summary of story {story_id}: {e}")
+
+        task = asyncio.create_task(update())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _get_image_client(self):
+        """The long-lived Gemini client; its connection pool is reused by every cover request"""
+        if self._image_client is None:
             gemini_api_key = os.getenv("GEMINI_API_KEY")
             if not gemini_api_key:
                 raise ValueError("Gemini API key not found in environment variables")
-                
-            client = genai.Client(api_key=gemini_api_key)
-            model = "gemini-2.0-flash-exp-image-generation"
-            
-            # Create character descriptions for the prompt
-            character_descriptions = ""
-            if characters and len(characters) > 0:
-                character_descriptions = "Main characters:\n"
-                for char in characters[:3]:  # Limit to 3 main characters
-                    character_descriptions += f"- {char.name}: {char.description}\n"
-            
-            # Craft a prompt specifically for book cover generation
-            prompt = f"""
+            self._image_client = genai.Client(
+                api_key=gemini_api_key,
+                http_options=types.HttpOptions(timeout=int(self.cover_timeout_seconds * 1000))
+            )
+        return self._image_client
+
+    async def warm_image_client(self):
+        """
+        Create the image client and open its connection ahead of the first cover request.
+        
+        Fetching the model's metadata is cheap and leaves a warm connection in the pool.
+        """
+        client = self._get_image_client()
+        await client.aio.models.get(model=self.image_model)
+        print(f"Image client warmed up for {self.image_model}")
+
+    def _build_cover_prompt(self, story_title: str, story_summary: str, characters: List[CharacterDetail] = None, genre: str = None) -> str:
+        # Create character descriptions for the prompt
+        character_descriptions = ""
+        if characters and len(characters) > 0:
+            # Characters the summary names first, within a small budget
+            character_descriptions = "Main characters:\n" + self.character_bible.render(
+                characters, story_summary, max_tokens=self.character_bible.cover_max_tokens
+            )
+        
+        # Craft a prompt specifically for book cover generation
+        return f"""
             ONLY GENERATE AN IMAGE. NO TEXT RESPONSE.
             
             Create a professional, eye-catching book cover image for the following story:
             
-            Title: The Phantom Next Door
+            Title: {story_title}
             Genre: {genre or "Fiction"}
             
             Summary: {story_summary[:500]}
@@ -422,54 +1348,113 @@ class StoryGenerator:
             - No text elements, watermarks, or signatures
             - Image should have portrait orientation (taller than wide)
             """
-            
-            contents = [
-                types.Content(
-                    role="user",
-                    parts=[types.Part.from_text(text=prompt)],
-                ),
-            ]
-            
-            generate_content_config = types.GenerateContentConfig(
-                esponse_modalities=[
-            "image",
-            "text",
-        ],
-                response_mime_type="text/plain",
-            )
-            
-            # Stream response and collect image data
-            image_data = None
-            mime_type = None
-            
-            for chunk in client.models.generate_content_stream(
-                model=model,
-                contents=contents,
-                config=generate_content_config,
-            ):
+
+    async def _stream_first_image(self, prompt: str) -> bytes:
+        """Stream the Gemini response and stop at the first inline image instead of reading it to the end"""
+        contents = [
+            types.Content(
+                role="user",
+                parts=[types.Part.from_text(text=prompt)],
+            ),
+        ]
+        generate_content_config = types.GenerateContentConfig(response_modalities=["IMAGE", "TEXT"])
+        
+        stream = await self._get_image_client().aio.models.generate_content_stream(
+            model=self.image_model,
+            contents=contents,
+            config=generate_content_config,
+        )
+        try:
+            async for chunk in stream:
                 if not chunk.candidates or not chunk.candidates[0].content or not chunk.candidates[0].content.parts:
                     continue
-                    
-                if chunk.candidates[0].content.parts[0].inline_data:
-                    inline_data = chunk.candidates[0].content.parts[0].inline_data
-                    image_data = inline_data.data
-                    mime_type = inline_data.mime_type
-                    break
+                for part in chunk.candidates[0].content.parts:
+                    if part.inline_data and part.inline_data.data:
+                        return part.inline_data.data
+        finally:
+            # Closing the stream releases the connection back to the pool, including on early return
+            await stream.aclose()
+        raise ValueError("No image was generated in the response")
+
+    async def generate_book_cover(self, story_title: str, story_summary: str, characters: List[CharacterDetail] = None, genre: str = None) -> dict:
+        """
+        Generate a book cover image using Gemini API based on the story details
+        
+        The request goes through the shared async image client and is cancelled when it runs past
+        COVER_GENERATION_TIMEOUT_SECONDS.
+        
+        The image is downscaled and recompressed to the print box before it is returned, and the
+        result is cached so exporting it in a PDF does not process it again. It is also kept in
+        the blob store so clients can fetch it and refer to it by cover_id.
+        
+        Returns:
+            dict: Contains base64 encoded image, mime type and cover_id
+        """
+        try:
+            prompt = self._build_cover_prompt(story_title, story_summary, characters, genre)
+            try:
+                image_data = await asyncio.wait_for(
+                    self._stream_first_image(prompt), timeout=self.cover_timeout_seconds
+                )
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Cover generation took longer than {self.cover_timeout_seconds:g}s")
             
-            if not image_data:
-                raise ValueError("No image was generated in the response")
-                
-            # Return base64 encoded image and mime type
+            # Store the processed cover and return it by id and as base64 encoded JPEG
+            jpeg_bytes, data_url = await asyncio.to_thread(self.cover_processor.prepare_generated_cover, image_data)
+            # Both write files, so they run off the event loop like the processing above
+            cover_id = await asyncio.to_thread(self.blobs.put, jpeg_bytes, "image/jpeg")
+            await asyncio.to_thread(self.cover_processor.register_blob, cover_id, jpeg_bytes)
             return {
-                "image_data": base64.b64encode(image_data).decode('utf-8'),
-                "mime_type": mime_type
+                "image_data": data_url.split(",", 1)[1],
+                "mime_type": "image/jpeg",
+                "cover_id": cover_id
             }
             
         except Exception as e:
             print(f"Error generating book cover: {e}")
             raise
 
-    def generate_surprise_story(self, category: str, story_type: str, length: str, tone: str, target_audience: str, prompt: str) -> dict:
+    def _build_surprise_prompt(self, category: str, story_type: str, length: str, tone: str, target_audience: str, prompt: str) -> str:
+        """Build the surprise-story prompt shared by generate_surprise_story and stream_surprise_story"""
+        word_count = self._surprise_word_count(length)
+        
+        # Create a system prompt based on the user's preferences
+        system_prompt = f"""
+        You are a creative storyteller tasked with writing a {length.lower()} {story_type.lower()} story.
+        
+        Story Category: {category}
+        Story Type: {story_type}
+        Tone: {tone}
+        Target Audience: {target_audience}
+        
+        Please write a complete, engaging story that matches these specifications.
+        The story should be approximately {word_count} words in length.
+        Make it appropriate for the target audience and maintain the specified tone throughout.
+        
+        Include a title for the story at the beginning.
+        """
+        
+        return system_prompt + "\n\n" + prompt
+
+    def _surprise_word_count(self, length: str) -> int:
+        """Word target for a surprise story of the given length"""
+        if length.lower() == "medium story":
+            return 2000
+        if length.lower() == "long story":
+            return 3000
+        return 1000
+
+    def _surprise_subject(self, story_type: str, length: str, tone: str, target_audience: str) -> str:
+        return f"a {length.lower()} {story_type.lower()} story with a {tone.lower()} tone for {target_audience.lower()}"
+
+    def _parse_surprise_title(self, first_line: str) -> str:
+        """Strip the optional "Title:" prefix from the first line of a surprise story"""
+        title = first_line.strip()
+        if title.startswith('Title:'):
+            title = title[6:].strip()
+        return title
+
+    async def generate_surprise_story(self, category: str, story_type: str, length: str, tone: str, target_audience: str, prompt: str) -> dict:
         """
         Generate a complete surprise story based on user preferences.
         
@@ -485,41 +1470,23 @@ class StoryGenerator:
             A dictionary containing the generated story
         """
         try:
-            # Determine word count based on length
-            word_count = 1000
-            if length.lower() == "medium story":
-                word_count = 2000
-            elif length.lower() == "long story":
-                word_count = 3000
-            
-            # Create a system prompt based on the user's preferences
-            system_prompt = f"""
-            You are a creative storyteller tasked with writing a {length.lower()} {story_type.lower()} story.
-            
-            Story Category: {category}
-            Story Type: {story_type}
-            Tone: {tone}
-            Target Audience: {target_audience}
-            
-            Please write a complete, engaging story that matches these specifications.
-            The story should be approximately {word_count} words in length.
-            Make it appropriate for the target audience and maintain the specified tone throughout.
-            
-            Include a title for the story at the beginning.
-            """
-            
             # Generate the story using the OpenAI API
-            story_text = self._generate_text(
-                prompt=system_prompt + "\n\n" + prompt,
+            subject = self._surprise_subject(story_type, length, tone, target_audience)
+            story_text = await self._generate_segmented(
+                self._build_surprise_prompt(category, story_type, length, tone, target_audience, prompt),
+                self._surprise_word_count(length),
+                subject=subject,
+                scope="surprise",
                 temperature=0.8,
-                max_tokens=4000
+                cache_scope="surprise"
+            )
+            story_text = await self._correct_length(
+                story_text, self._surprise_word_count(length), subject, scope="surprise", temperature=0.8
             )
             
             # Extract the title from the story (assuming it's the first line)
             lines = story_text.strip().split('\n')
-            title = lines[0].strip()
-            if title.startswith('Title:'):
-                title = title[6:].strip()
+            title = self._parse_surprise_title(lines[0])
             
             # Create a response object
             response = {
@@ -540,6 +1507,59 @@ class StoryGenerator:
             print(f"Error generating surprise story: {str(e)}")
             raise e
 
+    async def stream_surprise_story(self, category: str, story_type: str, length: str, tone: str, target_audience: str, prompt: str):
+        """
+        Stream a surprise story as it is written.
+        
+        Yields a "title" event once the title line is complete, "delta" events with the story
+        body, and a final "story" event with the same metadata generate_surprise_story returns
+        (without the content, which the client has already received as deltas).
+        
+        The body's length is corrected as in generate_surprise_story: a short story gets its
+        continuation as more "delta" events, and a long one a "replace" event whose text replaces
+        the whole body sent so far. The title is never rewritten.
+        """
+        subject = self._surprise_subject(story_type, length, tone, target_audience)
+        title_line = ""
+        parts = []
+        async for kind, text in self._stream_segmented(
+            self._build_surprise_prompt(category, story_type, length, tone, target_audience, prompt),
+            self._surprise_word_count(length),
+            subject=subject,
+            scope="surprise",
+            temperature=0.8
+        ):
+            if kind == "title":
+                title_line = text
+                yield {"event": "title", "title": self._parse_surprise_title(text)}
+            else:
+                parts.append(text)
+                yield {"event": "delta", "text": text}
+        
+        body = "".join(parts)
+        async for kind, text in self._stream_length_correction(
+            body, self._surprise_word_count(length), subject, scope="surprise", temperature=0.8
+        ):
+            if kind == "text":
+                body += text
+                yield {"event": "delta", "text": text}
+            else:
+                body = text
+                yield {"event": "replace", "text": text}
+        
+        story_text = title_line + "\n" + body
+        yield {
+            "event": "story",
+            "title": self._parse_surprise_title(title_line),
+            "category": category,
+            "story_type": story_type,
+            "length": length,
+            "tone": tone,
+            "target_audience": target_audience,
+            "word_count": len(story_text.split()),
+            "created_at": datetime.now().isoformat()
+        }
+
     class DetailedOutlineRequest(BaseModel):
         seed_summary: str
         genre: str
@@ -550,4 +1570,33 @@ class StoryGenerator:
         character_count: Optional[int] = None
         characters: Optional[List[CharacterDetail]] = None
         story_settings: StorySettings
-        story_id: Optional[str] = None
\ No newline at end of file
+        story_id: Optional[str] = None
+
+
+class SyncStoryGenerator:
+    """
+    Blocking facade over StoryGenerator for scripts such as pdf_generation.py.
+    
+    Every coroutine method of StoryGenerator is exposed under the same name as a plain
+    function that runs on a private event loop. Do not use it from inside a running loop.
+    """
+    def __init__(self, api_key: str = None, generator: Optional[StoryGenerator] = None):
+        self.generator = generator or StoryGenerator(api_key=api_key)
+        self._loop = asyncio.new_event_loop()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.generator, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def run_blocking(*args, **kwargs):
+            return self._loop.run_until_complete(attr(*args, **kwargs))
+
+        return run_blocking
+
+    def close(self):
+        """Release the HTTP connections and the private event loop"""
+        if not self._loop.is_closed():
+            self._loop.run_until_complete(self.generator.aclose())
+            self._loop.close()
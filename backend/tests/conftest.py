@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level modules, the same way main.py runs them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_generator(tmp_path, monkeypatch):
+    """Build StoryGenerators that keep everything in memory or under tmp_path"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("PASSAGE_INDEX_DIR", "")
+    monkeypatch.delenv("LLM_CACHE_DB", raising=False)
+    monkeypatch.setenv("COVER_CACHE_DIR", str(tmp_path / "covers"))
+    # The processor is a process-wide singleton: rebuild it so it picks up the directory above
+    from image_utils import get_cover_processor
+    get_cover_processor.cache_clear()
+
+    def make(**kwargs):
+        from blob_utils import BlobStore
+        from store_utils import InMemoryStoryStore
+        from story_utils import StoryGenerator
+
+        kwargs.setdefault("store", InMemoryStoryStore())
+        kwargs.setdefault("blobs", BlobStore(str(tmp_path / "blobs")))
+        return StoryGenerator(**kwargs)
+    yield make
+    get_cover_processor.cache_clear()
+
+
+@pytest.fixture(scope="session")
+def story_routes(tmp_path_factory):
+    """The routes module, imported once with every file it keeps under a temporary directory"""
+    data = tmp_path_factory.mktemp("data")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("OPENAI_API_KEY", "test-key")
+        patch.setenv("PASSAGE_INDEX_DIR", "")
+        patch.delenv("LLM_CACHE_DB", raising=False)
+        patch.delenv("STORY_STORE", raising=False)
+        patch.setenv("BOOK_JOB_DB", str(data / "book_jobs.db"))
+        patch.setenv("BLOB_STORE_DIR", str(data / "blobs"))
+        patch.setenv("COVER_CACHE_DIR", str(data / "covers"))
+        patch.setenv("PDF_FRAGMENT_CACHE_DIR", str(data / "pdf_fragments"))
+        patch.setenv("PDF_EXPORT_DIR", str(data / "pdf_exports"))
+        patch.setenv("STORY_STORE_SPILL_DIR", str(data / "story_spill"))
+        from routes import story_routes
+        yield story_routes
+
+
+@pytest.fixture
+def api(story_routes):
+    """A test client for the story routes, mounted where main.py mounts them"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+    app.include_router(story_routes.story_router, prefix="/api/story")
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,130 @@
+import fnmatch
+from typing import Any, Dict, Optional
+
+
+class FakeRedis:
+    """
+    In-process stand-in for the subset of redis.Redis that RedisStoryStore uses.
+
+    Values come back as bytes like a real client without decode_responses. Key expiry follows
+    `now`, which tests move forward with advance() instead of sleeping.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    def _encode(self, value) -> bytes:
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode("utf-8")
+
+    def _live(self, key: str) -> Optional[Any]:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= self.now:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    def keys(self, pattern: str = "*"):
+        return [key.encode("utf-8") for key in list(self._data) if self._live(key) is not None and fnmatch.fnmatchcase(key, pattern)]
+
+    def ttl(self, key: str) -> int:
+        if self._live(key) is None:
+            return -2
+        expires = self._expires.get(key)
+        return -1 if expires is None else int(expires - self.now)
+
+    # Strings
+    def get(self, key: str) -> Optional[bytes]:
+        return self._live(key)
+
+    def set(self, key: str, value, ex: Optional[int] = None):
+        self._data[key] = self._encode(value)
+        self._expires.pop(key, None)
+        if ex is not None:
+            self._expires[key] = self.now + ex
+        return True
+
+    def expire(self, key: str, seconds: int) -> bool:
+        if self._live(key) is None:
+            return False
+        self._expires[key] = self.now + seconds
+        return True
+
+    def delete(self, *keys: str) -> int:
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                removed += 1
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return removed
+
+    # Hashes
+    def hset(self, key: str, field, value) -> int:
+        table = self._live(key)
+        if table is None:
+            table = self._data[key] = {}
+        field = self._encode(field)
+        added = field not in table
+        table[field] = self._encode(value)
+        return int(added)
+
+    def hget(self, key: str, field) -> Optional[bytes]:
+        return (self._live(key) or {}).get(self._encode(field))
+
+    def hgetall(self, key: str) -> Dict[bytes, bytes]:
+        return dict(self._live(key) or {})
+
+    # Sorted sets
+    def zadd(self, key: str, mapping: Dict[str, float]) -> int:
+        scores = self._live(key)
+        if scores is None:
+            scores = self._data[key] = {}
+        added = 0
+        for member, score in mapping.items():
+            member = self._encode(member)
+            added += member not in scores
+            scores[member] = score
+        return added
+
+    def zrange(self, key: str, start: int, end: int):
+        members = sorted((self._live(key) or {}).items(), key=lambda item: (item[1], item[0]))
+        members = [member for member, _ in members]
+        return members[start:] if end == -1 else members[start:end + 1]
+
+    def zrem(self, key: str, *members) -> int:
+        scores = self._live(key) or {}
+        removed = sum(scores.pop(self._encode(member), None) is not None for member in members)
+        if not scores:
+            # Redis drops a sorted set once its last member is removed
+            self.delete(key)
+        return removed
+
+    def pipeline(self) -> "FakePipeline":
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues commands and runs them in order on execute(), like a non-transactional redis pipeline"""
+
+    def __init__(self, client: FakeRedis):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        method = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        commands, self._commands = self._commands, []
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
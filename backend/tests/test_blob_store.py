@@ -0,0 +1,46 @@
+import os
+
+from blob_utils import BlobStore
+
+
+def age(store: BlobStore, blob_id: str, seconds_ago: float):
+    path = store.path(blob_id)
+    mtime = os.path.getmtime(path) - seconds_ago
+    os.utime(path, (mtime, mtime))
+
+
+def test_identical_bytes_are_stored_once(tmp_path):
+    store = BlobStore(str(tmp_path))
+
+    first = store.put(b"cover", "image/jpeg")
+    second = store.put(b"cover", "image/jpeg")
+
+    assert first == second and first.endswith(".jpg")
+    assert store.counters["stored"] == 1 and store.counters["deduplicated"] == 1
+
+
+def test_least_recently_used_blobs_are_evicted_past_max_entries(tmp_path):
+    store = BlobStore(str(tmp_path), max_entries=2)
+    old = store.put(b"old", "image/jpeg")
+    read = store.put(b"read", "image/jpeg")
+    age(store, old, 20)
+    age(store, read, 30)
+    store.get(read)
+
+    store.put(b"new", "image/jpeg")
+
+    assert store.get(old) is None
+    assert store.get(read) is not None
+    assert store.counters["evicted"] == 1
+
+
+def test_blobs_are_evicted_past_max_bytes(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=250)
+    first = store.put(b"a" * 100, "image/png")
+    age(store, first, 10)
+    second = store.put(b"b" * 100, "image/png")
+
+    third = store.put(b"c" * 100, "image/png")
+
+    assert store.get(first) is None
+    assert store.get(second) and store.get(third)
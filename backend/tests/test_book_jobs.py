@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+
+import job_utils
+from job_utils import BookJob, BookJobScheduler, JobStore
+from story_utils import Chapter
+
+
+def outlines(count: int):
+    return [{"number": n, "title": f"Chapter {n}", "summary": f"Summary {n}"} for n in range(1, count + 1)]
+
+
+def make_scheduler(make_generator, tmp_path, generate_chapter, story_id=None):
+    generator = make_generator()
+    generator.generate_chapter = generate_chapter
+
+    async def stitch(previous_chapter, chapter, writing_style="default"):
+        return chapter
+
+    generator.stitch_chapter_boundary = stitch
+    story = generator.create_story(title="The Tower", genre="Fantasy", story_id=story_id)
+    generator.store_chapter_outlines(story.id, outlines(3))
+    return BookJobScheduler(generator, store=JobStore(str(tmp_path / "jobs.db"))), story
+
+
+async def wait_finished(job):
+    while not job.is_finished():
+        await asyncio.sleep(0.01)
+
+
+def test_failed_chapter_cancels_the_rest_and_retry_resumes(make_generator, tmp_path):
+    calls = []
+    cancelled = []
+    failing = {"chapter": 2}
+
+    async def generate_chapter(chapter_number, chapter_summary, story_id=None, **kwargs):
+        calls.append((chapter_number, story_id))
+        if chapter_number == failing["chapter"]:
+            await asyncio.sleep(0.01)
+            raise RuntimeError("model unavailable")
+        if chapter_number == 3 and failing["chapter"]:
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(chapter_number)
+                raise
+        return Chapter(number=chapter_number, title=f"Chapter {chapter_number}",
+                       content=f"Text {chapter_number}.", word_count=2)
+
+    scheduler, story = make_scheduler(make_generator, tmp_path, generate_chapter)
+
+    async def run():
+        job = scheduler.submit(story.id)
+        await wait_finished(job)
+        assert job.status == "failed"
+        assert job.error == "model unavailable"
+        assert cancelled == [3]
+
+        failing["chapter"] = None
+        calls.clear()
+        job = scheduler.retry(job.id)
+        await wait_finished(job)
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.status == "completed"
+    assert job.error is None
+    # Chapter 1 was checkpointed before the failure and is not generated again
+    assert sorted(calls) == [(2, story.id), (3, story.id)]
+    assert [c.number for c in scheduler.generator.get_story(story.id).chapters] == [1, 2, 3]
+
+
+def test_only_failed_jobs_can_be_retried(make_generator, tmp_path):
+    async def generate_chapter(chapter_number, chapter_summary, **kwargs):
+        return Chapter(number=chapter_number, title="", content="Text.", word_count=1)
+
+    scheduler, story = make_scheduler(make_generator, tmp_path, generate_chapter)
+
+    async def run():
+        job = scheduler.submit(story.id)
+        await wait_finished(job)
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.status == "completed"
+    with pytest.raises(ValueError, match="only failed jobs"):
+        scheduler.retry(job.id)
+
+
+def test_checkpointed_chapters_are_remembered_in_a_fresh_process(make_generator, tmp_path):
+    async def fail_chapter_2(chapter_number, chapter_summary, **kwargs):
+        if chapter_number == 2:
+            raise RuntimeError("worker crashed")
+        return Chapter(number=chapter_number, title=f"Chapter {chapter_number}", content="Text.", word_count=1)
+
+    async def generate_chapter(chapter_number, chapter_summary, **kwargs):
+        return Chapter(number=chapter_number, title=f"Chapter {chapter_number}", content="Text.", word_count=1)
+
+    first, story = make_scheduler(make_generator, tmp_path, fail_chapter_2)
+
+    async def run(scheduler, start):
+        job = start()
+        await wait_finished(job)
+        return job
+
+    job = asyncio.run(run(first, lambda: first.submit(story.id)))
+    assert job.status == "failed"
+
+    # Same job database, but a new generator whose store has never seen the story's chapters
+    second, _ = make_scheduler(make_generator, tmp_path, generate_chapter, story_id=story.id)
+    remembered = []
+    second.generator.remember_chapter = lambda story_id, chapter: remembered.append(chapter.number)
+
+    job = asyncio.run(run(second, lambda: second.retry(job.id)))
+
+    assert job.status == "completed"
+    assert 1 in remembered
+
+
+def test_lease_is_exclusive_until_it_expires(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(job_utils.time, "time", lambda: now[0])
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job = BookJob(story_id="story")
+    store.save_job(job)
+
+    assert store.claim(job.id, "worker-a", 60)
+    assert not store.claim(job.id, "worker-b", 60)
+    now[0] += 50
+    store.renew(job.id, "worker-a", 60)
+    now[0] += 50
+    assert not store.claim(job.id, "worker-b", 60)
+    now[0] += 11
+    assert store.claim(job.id, "worker-b", 60)
+
+    store.release(job.id, "worker-a")
+    assert not store.claim(job.id, "worker-c", 60)
+    store.release(job.id, "worker-b")
+    assert store.claim(job.id, "worker-c", 60)
+
+
+def test_unfinished_jobs_resume_from_their_checkpoints(make_generator, tmp_path):
+    calls = []
+
+    async def generate_chapter(chapter_number, chapter_summary, **kwargs):
+        calls.append(chapter_number)
+        return Chapter(number=chapter_number, title=f"Chapter {chapter_number}", content="Text.", word_count=1)
+
+    scheduler, story = make_scheduler(make_generator, tmp_path, generate_chapter)
+    # A worker that died while generating: chapter 1 was checkpointed and its lease has lapsed
+    crashed = BookJob(story_id=story.id, status="generating", chapter_outlines=outlines(3), total_chapters=3)
+    scheduler.store.save_job(crashed)
+    scheduler.store.save_checkpoint(crashed.id, "chapter:1", Chapter(
+        number=1, title="Chapter 1", content="Saved text.", word_count=2
+    ).model_dump())
+    failed = BookJob(story_id=story.id, status="failed", chapter_outlines=outlines(3), total_chapters=3)
+    scheduler.store.save_job(failed)
+
+    async def run():
+        resumed = scheduler.resume_unfinished()
+        for job in resumed:
+            await wait_finished(job)
+        return resumed
+
+    [job] = asyncio.run(run())
+
+    assert job.id == crashed.id
+    assert job.resumed_count == 1
+    assert job.status == "completed"
+    assert sorted(calls) == [2, 3]
+    assert scheduler.store.load_job(job.id).status == "completed"
+    assert scheduler.generator.get_story(story.id).chapters[0].content == "Saved text."
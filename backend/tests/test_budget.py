@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from budget_utils import TokenBudgeter
+
+
+def test_budget_adds_headroom_and_overhead():
+    budgeter = TokenBudgeter(headroom=0.2, default_words_per_token=0.75, overhead_tokens=60)
+
+    assert budgeter.tokens_for(1000) == 1660
+    assert budgeter.tokens_for(100000) == budgeter.max_call_tokens
+
+
+def test_ratio_is_calibrated_per_scope_with_a_moving_average():
+    budgeter = TokenBudgeter(smoothing=0.2)
+
+    budgeter.observe("chapter", "word " * 100, 200)
+    assert budgeter.words_per_token("chapter") == pytest.approx(0.5)
+    budgeter.observe("chapter", "word " * 100, 100)
+    assert budgeter.words_per_token("chapter") == pytest.approx(0.5 + 0.2 * (1.0 - 0.5))
+    # Other scopes keep the default until they are observed themselves
+    assert budgeter.words_per_token("surprise") == 0.75
+    assert budgeter.tokens_for(600, "chapter") > budgeter.tokens_for(600, "surprise")
+
+
+def test_short_and_odd_completions_barely_move_the_ratio():
+    budgeter = TokenBudgeter()
+
+    budgeter.observe("seed_ideas", "word " * 10, 20)
+    budgeter.observe("seed_ideas", "", 400)
+    assert budgeter.stats()["samples"] == {}
+    budgeter.observe("seed_ideas", "word " * 10, 1000)
+    assert budgeter.words_per_token("seed_ideas") == 0.4
+
+
+def test_long_targets_are_planned_as_segments_that_fit_one_call():
+    budgeter = TokenBudgeter(max_call_tokens=1000)
+
+    segments = budgeter.plan_segments(2001)
+
+    assert segments == [501, 500, 500, 500]
+    assert all(budgeter.tokens_for(words) < budgeter.max_call_tokens for words in segments)
+    assert budgeter.plan_segments(300) == [300]
+
+
+def test_segmented_generation_continues_where_the_last_call_stopped(make_generator):
+    generator = make_generator()
+    generator.budgeter = TokenBudgeter(max_call_tokens=1000)
+    calls = []
+
+    async def generate_text(prompt, temperature=0.8, max_tokens=2000, cache_scope=None, endpoint=None):
+        calls.append((prompt, max_tokens))
+        return f"Part {len(calls)}."
+
+    generator._generate_text = generate_text
+
+    text = asyncio.run(generator._generate_segmented("Write a story", 1500, subject="a story", scope="chapter"))
+
+    assert text == "Part 1.\n\nPart 2.\n\nPart 3."
+    assert [max_tokens for _, max_tokens in calls] == [generator.budgeter.tokens_for(500, "chapter")] * 3
+    assert "Part 1." in calls[1][0] and "Part 2." in calls[2][0]
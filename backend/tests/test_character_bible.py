@@ -0,0 +1,43 @@
+from character_utils import CharacterBible, parse_character_arcs
+from story_utils import CharacterDetail
+
+SEED = """Elena guards a library whose stories walk at night.
+
+Character Arcs:
+- **Elena Martinez**: Moves from guarding the secret alone to trusting others with it.
+- The researcher, Marcus, turns from thief to protector.
+Elena also learns to forgive her mother.
+- Nobody else changes much.
+"""
+
+
+def cast():
+    return [
+        CharacterDetail(name="Elena Martinez", description="A quiet librarian"),
+        CharacterDetail(name="Marcus Hale", description="A researcher"),
+        CharacterDetail(name="Ines", description="Elena's mother"),
+    ]
+
+
+def test_arcs_are_parsed_per_character():
+    arcs = parse_character_arcs(SEED, cast())
+
+    assert arcs == {
+        "Elena Martinez": [{"stage": "Moves from guarding the secret alone to trusting others with it. "
+                                     "Elena also learns to forgive her mother."}],
+        "Marcus Hale": [{"stage": "The researcher, Marcus, turns from thief to protector."}],
+    }
+
+
+def test_seed_without_arcs_section():
+    assert parse_character_arcs("Just a summary about Elena Martinez.", cast()) == {}
+    assert parse_character_arcs(SEED, None) == {}
+
+
+def test_parsed_arc_reaches_chapter_prompts():
+    bible = CharacterBible()
+
+    sheet = bible.render(cast(), "Elena opens the vault", parse_character_arcs(SEED, cast()), chapter_number=3)
+
+    assert sheet.splitlines()[0].startswith("- Elena Martinez")
+    assert "Now: Moves from guarding the secret alone" in sheet.splitlines()[0]
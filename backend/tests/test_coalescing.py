@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+import coalesce_utils
+from coalesce_utils import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"chapter": 1}
+
+    async def run():
+        return await asyncio.gather(*(flight.run("chapter:body:abc", work) for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert (flight.counters["executed"], flight.counters["coalesced"]) == (1, 4)
+
+
+def test_results_are_replayed_until_they_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(coalesce_utils.time, "monotonic", lambda: now[0])
+    flight = SingleFlight(result_ttl_seconds=60)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    async def run():
+        first = await flight.run("key", work)
+        now[0] += 59
+        replayed = await flight.run("key", work)
+        now[0] += 2
+        return first, replayed, await flight.run("key", work)
+
+    assert asyncio.run(run()) == (1, 1, 2)
+    assert flight.counters["replayed"] == 1
+
+
+def test_failures_are_shared_but_not_remembered():
+    flight = SingleFlight()
+    attempts = []
+
+    async def work():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("upstream failed")
+        return "ok"
+
+    async def run():
+        failed = await asyncio.gather(flight.run("key", work), flight.run("key", work), return_exceptions=True)
+        return failed, await flight.run("key", work)
+
+    failed, retried = asyncio.run(run())
+
+    assert [type(error) for error in failed] == [RuntimeError, RuntimeError]
+    assert retried == "ok"
+    assert len(attempts) == 2
+
+
+def test_one_caller_cancelling_does_not_cancel_the_others():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        impatient = asyncio.ensure_future(flight.run("key", work))
+        patient = asyncio.ensure_future(flight.run("key", work))
+        await asyncio.sleep(0.005)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_keys_prefer_the_idempotency_key():
+    assert SingleFlight.make_key("chapter", "{}", "retry-1") == SingleFlight.make_key("chapter", '{"x": 1}', "retry-1")
+    assert SingleFlight.make_key("chapter", "{}") != SingleFlight.make_key("chapter", '{"x": 1}')
+    assert SingleFlight.make_key("chapter", "{}") != SingleFlight.make_key("outline", "{}")
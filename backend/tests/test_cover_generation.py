@@ -0,0 +1,164 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+import pytest
+from google.genai import types
+from PIL import Image
+
+import story_utils
+
+
+def png_bytes(size=(60, 90)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (30, 60, 90)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def text_chunk(text: str) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(candidates=[
+        types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))
+    ])
+
+
+def image_chunk(data: bytes) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(candidates=[
+        types.Candidate(content=types.Content(role="model", parts=[
+            types.Part(inline_data=types.Blob(data=data, mime_type="image/png"))
+        ]))
+    ])
+
+
+class FakeStream:
+    """Async iterator over response chunks; `delay` makes each chunk arrive that much later"""
+
+    def __init__(self, chunks, delay: float = 0.0):
+        self.chunks = list(chunks)
+        self.delay = delay
+        self.delivered = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.delivered == len(self.chunks):
+            raise StopAsyncIteration
+        self.delivered += 1
+        return self.chunks[self.delivered - 1]
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeModels:
+    def __init__(self, streams):
+        self.streams = list(streams)
+        self.requests = []
+        self.warmed = []
+
+    async def generate_content_stream(self, model, contents, config):
+        self.requests.append({"model": model, "contents": contents, "config": config})
+        return self.streams.pop(0)
+
+    async def get(self, model):
+        self.warmed.append(model)
+        return SimpleNamespace(name=model)
+
+
+class FakeImageClient:
+    """Stands in for genai.Client: only the async `client.aio.models` surface is used"""
+
+    def __init__(self, *streams):
+        self.aio = SimpleNamespace(models=FakeModels(streams))
+
+    @property
+    def models(self) -> FakeModels:
+        return self.aio.models
+
+
+def test_cover_from_first_image_chunk(make_generator):
+    stream = FakeStream([text_chunk("Here is your cover"), image_chunk(png_bytes()), text_chunk("never read")])
+    client = FakeImageClient(stream)
+    generator = make_generator(image_client=client)
+
+    result = asyncio.run(generator.generate_book_cover(
+        "The Lighthouse", "A keeper guards a light on a stormy coast", genre="Mystery"
+    ))
+
+    assert result["mime_type"] == "image/jpeg"
+    path, mime_type = generator.blobs.get(result["cover_id"])
+    assert mime_type == "image/jpeg"
+    with Image.open(path) as image:
+        assert image.format == "JPEG"
+    # The stream is left as soon as the image arrives, and closed
+    assert stream.delivered == 2
+    assert stream.closed
+    [request] = client.models.requests
+    assert request["model"] == generator.image_model
+    assert "The Lighthouse" in request["contents"][0].parts[0].text
+
+
+def test_image_client_is_reused(make_generator):
+    client = FakeImageClient(FakeStream([image_chunk(png_bytes())]), FakeStream([image_chunk(png_bytes((80, 120)))]))
+    generator = make_generator(image_client=client)
+
+    first = asyncio.run(generator.generate_book_cover("One", "First summary"))
+    second = asyncio.run(generator.generate_book_cover("Two", "Second summary"))
+
+    assert len(client.models.requests) == 2
+    assert first["cover_id"] != second["cover_id"]
+
+
+def test_slow_cover_times_out_and_closes_the_stream(make_generator, monkeypatch):
+    monkeypatch.setenv("COVER_GENERATION_TIMEOUT_SECONDS", "0.05")
+    stream = FakeStream([image_chunk(png_bytes())], delay=5)
+    generator = make_generator(image_client=FakeImageClient(stream))
+
+    with pytest.raises(TimeoutError, match="longer than 0.05s"):
+        asyncio.run(generator.generate_book_cover("Slow", "A summary"))
+
+    assert stream.delivered == 0
+    assert stream.closed
+
+
+def test_response_without_image_is_an_error(make_generator):
+    stream = FakeStream([text_chunk("I can only describe a cover"), text_chunk("...")])
+    generator = make_generator(image_client=FakeImageClient(stream))
+
+    with pytest.raises(ValueError, match="No image"):
+        asyncio.run(generator.generate_book_cover("Wordy", "A summary"))
+
+    assert stream.delivered == 2
+    assert stream.closed
+
+
+def test_client_is_created_once_from_the_api_key(make_generator, monkeypatch):
+    created = []
+
+    def fake_client(**kwargs):
+        created.append(kwargs)
+        return FakeImageClient()
+
+    monkeypatch.setattr(story_utils.genai, "Client", fake_client)
+    monkeypatch.setenv("GEMINI_API_KEY", "gemini-test")
+    monkeypatch.setenv("COVER_GENERATION_TIMEOUT_SECONDS", "30")
+    generator = make_generator()
+
+    asyncio.run(generator.warm_image_client())
+    client = generator._get_image_client()
+
+    assert len(created) == 1
+    assert created[0]["api_key"] == "gemini-test"
+    assert created[0]["http_options"].timeout == 30000
+    assert client.models.warmed == [generator.image_model]
+
+
+def test_missing_api_key_without_client(make_generator, monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    generator = make_generator()
+
+    with pytest.raises(ValueError, match="Gemini API key"):
+        asyncio.run(generator.generate_book_cover("No key", "A summary"))
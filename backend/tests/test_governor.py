@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+import governor_utils
+from governor_utils import PRIORITY_BULK, PRIORITY_INTERACTIVE, LLMGovernor, LLMOverloaded, TokenBucket
+
+
+def test_interactive_and_cheaper_calls_are_admitted_first():
+    governor = LLMGovernor(max_concurrent=1)
+    admitted = []
+
+    async def call(name, tokens, priority):
+        async with governor.slot(tokens, priority=priority):
+            admitted.append(name)
+            await asyncio.sleep(0)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def holder():
+            async with governor.slot(10):
+                await release.wait()
+
+        holding = asyncio.ensure_future(holder())
+        await asyncio.sleep(0)
+        waiting = [
+            asyncio.ensure_future(call("bulk chapter", 5000, PRIORITY_BULK)),
+            asyncio.ensure_future(call("interactive chapter", 5000, PRIORITY_INTERACTIVE)),
+            asyncio.ensure_future(call("bulk summary", 300, PRIORITY_BULK)),
+            asyncio.ensure_future(call("interactive seed", 1000, PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert governor.stats()["queue_depth"] == 4
+        release.set()
+        await asyncio.gather(holding, *waiting)
+
+    asyncio.run(run())
+
+    assert admitted == ["interactive seed", "interactive chapter", "bulk summary", "bulk chapter"]
+    assert governor.running == 0 and governor.counters["admitted"] == 5
+
+
+def test_interactive_calls_are_shed_when_the_queue_is_full():
+    governor = LLMGovernor(max_concurrent=1, max_queue=1, retry_after=7)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold(priority=PRIORITY_INTERACTIVE):
+            async with governor.slot(10, priority=priority):
+                await release.wait()
+
+        tasks = [asyncio.ensure_future(hold()), asyncio.ensure_future(hold())]
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloaded) as error:
+            async with governor.slot(10):
+                pass
+        # Background work is never shed, it just waits its turn
+        tasks.append(asyncio.ensure_future(hold(PRIORITY_BULK)))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*tasks)
+        return error.value
+
+    error = asyncio.run(run())
+
+    assert (error.queue_depth, error.retry_after) == (1, 7)
+    assert governor.counters == {"admitted": 3, "shed": 1, "tokens_refunded": 0}
+
+
+def test_streaming_routes_answer_429_before_streaming(api, story_routes, monkeypatch):
+    monkeypatch.setattr(story_routes.story_generator, "governor", LLMGovernor(max_queue=0, retry_after=7))
+
+    response = api.post("/api/story/generate-chapter/stream", json={
+        "chapter_number": 1, "chapter_summary": "A storm", "target_word_count": 100
+    })
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "7"
+
+
+def test_token_bucket_waits_and_refunds(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(governor_utils.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate_per_minute=600)
+
+    bucket.take(600)
+    assert bucket.wait_time(60) == pytest.approx(6.0)
+    now[0] += 3
+    assert bucket.wait_time(60) == pytest.approx(3.0)
+    bucket.refund(30)
+    assert bucket.wait_time(60) == pytest.approx(0.0)
+    assert TokenBucket(0).wait_time(10 ** 9) == 0.0
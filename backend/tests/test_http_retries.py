@@ -0,0 +1,225 @@
+import asyncio
+import email.utils
+import time
+
+import httpx
+import openai
+import pytest
+from openai import AsyncOpenAI
+
+import http_utils
+from http_utils import RetryPolicy, build_openai_http_client
+
+
+def completion(text: str = "Once upon a time") -> dict:
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 4, "total_tokens": 14},
+    }
+
+
+class MockOpenAI:
+    """OpenAI-compatible /chat/completions served from a list of scripted responses"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        response = self.responses.pop(0) if self.responses else httpx.Response(200, json=completion())
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Delays RetryPolicy waited, recorded instead of slept"""
+    waited = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        waited.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(http_utils.asyncio, "sleep", fake_sleep)
+    return waited
+
+
+@pytest.fixture
+def mock_generator(make_generator):
+    def make(server: MockOpenAI, retry_policy: RetryPolicy = None):
+        generator = make_generator()
+        generator.client = AsyncOpenAI(
+            api_key="test-key",
+            base_url="http://mock-openai.local/v1",
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(server)),
+            max_retries=0,
+        )
+        generator.retry_policy = retry_policy or RetryPolicy(max_attempts=4, base_delay=0.5, max_delay=20)
+        return generator
+    return make
+
+
+def generate(generator, endpoint="chapter"):
+    return asyncio.run(generator._generate_text("Write a story", max_tokens=50, endpoint=endpoint))
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_transient_statuses_are_retried(mock_generator, sleeps, status):
+    server = MockOpenAI(httpx.Response(status, json={"error": {"message": "busy"}}))
+    generator = mock_generator(server)
+
+    assert generate(generator) == "Once upon a time"
+    assert len(server.requests) == 2
+    assert generator.retry_policy.counters == {"retries": 1, "gave_up": 0}
+    # Full jitter: the first wait is at most base_delay
+    assert len(sleeps) == 1 and 0 <= sleeps[0] <= 0.5
+
+
+def test_connection_errors_are_retried(mock_generator, sleeps):
+    server = MockOpenAI(httpx.ConnectError("connection refused"))
+    generator = mock_generator(server)
+
+    assert generate(generator) == "Once upon a time"
+    assert len(server.requests) == 2
+
+
+def test_retry_after_seconds_is_honored(mock_generator, sleeps):
+    server = MockOpenAI(httpx.Response(429, headers={"retry-after": "3"}, json={"error": {"message": "slow down"}}))
+    generator = mock_generator(server)
+
+    generate(generator)
+
+    assert sleeps == [3.0]
+
+
+def test_retry_after_ms_is_preferred(mock_generator, sleeps):
+    server = MockOpenAI(httpx.Response(
+        503, headers={"retry-after-ms": "250", "retry-after": "3"}, json={"error": {"message": "busy"}}
+    ))
+    generator = mock_generator(server)
+
+    generate(generator)
+
+    assert sleeps == [0.25]
+
+
+def test_retry_after_http_date_is_honored(mock_generator, sleeps):
+    retry_at = email.utils.formatdate(time.time() + 10, usegmt=True)
+    server = MockOpenAI(httpx.Response(429, headers={"retry-after": retry_at}, json={"error": {"message": "later"}}))
+    generator = mock_generator(server)
+
+    generate(generator)
+
+    assert len(sleeps) == 1 and 8 <= sleeps[0] <= 10
+
+
+def test_retry_after_past_the_limit_fails_fast(mock_generator, sleeps):
+    server = MockOpenAI(httpx.Response(429, headers={"retry-after": "600"}, json={"error": {"message": "quota"}}))
+    generator = mock_generator(server, RetryPolicy(max_retry_after=60))
+
+    with pytest.raises(openai.RateLimitError):
+        generate(generator)
+
+    assert len(server.requests) == 1
+    assert sleeps == []
+    assert generator.retry_policy.counters["gave_up"] == 1
+
+
+def test_gives_up_after_max_attempts_with_growing_backoff(mock_generator, sleeps):
+    server = MockOpenAI(*[httpx.Response(500, json={"error": {"message": "down"}}) for _ in range(5)])
+    generator = mock_generator(server, RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=3.0))
+
+    with pytest.raises(openai.InternalServerError):
+        generate(generator)
+
+    assert len(server.requests) == 4
+    assert len(sleeps) == 3
+    for attempt, delay in enumerate(sleeps):
+        assert 0 <= delay <= min(3.0, 1.0 * 2 ** attempt)
+    assert generator.retry_policy.counters == {"retries": 3, "gave_up": 1}
+
+
+@pytest.mark.parametrize("status, error", [
+    (400, openai.BadRequestError),
+    (401, openai.AuthenticationError),
+    (403, openai.PermissionDeniedError),
+    (404, openai.NotFoundError),
+    (422, openai.UnprocessableEntityError),
+])
+def test_client_errors_are_not_retried(mock_generator, sleeps, status, error):
+    server = MockOpenAI(httpx.Response(status, json={"error": {"message": "bad request"}}))
+    generator = mock_generator(server)
+
+    with pytest.raises(error):
+        generate(generator)
+
+    assert len(server.requests) == 1
+    assert sleeps == []
+    assert generator.retry_policy.counters == {"retries": 0, "gave_up": 0}
+
+
+@pytest.mark.parametrize("endpoint, seconds", [
+    ("seed_ideas", 60.0),
+    ("outline", 120.0),
+    ("chapter", 300.0),
+    ("stitch", 60.0),
+])
+def test_per_endpoint_timeouts(mock_generator, endpoint, seconds):
+    server = MockOpenAI()
+    generator = mock_generator(server)
+
+    generate(generator, endpoint=endpoint)
+
+    assert server.requests[0].extensions["timeout"]["read"] == seconds
+
+
+def test_endpoint_timeouts_from_env(monkeypatch, mock_generator):
+    monkeypatch.setenv("OPENAI_TIMEOUT_CHAPTER_SECONDS", "42")
+    monkeypatch.setenv("OPENAI_TIMEOUT_SECONDS", "7")
+    server = MockOpenAI()
+    generator = mock_generator(server)
+
+    generate(generator, endpoint="chapter")
+    generate(generator, endpoint=None)
+
+    assert [r.extensions["timeout"]["read"] for r in server.requests] == [42.0, 7.0]
+
+
+def test_pooled_client_settings_from_env(monkeypatch):
+    monkeypatch.setenv("OPENAI_MAX_CONNECTIONS", "12")
+    monkeypatch.setenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "6")
+    monkeypatch.setenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "30")
+    monkeypatch.setenv("OPENAI_HTTP2", "false")
+    monkeypatch.setenv("OPENAI_TIMEOUT_SECONDS", "90")
+
+    client = build_openai_http_client()
+    pool = client._transport._pool
+
+    assert (pool._max_connections, pool._max_keepalive_connections, pool._keepalive_expiry) == (12, 6, 30.0)
+    assert not pool._http2
+    assert client.timeout == httpx.Timeout(90.0, connect=10.0)
+
+
+def test_generator_uses_the_pooled_client(monkeypatch, make_generator):
+    monkeypatch.setenv("OPENAI_MAX_CONNECTIONS", "9")
+    generator = make_generator()
+
+    # Retries are left to RetryPolicy, and requests go through the tuned pool
+    assert generator.client.max_retries == 0
+    assert generator.client._client._transport._pool._max_connections == 9
+
+
+def test_http2_is_on_by_default(monkeypatch):
+    monkeypatch.delenv("OPENAI_HTTP2", raising=False)
+
+    client = build_openai_http_client()
+
+    assert http_utils.http2_available()
+    assert client._transport._pool._http2
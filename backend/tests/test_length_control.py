@@ -0,0 +1,121 @@
+import asyncio
+
+from budget_utils import TokenBudgeter
+from length_utils import LengthController
+
+
+def sentences(count: int, start: int = 0) -> str:
+    return " ".join(f"Sentence {i} is right here." for i in range(start, start + count))
+
+
+def controller() -> LengthController:
+    return LengthController(TokenBudgeter(), tolerance=0.1, max_rounds=1)
+
+
+def test_split_tail_at_paragraphs():
+    text = "\n\n".join(sentences(10, start=i * 10) for i in range(4))
+
+    head, tail, words = controller()._split_tail(text, 80)
+
+    assert head + tail == text
+    assert tail.startswith("Sentence 20 ")
+    assert words == 100
+
+
+def test_split_tail_falls_back_to_lines():
+    text = "\n".join(sentences(10, start=i * 10) for i in range(4))
+
+    head, tail, words = controller()._split_tail(text, 80)
+
+    assert head + tail == text
+    assert tail.startswith("Sentence 20 ")
+
+
+def test_split_tail_falls_back_to_sentences():
+    text = sentences(40)
+
+    head, tail, words = controller()._split_tail(text, 50)
+
+    assert head + tail == text
+    assert tail.startswith("Sentence 30 ")
+    assert words == 50
+
+
+def test_split_tail_keeps_the_title_line():
+    text = "Title: The Long Night\n" + sentences(40)
+
+    head, tail, words = controller()._split_tail(text, 1000)
+
+    assert head.startswith("Title: The Long Night\n")
+    assert "Title" not in tail
+    assert head + tail == text
+
+
+def test_trim_rewrites_only_the_tail_of_unbroken_text():
+    text = "Title: The Long Night\n" + sentences(100)
+    prompts = []
+
+    async def generate(prompt, words):
+        prompts.append(prompt)
+        return "A short ending."
+
+    trimmed = asyncio.run(controller().correct(text, 400, generate, subject="a story"))
+
+    assert trimmed.startswith("Title: The Long Night\nSentence 0 is right here.")
+    assert trimmed.endswith(" A short ending.")
+    assert "Title: The Long Night" not in prompts[0]
+    assert "Sentence 99 is right here." in prompts[0]
+
+
+def streaming_generator(make_generator, body: str, continuation=(), condensed="A short ending."):
+    """A generator whose first stream is `body`, continuations stream `continuation` and trims return `condensed`"""
+    generator = make_generator()
+    generator.length_controller = LengthController(generator.budgeter, tolerance=0.1, max_rounds=1)
+
+    async def stream_segmented(prompt, words, subject, scope, temperature=0.8):
+        yield "title", "Title: The Long Night"
+        for word in body.split(" "):
+            yield "text", word + " "
+
+    async def stream_text(prompt, temperature=0.8, max_tokens=2000, endpoint=None):
+        for delta in continuation:
+            yield delta
+
+    async def generate_text(prompt, **kwargs):
+        return condensed
+
+    generator._stream_segmented = stream_segmented
+    generator._stream_text = stream_text
+    generator._generate_text = generate_text
+    return generator
+
+
+async def collect(events):
+    return [event async for event in events]
+
+
+def test_short_stream_continues_with_deltas(make_generator):
+    generator = streaming_generator(make_generator, sentences(40), continuation=["\n", "It went on. ", "And on."])
+
+    events = asyncio.run(collect(generator.stream_chapter(1, "A night", target_word_count=150)))
+
+    deltas = "".join(event["text"] for event in events if event["event"] == "delta")
+    assert deltas.endswith(" \n\nIt went on. And on.")
+    assert not [event for event in events if event["event"] == "replace"]
+    assert events[-1]["event"] == "chapter"
+    assert events[-1]["word_count"] == len(deltas.split())
+
+
+def test_long_stream_ends_with_a_replace_event(make_generator):
+    generator = streaming_generator(make_generator, sentences(300))
+
+    events = asyncio.run(collect(generator.stream_surprise_story(
+        "Adult Stories", "Mystery", "Short Story", "Serious", "Adults", "A night"
+    )))
+
+    [replace] = [event for event in events if event["event"] == "replace"]
+    assert replace["text"].startswith("Sentence 0 is right here.")
+    assert replace["text"].endswith(" A short ending.")
+    assert "The Long Night" not in replace["text"]
+    assert events[-1]["event"] == "story"
+    assert events[-1]["title"] == "The Long Night"
@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+import cache_utils
+from cache_utils import LLMCache, SQLiteCacheTier
+
+
+def key(n: int) -> str:
+    return LLMCache.make_key("gpt-4", [{"role": "user", "content": f"prompt {n}"}], 0.7, 100)
+
+
+def test_key_covers_every_request_parameter():
+    messages = [{"role": "user", "content": "prompt"}]
+
+    keys = {
+        LLMCache.make_key("gpt-4", messages, 0.7, 100),
+        LLMCache.make_key("gpt-4o", messages, 0.7, 100),
+        LLMCache.make_key("gpt-4", messages, 0.9, 100),
+        LLMCache.make_key("gpt-4", messages, 0.7, 200),
+        LLMCache.make_key("gpt-4", [{"role": "user", "content": "other"}], 0.7, 100),
+    }
+
+    assert len(keys) == 5
+    assert LLMCache.make_key("gpt-4", messages, 0.7, 100) in keys
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = LLMCache(max_entries=2)
+    cache.set(key(1), "one")
+    cache.set(key(2), "two")
+    cache.get(key(1))
+
+    cache.set(key(3), "three")
+
+    assert cache.get(key(2)) is None
+    assert cache.get(key(1)) == "one" and cache.get(key(3)) == "three"
+    assert cache.counters["evictions"] == 1
+
+
+def test_disk_tier_is_shared_and_promoted(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    LLMCache(disk=SQLiteCacheTier(path)).set(key(1), "one")
+    cache = LLMCache(disk=SQLiteCacheTier(path))
+
+    assert cache.get(key(1), scope="outline") == "one"
+    assert cache.get(key(1), scope="outline") == "one"
+    assert (cache.counters["disk_hits"], cache.counters["memory_hits"]) == (1, 1)
+    assert cache.stats()["scopes"] == {"outline": {"hits": 2, "misses": 0}}
+
+
+def test_disk_entries_expire(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_utils.time, "time", lambda: now[0])
+    tier = SQLiteCacheTier(str(tmp_path / "llm_cache.db"), ttl_seconds=60)
+    tier.set(key(1), "one")
+
+    now[0] += 59
+    assert tier.get(key(1)) == "one"
+    now[0] += 2
+    assert tier.get(key(1)) is None
+
+
+def test_only_listed_scopes_are_cached(make_generator, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_SCOPES", "outline")
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer {len(requests)}"))], usage=None
+        )
+
+    generator = make_generator()
+    generator.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    async def run():
+        return [
+            await generator._generate_text("Outline it", temperature=0.7, max_tokens=100, cache_scope="outline"),
+            await generator._generate_text("Outline it", temperature=0.7, max_tokens=100, cache_scope="outline"),
+            await generator._generate_text("Write it", temperature=0.7, max_tokens=100, cache_scope="chapter"),
+            await generator._generate_text("Write it", temperature=0.7, max_tokens=100, cache_scope="chapter"),
+        ]
+
+    assert asyncio.run(run()) == ["answer 1", "answer 1", "answer 2", "answer 3"]
+    assert len(requests) == 3
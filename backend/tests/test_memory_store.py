@@ -0,0 +1,76 @@
+import store_utils
+from store_utils import InMemoryStoryStore
+from story_utils import Chapter, Story, StoryMemory
+
+
+def add_story(store: InMemoryStoryStore, title: str, words: int = 10) -> Story:
+    story = Story(title=title, genre="Fantasy")
+    store.save_story(story)
+    store.save_chapter(story.id, Chapter(number=1, title="One", content="word " * words, word_count=words))
+    memory = StoryMemory(story.id)
+    memory.add_chapter_outline({"number": 1, "title": "One", "summary": "It begins"})
+    store.save_memory(memory)
+    return story
+
+
+def test_least_recently_used_story_is_dropped_past_max_stories():
+    store = InMemoryStoryStore(max_stories=2)
+    first = add_story(store, "First")
+    second = add_story(store, "Second")
+    store.get_story(first.id)
+
+    third = add_story(store, "Third")
+
+    assert store.get_story(second.id) is None
+    assert store.get_story(first.id) and store.get_story(third.id)
+    assert (store.counters["evictions"], store.counters["dropped"]) == (1, 1)
+
+
+def test_evicted_story_is_spilled_and_reloaded(tmp_path):
+    store = InMemoryStoryStore(max_stories=1, spill_dir=str(tmp_path))
+    first = add_story(store, "First")
+    add_story(store, "Second")
+
+    assert {listing["title"] for listing in store.list_stories()} == {"First", "Second"}
+    reloaded = store.get_story(first.id)
+
+    assert reloaded.title == "First"
+    assert [chapter.title for chapter in reloaded.chapters] == ["One"]
+    assert store.get_memory(first.id).get_chapter_summary(1) == "It begins"
+    assert (store.counters["spills"], store.counters["reloads"]) == (2, 1)
+
+
+def test_idle_stories_expire(tmp_path, monkeypatch):
+    now = [500.0]
+    monkeypatch.setattr(store_utils.time, "monotonic", lambda: now[0])
+    store = InMemoryStoryStore(ttl_seconds=60, spill_dir=str(tmp_path))
+    idle = add_story(store, "Idle")
+    now[0] += 45
+    active = add_story(store, "Active")
+    now[0] += 30
+
+    store.get_story(active.id)
+
+    assert store.stats()["resident_stories"] == 1
+    assert store.counters["expirations"] == 1
+    assert store.get_story(idle.id).title == "Idle"
+
+
+def test_size_limit_evicts_until_under_max_bytes():
+    store = InMemoryStoryStore(max_bytes=3000)
+    first = add_story(store, "First", words=300)
+
+    add_story(store, "Second", words=300)
+
+    assert store.get_story(first.id) is None
+    assert store.estimated_bytes() <= 3000
+
+
+def test_close_snapshots_resident_stories(tmp_path):
+    store = InMemoryStoryStore(spill_dir=str(tmp_path), snapshot_on_close=True)
+    story = add_story(store, "Kept")
+
+    store.close()
+    restarted = InMemoryStoryStore(spill_dir=str(tmp_path))
+
+    assert restarted.get_story(story.id).chapters[0].title == "One"
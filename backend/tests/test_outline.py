@@ -0,0 +1,129 @@
+import asyncio
+import json
+import re
+
+from outline_utils import ChapterStreamParser, salvage_chapters
+
+
+def outline_json(chapters) -> str:
+    return json.dumps({"chapters": chapters})
+
+
+def scripted(generator, responder):
+    """Answer every completion of `generator` with responder(prompt), recording the prompts"""
+    prompts = []
+
+    async def generate_text(prompt, **kwargs):
+        prompts.append(prompt)
+        return responder(prompt)
+
+    generator._generate_text = generate_text
+    return prompts
+
+
+def test_missing_titles_are_taken_from_the_given_titles():
+    text = outline_json([{"number": 1, "summary": "A"}, {"number": 2, "title": "Own", "summary": "B"},
+                         {"number": 3, "summary": "C"}])
+
+    chapters = salvage_chapters(text, {1: "Planned", 2: "Unused"})
+
+    assert [chapter["title"] for chapter in chapters] == ["Planned", "Own", "Chapter 3"]
+    assert ChapterStreamParser({1: "Planned"}).feed(text)[0]["title"] == "Planned"
+
+
+def test_segmented_outline_keeps_skeleton_titles(make_generator):
+    generator = make_generator()
+    generator.outline_segment_threshold = 2
+    generator.outline_batch_size = 2
+
+    def respond(prompt):
+        if "ONLY chapters" in prompt:
+            # Batch call: detailed summaries without titles
+            numbers = re.findall(r"\d+", re.search(r"ONLY chapters ([\d, ]+)", prompt).group(1))
+            return outline_json([{"number": int(n), "summary": f"Detailed {n}"} for n in numbers])
+        return outline_json([{"number": n, "title": f"Skeleton {n}", "summary": f"Plan {n}"} for n in range(1, 5)])
+
+    scripted(generator, respond)
+
+    chapters = asyncio.run(generator.create_detailed_outline("A seed", "Fantasy", 4))
+
+    assert [(c["number"], c["title"], c["summary"]) for c in chapters] == [
+        (n, f"Skeleton {n}", f"Detailed {n}") for n in range(1, 5)
+    ]
+
+
+def test_unparseable_skeleton_falls_back_to_a_single_call(make_generator):
+    generator = make_generator()
+    generator.outline_segment_threshold = 2
+
+    def respond(prompt):
+        if "ONE sentence" in prompt:
+            return "Sorry, I cannot plan this book."
+        return outline_json([{"number": n, "title": f"Single {n}", "summary": f"S {n}"} for n in range(1, 4)])
+
+    prompts = scripted(generator, respond)
+
+    chapters = asyncio.run(generator.create_detailed_outline("A seed", "Fantasy", 3))
+
+    assert [c["title"] for c in chapters] == ["Single 1", "Single 2", "Single 3"]
+    assert len(prompts) == 2
+
+
+def test_stream_parser_yields_chapters_across_chunks_and_skips_fences():
+    text = ("Here is the outline:\n```json\n"
+            + outline_json([{"number": 1, "title": "One", "summary": "A {brace} and \"quotes\""},
+                            {"number": 2, "title": "Two", "summary": "B"},
+                            {"number": 3, "title": "Three", "summary": "C"}])
+            + "\n```")
+    # Cut off in the middle of chapter 3
+    text = text[:text.index('"Three"')]
+    parser = ChapterStreamParser()
+
+    chapters = [chapter for char in text for chapter in parser.feed(char)]
+
+    assert [(c["number"], c["title"]) for c in chapters] == [(1, "One"), (2, "Two")]
+    assert chapters[0]["summary"] == 'A {brace} and "quotes"'
+    assert salvage_chapters(text)[1]["title"] == "Two"
+
+
+def test_repair_requests_only_the_missing_chapters(make_generator):
+    generator = make_generator()
+
+    def respond(prompt):
+        if "ONLY chapters" in prompt:
+            return outline_json([{"number": 2, "title": "Recovered", "summary": "B"}])
+        # Chapter 2 is lost and the array is cut off after chapter 3
+        return "```json\n" + outline_json([{"number": 1, "title": "One", "summary": "A"},
+                                           {"number": 3, "title": "Three", "summary": "C"}])[:-2]
+
+    prompts = scripted(generator, respond)
+
+    chapters = asyncio.run(generator.create_detailed_outline("A seed", "Fantasy", 3))
+
+    assert [c["title"] for c in chapters] == ["One", "Recovered", "Three"]
+    assert len(prompts) == 2
+    assert "ONLY chapters 2," in prompts[1]
+    assert "1. One" in prompts[1]
+
+
+def test_stream_detailed_outline_yields_chapters_then_repairs(make_generator):
+    generator = make_generator()
+    text = outline_json([{"number": 1, "title": "One", "summary": "A"},
+                         {"number": 1, "title": "Duplicate", "summary": "A"},
+                         {"number": 9, "title": "Out of range", "summary": "Z"},
+                         {"number": 3, "title": "Three", "summary": "C"}])
+
+    async def stream_text(prompt, **kwargs):
+        for index in range(0, len(text), 7):
+            yield text[index:index + 7]
+
+    generator._stream_text = stream_text
+    prompts = scripted(generator, lambda prompt: outline_json([{"number": 2, "title": "Two", "summary": "B"}]))
+
+    async def collect():
+        return [chapter async for chapter in generator.stream_detailed_outline("A seed", "Fantasy", 3)]
+
+    chapters = asyncio.run(collect())
+
+    assert [(c["number"], c["title"]) for c in chapters] == [(1, "One"), (3, "Three"), (2, "Two")]
+    assert len(prompts) == 1
@@ -0,0 +1,151 @@
+import asyncio
+import io
+
+import pytest
+from pypdf import PdfReader
+
+from pdf_utils import (
+    PdfExportStore, PdfFragmentCache, PdfRenderPool, PdfRenderPoolSaturated, generate_pdf_from_chapters
+)
+
+
+def book(chapter_text: str = "It was a dark night.\n\nThe rain kept falling.") -> dict:
+    return {
+        "title": "The Lighthouse",
+        "genre": "Mystery",
+        "setting": "A stormy coast",
+        "chapters": [
+            {"title": "Arrival", "content": chapter_text, "summary": "The keeper arrives", "word_count": 8},
+            {"title": "Storm", "content": "Waves broke over the rocks.", "summary": "A storm", "word_count": 5},
+        ],
+        "characters": {"Keeper": "Guards the light"},
+    }
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = PdfRenderPool(max_workers=1, max_queue=1, exports=PdfExportStore(str(tmp_path / "exports")))
+    yield pool
+    pool.shutdown()
+
+
+def test_render_runs_in_a_worker_process(pool, tmp_path):
+    pdf = asyncio.run(pool.render(fragment_cache=PdfFragmentCache(str(tmp_path / "fragments")), **book()))
+
+    reader = PdfReader(io.BytesIO(pdf))
+    assert "The Lighthouse" in reader.pages[0].extract_text()
+    assert pool.stats()["rendered"] == 1 and pool.pending == 0
+
+
+def test_identical_exports_are_reused(pool, tmp_path):
+    cache = PdfFragmentCache(str(tmp_path / "fragments"))
+
+    async def run():
+        return [await pool.export(fragment_cache=cache, **book()) for _ in range(2)]
+
+    first, second = asyncio.run(run())
+
+    assert first == second
+    assert PdfReader(pool.exports.get(first)).pages
+    assert (pool.counters["rendered"], pool.counters["export_hits"]) == (1, 1)
+
+
+def test_full_pool_rejects_right_away(pool):
+    pool.pending = pool.max_workers + pool.max_queue
+
+    with pytest.raises(PdfRenderPoolSaturated) as error:
+        asyncio.run(pool.render(**book()))
+
+    assert error.value.retry_after == pool.retry_after
+    assert pool.counters["rejected"] == 1
+    assert pool._executor is None
+
+
+def test_merged_fragments_are_numbered_like_a_single_build(tmp_path):
+    cache = PdfFragmentCache(str(tmp_path / "fragments"))
+
+    merged = PdfReader(io.BytesIO(generate_pdf_from_chapters(fragment_cache=cache, **book())))
+    single = PdfReader(io.BytesIO(generate_pdf_from_chapters(fragment_cache=None, **book())))
+
+    assert len(merged.pages) == len(single.pages) == 4
+    for number, (merged_page, single_page) in enumerate(zip(merged.pages[1:], single.pages[1:]), start=1):
+        assert merged_page.extract_text().split()[-1] == str(number)
+        assert single_page.extract_text().split()[-1] == str(number)
+    assert merged.pages[0].extract_text().split()[-1] != "0"
+
+
+def test_editing_one_chapter_renders_only_that_section(tmp_path, capsys):
+    cache = PdfFragmentCache(str(tmp_path / "fragments"))
+    generate_pdf_from_chapters(fragment_cache=cache, **book())
+
+    edited = PdfReader(io.BytesIO(generate_pdf_from_chapters(
+        fragment_cache=cache, **book("A different night.")
+    )))
+
+    assert "rendered 1 of 4 sections, 3 from cache" in capsys.readouterr().out
+    assert "A different night." in edited.pages[1].extract_text()
+    assert "Waves broke" in edited.pages[2].extract_text()
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-200", (800, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=0-1,5-9", None),
+    ("items=0-9", None),
+])
+def test_parse_byte_range(story_routes, header, expected):
+    assert story_routes.parse_byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=50-10", "bytes=a-b", "bytes=-0"])
+def test_unsatisfiable_byte_ranges(story_routes, header):
+    with pytest.raises(ValueError):
+        story_routes.parse_byte_range(header, 1000)
+
+
+@pytest.fixture
+def stored_export(story_routes):
+    export_id = "ab" * 32
+    data = bytes(range(256)) * 1024
+    with open(story_routes.pdf_render_pool.exports.path(export_id), "wb") as f:
+        f.write(data)
+    return export_id, data
+
+
+def test_export_download_streams_the_whole_file(api, stored_export):
+    export_id, data = stored_export
+
+    response = api.get(f"/api/story/exports/{export_id}")
+
+    assert response.status_code == 200
+    assert response.content == data
+    assert response.headers["content-length"] == str(len(data))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"] == f'"{export_id}"'
+
+
+def test_export_download_resumes_from_a_range(api, stored_export):
+    export_id, data = stored_export
+
+    response = api.get(f"/api/story/exports/{export_id}", headers={"Range": "bytes=100000-"})
+
+    assert response.status_code == 206
+    assert response.content == data[100000:]
+    assert response.headers["content-range"] == f"bytes 100000-{len(data) - 1}/{len(data)}"
+
+
+def test_export_download_errors(api, stored_export):
+    export_id, data = stored_export
+
+    unsatisfiable = api.get(f"/api/story/exports/{export_id}", headers={"Range": f"bytes={len(data)}-"})
+    cached = api.get(f"/api/story/exports/{export_id}", headers={"If-None-Match": f'"{export_id}"'})
+
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(data)}"
+    assert cached.status_code == 304
+    assert api.get("/api/story/exports/" + "cd" * 32).status_code == 404
+    assert api.get("/api/story/exports/not-an-id").status_code == 400
@@ -0,0 +1,168 @@
+import pytest
+
+from fake_redis import FakeRedis
+from store_utils import RedisStoryStore
+from story_utils import Chapter, CharacterDetail, Story, StoryMemory
+
+
+def make_story(title="The Lighthouse", chapters=2) -> Story:
+    return Story(
+        title=title,
+        genre="mystery",
+        characters=[CharacterDetail(name="Elena Martinez", description="A keeper", aliases=["Lena"])],
+        chapters=[
+            Chapter(number=n, title=f"Chapter {n}", content=f"Text of chapter {n}. " * 20, word_count=80)
+            for n in range(1, chapters + 1)
+        ],
+        character_arcs={"Elena Martinez": [{"chapter": "1", "stage": "doubt"}]},
+    )
+
+
+@pytest.fixture
+def client():
+    return FakeRedis()
+
+
+@pytest.fixture
+def store(client):
+    return RedisStoryStore(client)
+
+
+def test_save_and_get_story(store):
+    story = make_story()
+    store.save_story(story)
+
+    loaded = store.get_story(story.id)
+    assert loaded == story
+    assert [c.number for c in loaded.chapters] == [1, 2]
+    assert loaded.characters[0].aliases == ["Lena"]
+
+
+def test_get_story_without_chapters_is_lazy(store):
+    story = make_story()
+    store.save_story(story)
+
+    assert store.get_story(story.id, include_chapters=False).chapters == []
+    assert store.get_chapter(story.id, 2).content == story.chapters[1].content
+    assert store.get_chapter(story.id, 3) is None
+
+
+def test_missing_story(store):
+    assert store.get_story("nope") is None
+    assert store.get_memory("nope") is None
+
+
+def test_save_chapter_replaces_and_lists(store):
+    story = make_story()
+    store.save_story(story)
+    store.save_chapter(story.id, Chapter(number=2, title="Rewritten", content="New text", word_count=2))
+    store.save_chapter(story.id, Chapter(number=3, title="Third", content="More", word_count=1))
+
+    assert [c.title for c in store.get_story(story.id).chapters] == ["Chapter 1", "Rewritten", "Third"]
+    [listing] = store.list_stories()
+    assert listing["id"] == story.id
+
+
+def test_list_stories_in_creation_order(store):
+    first, second = make_story("First"), make_story("Second")
+    second.created_at = "2030-01-01T00:00:00"
+    first.created_at = "2029-01-01T00:00:00"
+    store.save_story(second)
+    store.save_story(first)
+
+    assert [listing["title"] for listing in store.list_stories()] == ["First", "Second"]
+
+
+def test_delete_story(store, client):
+    story = make_story()
+    store.save_story(story)
+    store.save_memory(StoryMemory(story.id))
+
+    store.delete_story(story.id)
+
+    assert store.get_story(story.id) is None
+    assert store.get_memory(story.id) is None
+    assert store.list_stories() == []
+    assert client.keys("kathai:*") == []
+
+
+def test_memory_round_trip(store):
+    memory = StoryMemory("story-1")
+    memory.add_chat_message("user", "Write chapter one")
+    memory.add_chapter_outline({"number": 1, "title": "Arrival", "summary": "Elena arrives"})
+    memory.add_chapter_outline({"number": 2, "title": "Storm", "summary": "The storm hits"})
+    memory.set_rolling_summary(1, "Elena arrived at the lighthouse.")
+    store.save_memory(memory)
+
+    loaded = store.get_memory("story-1")
+    assert loaded.to_dict() == memory.to_dict()
+    # Chapter numbers come back as ints even though JSON stores them as strings
+    assert loaded.get_chapter_summary(2) == "The storm hits"
+    assert loaded.rolling_summary_before(2) == "Elena arrived at the lighthouse."
+
+
+def test_returned_objects_are_copies(store):
+    story = make_story()
+    store.save_story(story)
+
+    loaded = store.get_story(story.id)
+    loaded.title = "Changed"
+    loaded.chapters.clear()
+
+    assert store.get_story(story.id).title == "The Lighthouse"
+    assert len(store.get_story(story.id).chapters) == 2
+
+
+def test_no_expiry_without_ttl(store, client):
+    story = make_story()
+    store.save_story(story)
+    client.advance(10 ** 6)
+
+    assert store.get_story(story.id) is not None
+    assert client.ttl(f"kathai:story:{story.id}") == -1
+
+
+def test_idle_stories_expire(client):
+    store = RedisStoryStore(client, ttl_seconds=60)
+    story = make_story()
+    store.save_story(story)
+    store.save_memory(StoryMemory(story.id))
+
+    for suffix in ("", ":chapters", ":chapter_index", ":memory"):
+        assert client.ttl(f"kathai:story:{story.id}{suffix}") == 60
+
+    client.advance(61)
+
+    assert store.get_story(story.id) is None
+    assert store.get_memory(story.id) is None
+    # The id left in the sorted set is pruned when stories are listed
+    assert store.list_stories() == []
+    assert client.zrange("kathai:stories", 0, -1) == []
+
+
+def test_reads_and_writes_keep_a_story_alive(client):
+    store = RedisStoryStore(client, ttl_seconds=60)
+    story = make_story()
+    store.save_story(story)
+    store.save_memory(StoryMemory(story.id))
+
+    client.advance(45)
+    assert store.get_story(story.id) is not None
+    client.advance(45)
+    store.save_chapter(story.id, Chapter(number=3, title="Third", content="More", word_count=1))
+    client.advance(45)
+
+    assert len(store.get_story(story.id).chapters) == 3
+    assert store.get_memory(story.id) is not None
+
+
+def test_listing_does_not_keep_a_story_alive(client):
+    store = RedisStoryStore(client, ttl_seconds=60)
+    story = make_story()
+    store.save_story(story)
+
+    client.advance(45)
+    assert len(store.list_stories()) == 1
+    client.advance(45)
+
+    assert store.get_story(story.id) is None
@@ -0,0 +1,84 @@
+from retrieval_utils import PassageIndex, PassageIndexStore, split_passages, tokenize
+from story_utils import Chapter
+
+CHAPTER_1 = """Elena found the brass key under the loose floorboard in the reading room of the old library.
+
+The lamps flickered while she turned the key over and over, wondering which door it would open.
+
+Outside, the rain drummed on the roof and a carriage rolled past without stopping at the gate tonight."""
+
+CHAPTER_2 = """Marcus arrived at dawn with a ledger of stolen maps and a letter from the harbour master.
+
+He spoke of ships, of tides, of a lighthouse keeper who had vanished without leaving any word behind."""
+
+
+def chapter(number: int, content: str, title: str = "") -> Chapter:
+    return Chapter(number=number, title=title or f"Chapter {number}", content=content, word_count=len(content.split()))
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("The Key and the DOOR, she said.") == ["key", "door"]
+
+
+def test_short_paragraphs_are_merged_into_passages():
+    passages = split_passages("\n\n".join(["He nodded."] * 12), min_words=10)
+
+    assert len(passages) == 2
+    assert all(len(passage.split()) >= 10 for passage in passages)
+
+
+def test_best_matching_passage_ranks_first():
+    index = PassageIndex()
+    index.add_chapter(1, "One", CHAPTER_1.replace("\n\n", " "))
+    index.add_chapter(2, "Two", CHAPTER_2)
+
+    [(score, number, text), *rest] = index.search("the brass key Elena found", top_k=3)
+
+    assert number == 1 and "brass key" in text
+    assert all(other_score < score for other_score, _, _ in rest)
+    assert index.search("lighthouse keeper ships")[0][1] == 2
+    assert index.search("lighthouse keeper", before_chapter=2) == []
+
+
+def test_rarer_terms_weigh_more():
+    index = PassageIndex()
+    index.add_chapter(1, "One", "key " * 5 + "door")
+    index.add_chapter(2, "Two", "key " * 5 + "window")
+    index.add_chapter(3, "Three", "key " * 5 + "garden")
+
+    [(_, number, _)] = index.search("key window", top_k=1)
+
+    assert number == 2
+
+
+def test_replacing_a_chapter_updates_its_postings():
+    index = PassageIndex()
+    index.add_chapter(1, "One", CHAPTER_1)
+
+    assert not index.add_chapter(1, "One", CHAPTER_1)
+    assert index.add_chapter(1, "One", CHAPTER_2)
+    assert index.search("brass key") == []
+    assert "brass" not in index.postings
+
+
+def test_store_persists_and_syncs_only_changed_chapters(tmp_path):
+    store = PassageIndexStore(str(tmp_path))
+    chapters = [chapter(1, CHAPTER_1), chapter(2, CHAPTER_2)]
+    store.sync("story-1", chapters)
+
+    restarted = PassageIndexStore(str(tmp_path))
+    restarted.sync("story-1", [chapter(1, CHAPTER_1)])
+
+    assert restarted.counters == {"loads": 1, "chapters_indexed": 0, "searches": 0}
+    assert restarted.get("story-1").search("lighthouse keeper") == []
+
+
+def test_recall_builds_a_prompt_section_within_its_budget():
+    store = PassageIndexStore(None, top_k=2, context_tokens=30)
+    chapters = [chapter(1, CHAPTER_1), chapter(2, CHAPTER_2)]
+
+    section = store.recall("story-1", chapters, "Elena and the brass key", before_chapter=3)
+
+    assert "[Chapter 1]" in section and "brass key" in section
+    assert len(section.split()) < 60
+    assert store.recall("story-1", chapters, "nothing matches this", before_chapter=3) == ""
@@ -0,0 +1,109 @@
+import asyncio
+
+from story_utils import Chapter, Story, StoryMemory
+
+
+def stored_story(generator) -> Story:
+    story = Story(title="The Lighthouse", genre="mystery")
+    generator.store.save_story(story)
+    generator.store.save_memory(StoryMemory(story.id))
+    return story
+
+
+def chapter(number: int = 1) -> Chapter:
+    return Chapter(number=number, title=f"Chapter {number}", content="Elena climbs the tower. " * 30, word_count=120)
+
+
+def test_summary_is_saved(make_generator):
+    generator = make_generator()
+    story = stored_story(generator)
+
+    async def generate(prompt, **kwargs):
+        return " Elena reached the lighthouse. "
+    generator._generate_text = generate
+
+    asyncio.run(generator.update_rolling_summary(story.id, chapter()))
+
+    assert generator.get_memory(story.id).rolling_summary_before(2) == "Elena reached the lighthouse."
+
+
+def test_story_deleted_during_the_summary_call(make_generator):
+    generator = make_generator()
+    story = stored_story(generator)
+
+    async def generate(prompt, **kwargs):
+        generator.delete_story(story.id)
+        return "Elena reached the lighthouse."
+    generator._generate_text = generate
+
+    asyncio.run(generator.update_rolling_summary(story.id, chapter()))
+
+    assert generator.get_memory(story.id) is None
+    assert generator.get_story(story.id) is None
+
+
+def test_delete_story_drops_its_lock_and_index(make_generator):
+    generator = make_generator()
+    story = stored_story(generator)
+
+    async def generate(prompt, **kwargs):
+        return "Summary"
+    generator._generate_text = generate
+
+    asyncio.run(generator.update_rolling_summary(story.id, chapter()))
+    generator.passage_index.add_chapter(story.id, 1, "Chapter 1", chapter().content)
+    assert story.id in generator._memory_locks
+
+    generator.delete_story(story.id)
+
+    assert story.id not in generator._memory_locks
+    assert generator.passage_index.get(story.id).passages == {}
+
+
+def folding_generator(make_generator):
+    """Generator whose summary calls return the chapter numbers folded so far, like "1,2" """
+    generator = make_generator()
+
+    async def generate(prompt, **kwargs):
+        previous = prompt.split("Summary of the story so far:")[1].split("New chapter (Chapter ")
+        before = previous[0].strip()
+        number = previous[1].split(":")[0]
+        return number if before.startswith("(This is the first chapter") else f"{before},{number}"
+    generator._generate_text = generate
+    return generator
+
+
+def test_chapters_fold_in_order_when_finished_out_of_order(make_generator):
+    generator = folding_generator(make_generator)
+    story = stored_story(generator)
+
+    async def run():
+        for number in (3, 1, 4, 2):
+            generator.save_chapter(story.id, chapter(number))
+            await generator.update_rolling_summary(story.id, chapter(number))
+    asyncio.run(run())
+
+    memory = generator.get_memory(story.id)
+    assert memory.rolling_summaries == {1: "1", 2: "1,2", 3: "1,2,3", 4: "1,2,3,4"}
+    assert memory.rolling_summary_before(4) == "1,2,3"
+
+
+def test_rewritten_chapter_refolds_the_later_ones(make_generator):
+    generator = folding_generator(make_generator)
+    story = stored_story(generator)
+
+    async def run():
+        for number in (1, 2, 3):
+            generator.save_chapter(story.id, chapter(number))
+            await generator.update_rolling_summary(story.id, chapter(number))
+        rewritten = Chapter(number=2, title="Chapter 2", content="A different second chapter.", word_count=4)
+        generator.save_chapter(story.id, rewritten)
+        await generator.update_rolling_summary(story.id, rewritten)
+        # The same text again changes nothing
+        await generator.update_rolling_summary(story.id, rewritten)
+    asyncio.run(run())
+
+    memory = generator.get_memory(story.id)
+    assert memory.rolling_summaries == {1: "1", 2: "1,2", 3: "1,2,3"}
+    assert generator.narrative_context.counters["updates"] == 5
+    assert StoryMemory.from_dict(memory.to_dict()).rolling_fingerprints == memory.rolling_fingerprints
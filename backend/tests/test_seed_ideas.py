@@ -0,0 +1,51 @@
+import asyncio
+
+
+def seed_block(n: int, words: int = 300) -> str:
+    return f"[SUMMARY {n}]\n" + " ".join(["word"] * words) + f"\n[CHARACTER ARCS]\nArc {n}"
+
+
+def test_extra_summaries_are_dropped_before_correction(make_generator):
+    generator = make_generator()
+    prompts = []
+
+    async def generate(prompt, **kwargs):
+        prompts.append(prompt)
+        if len(prompts) == 1:
+            # Five ideas, all too short, so every kept one needs a correction call
+            return "\n---\n".join(seed_block(n, words=200) for n in range(1, 6))
+        return " ".join(["more"] * 100)
+    generator._generate_text = generate
+
+    ideas = asyncio.run(generator.generate_seed_ideas("fantasy", "a lost library", target_chapters=5))
+
+    assert len(ideas) == 3
+    assert len(prompts) == 1 + 3
+    assert all("Arc 4" not in idea and "Arc 5" not in idea for idea in ideas)
+
+
+def test_missing_summaries_are_refilled(make_generator):
+    generator = make_generator()
+    prompts = []
+
+    async def generate(prompt, **kwargs):
+        prompts.append(prompt)
+        return seed_block(1) if len(prompts) == 1 else "A new idea"
+    generator._generate_text = generate
+
+    ideas = asyncio.run(generator.generate_seed_ideas("fantasy", "a lost library", target_chapters=5))
+
+    assert ideas[0].endswith("Character Arcs:\nArc 1")
+    assert ideas[1:] == ["A new idea", "A new idea"]
+    assert "alternative #2" in prompts[1] and "alternative #3" in prompts[2]
+
+
+def test_single_and_combined_seed_prompts_share_their_instructions(make_generator):
+    generator = make_generator()
+    combined = generator._build_seed_prompt("fantasy", "idea", "lyrical", "CHARS", "SETTINGS")
+    single = generator._build_seed_prompt("fantasy", "idea", "lyrical", "CHARS", "SETTINGS", variant=2)
+
+    assert "[SUMMARY 3]" in combined and "take #" not in combined
+    assert "[SUMMARY]\n" in single and "This is take #2 of 3" in single
+    for prompt in (combined, single):
+        assert "CHARS" in prompt and "Read like a professional book synopsis" in prompt
@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+
+def events_of(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_titled_stream_splits_off_the_title(make_generator):
+    generator = make_generator()
+
+    async def stream_text(prompt, temperature=0.8, max_tokens=2000, endpoint=None):
+        for delta in ["# The Lo", "ng Night\nRain fell", " all night."]:
+            yield delta
+
+    generator._stream_text = stream_text
+
+    async def collect():
+        return [pair async for pair in generator._stream_titled_text("Write")]
+
+    assert asyncio.run(collect()) == [("title", "# The Long Night"), ("text", "Rain fell"), ("text", " all night.")]
+
+
+def test_chapter_stream_is_newline_delimited_json(api, story_routes, monkeypatch):
+    async def stream_chapter(**kwargs):
+        yield {"event": "title", "number": kwargs["chapter_number"], "title": "The Long Night"}
+        yield {"event": "delta", "text": "Rain fell."}
+        yield {"event": "chapter", "number": kwargs["chapter_number"], "title": "The Long Night", "word_count": 2}
+
+    monkeypatch.setattr(story_routes.story_generator, "stream_chapter", stream_chapter)
+
+    response = api.post("/api/story/generate-chapter/stream", json={
+        "chapter_number": 3, "chapter_summary": "A storm", "target_word_count": 100
+    })
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.headers["cache-control"] == "no-cache"
+    assert [event["event"] for event in events_of(response)] == ["title", "delta", "chapter"]
+    assert events_of(response)[0]["number"] == 3
+
+
+def test_errors_after_the_stream_started_become_an_error_event(api, story_routes, monkeypatch):
+    async def stream_surprise_story(**kwargs):
+        yield {"event": "title", "title": "Cut Short"}
+        raise RuntimeError("upstream closed the connection")
+
+    monkeypatch.setattr(story_routes.story_generator, "stream_surprise_story", stream_surprise_story)
+
+    response = api.post("/api/story/surprise-me/stream", json={
+        "category": "Adult Stories", "story_type": "Mystery", "length": "Short Story",
+        "tone": "Serious", "target_audience": "Adults", "prompt": "A night"
+    })
+
+    assert response.status_code == 200
+    assert events_of(response) == [
+        {"event": "title", "title": "Cut Short"},
+        {"event": "error", "detail": "upstream closed the connection"},
+    ]
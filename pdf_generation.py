@@ -1,34 +1,38 @@
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.enums import TA_CENTER
+from xml.sax.saxutils import escape
 import json
 import os
+import sys
+
+# Lay out paragraphs with the same helpers and styles as the backend's PDF export
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from pdf_utils import get_pdf_styles, text_flowables
 
 def create_pdf(data, filename="output_story.pdf"):
     doc = SimpleDocTemplate(filename, pagesize=A4)
-    styles = getSampleStyleSheet()
     content = []
 
-    # Custom styles
-    title_style = ParagraphStyle(name="Title", parent=styles["Title"], alignment=TA_CENTER, fontSize=24, spaceAfter=20)
-    header_style = ParagraphStyle(name="Heading", parent=styles["Heading2"], fontSize=16, spaceAfter=10)
-    normal_style = styles["Normal"]
+    styles = get_pdf_styles()
+    title_style = styles["title"]
+    header_style = styles["heading"]
+    normal_style = styles["normal"]
+    body_style = styles["body"]
 
     # ===== FRONT COVER =====
-    content.append(Paragraph(data.get("title", "Untitled"), title_style))
-    content.append(Paragraph(f"Genre: {data.get('genre', 'Unknown')}", normal_style))
-    content.append(Paragraph(f"Setting: {data.get('setting', 'Unknown')}", normal_style))
+    content.append(Paragraph(escape(data.get("title", "Untitled")), title_style))
+    content.append(Paragraph(f"Genre: {escape(data.get('genre', 'Unknown'))}", normal_style))
+    content.append(Paragraph(f"Setting: {escape(data.get('setting', 'Unknown'))}", normal_style))
     content.append(PageBreak())
 
     # ===== CHAPTER CONTENT =====
     chapters = data.get("chapters", [])
     for chapter in chapters:
-        content.append(Paragraph(f"Chapter: {chapter.get('title', 'Untitled Chapter')}", header_style))
-        content.append(Paragraph(chapter.get('content', ''), normal_style))
+        content.append(Paragraph(f"Chapter: {escape(chapter.get('title', 'Untitled Chapter'))}", header_style))
+        content.extend(text_flowables(chapter.get('content', ''), body_style))
 
         content.append(Spacer(1, 12))
-        content.append(Paragraph(f"Chapter Summary: {chapter.get('summary', '')}", normal_style))
+        content.append(Paragraph(f"Chapter Summary: {escape(chapter.get('summary', '') or '')}", normal_style))
         content.append(Spacer(1, 12))
         content.append(Paragraph(f"Word Count: {chapter.get('word_count', 0)}", normal_style))
         content.append(PageBreak())
@@ -39,10 +43,10 @@ def create_pdf(data, filename="output_story.pdf"):
     content.append(Paragraph("Characters", header_style))
     if isinstance(characters, dict):
         for name, description in characters.items():
-            content.append(Paragraph(f"<b>{name}</b>: {description}", normal_style))
+            content.append(Paragraph(f"<b>{escape(str(name))}</b>: {escape(str(description))}", normal_style))
             content.append(Spacer(1, 6))
     elif isinstance(characters, str):
-        content.append(Paragraph(characters, normal_style))
+        content.extend(text_flowables(characters, normal_style))
     content.append(PageBreak())
 
     # ===== BUILD PDF =====